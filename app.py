@@ -29,6 +29,7 @@ config_loader = ConfigLoader(CONFIG_PATH)
 
 import requests
 from quant_engine.strategy_framework import *
+from quant_engine.indicators import INDICATOR_SCOPE
 from datetime import datetime
 
 @app.route('/')
@@ -66,8 +67,7 @@ def get_account_info():
     if not client:
         return jsonify({'status': 'error', 'msg': '请先配置API Key'})
     
-    balance = client.get_account_balance()
-    positions = client.get_positions()
+    balance, positions = client.gather(('get_account_balance',), ('get_positions',))
     
     if balance.get('code') != '0':
         return jsonify({'status': 'error', 'msg': f"获取余额失败: {balance.get('msg')}"})
@@ -345,15 +345,13 @@ def delete_strategy():
         os.remove(path)
 
         # Delete database records
-        from quant_engine.db import get_db_connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM strategy_status WHERE name = ?', (name,))
-        cursor.execute('DELETE FROM strategy_logs WHERE strategy_name = ?', (name,))
-        cursor.execute('DELETE FROM strategy_trades WHERE strategy_name = ?', (name,))
-        cursor.execute('DELETE FROM strategy_metrics WHERE strategy_name = ?', (name,))
-        conn.commit()
-        conn.close()
+        from quant_engine.db import get_connection
+        conn = get_connection()
+        with conn:
+            conn.execute('DELETE FROM strategy_status WHERE name = ?', (name,))
+            conn.execute('DELETE FROM strategy_logs WHERE strategy_name = ?', (name,))
+            conn.execute('DELETE FROM strategy_trades WHERE strategy_name = ?', (name,))
+            conn.execute('DELETE FROM strategy_metrics WHERE strategy_name = ?', (name,))
 
         return jsonify({'status': 'success', 'msg': f'策略 {name} 已删除'})
     except Exception as e:
@@ -406,6 +404,10 @@ def run_strategy_thread(strategy_name, symbol, leverage, client, interval_bar='1
         'max_qty_to_buy_on_margin': max_qty_to_buy_on_margin,
         'position_pl_ratio': position_pl_ratio,
         'place_limit': place_limit,
+        'place_limits_batch': place_limits_batch,
+        'cancel_orders_batch': cancel_orders_batch,
+        'get_bars': get_bars,
+        **INDICATOR_SCOPE,
         'ceil': ceil
     })
 
@@ -421,6 +423,7 @@ def run_strategy_thread(strategy_name, symbol, leverage, client, interval_bar='1
 
             strategy_instance = scope['Strategy'](client, symbol, strategy_name)
             strategy_instance.loop_interval = sleep_interval
+            strategy_instance.bar = interval_bar
             active_strategies[strategy_name] = {
                 'instance': strategy_instance,
                 'thread': threading.current_thread(),
@@ -430,30 +433,33 @@ def run_strategy_thread(strategy_name, symbol, leverage, client, interval_bar='1
 
             print(f"[LIVE] Starting strategy {strategy_name} on {symbol}, interval: {interval_bar} ({sleep_interval}s)")
 
-            from quant_engine.db import log_strategy_event, update_strategy_status
+            from quant_engine.db import update_strategy_status
+            from quant_engine.log_writer import log_strategy_event
             log_strategy_event(strategy_name, 'INFO', 'START',
                 f'Strategy started: symbol={symbol}, interval={interval_bar}, leverage={leverage}')
             update_strategy_status(strategy_name, 'RUNNING')
 
             # Run strategy with custom interval
             strategy_instance.initialize()
+            strategy_instance.warm_up()
             strategy_instance.is_running = True
+            # Align each handle_data call to the bar close instead of sleeping after it
+            clock = strategy_instance._make_clock()
 
             while strategy_instance.is_running:
                 try:
                     # Check if strategy should stop
-                    from quant_engine.db import get_db_connection
-                    conn = get_db_connection()
-                    cursor = conn.cursor()
-                    cursor.execute('SELECT status FROM strategy_status WHERE name = ?', (strategy_name,))
-                    row = cursor.fetchone()
-                    conn.close()
+                    from quant_engine.db import get_connection
+                    row = get_connection().execute(
+                        'SELECT status FROM strategy_status WHERE name = ?', (strategy_name,)).fetchone()
 
                     if row and row[0] == 'STOPPED':
                         print(f"[LIVE] Strategy {strategy_name} stopped by user")
                         break
 
-                    # Execute strategy logic
+                    # Execute strategy logic on a fresh account snapshot
+                    reconcile_orders()
+                    invalidate_snapshot()
                     strategy_instance.handle_data()
 
                     # Update heartbeat
@@ -464,7 +470,15 @@ def run_strategy_thread(strategy_name, symbol, leverage, client, interval_bar='1
                     print(f"[LIVE] {error_msg}")
                     log_strategy_event(strategy_name, 'ERROR', 'ERROR', error_msg)
 
-                time.sleep(sleep_interval)
+                if clock is None:
+                    time.sleep(sleep_interval)
+                    continue
+                missed = clock.missed
+                if clock.wait_next(lambda: not strategy_instance.is_running) is None:
+                    break
+                if clock.missed > missed:
+                    log_strategy_event(strategy_name, 'WARNING', 'TIMING',
+                        f'Missed {clock.missed - missed} {interval_bar} bar close(s)', clock.stats())
 
             log_strategy_event(strategy_name, 'INFO', 'STOP', 'Strategy stopped')
             update_strategy_status(strategy_name, 'STOPPED')
@@ -475,7 +489,8 @@ def run_strategy_thread(strategy_name, symbol, leverage, client, interval_bar='1
     except Exception as e:
         error_msg = f"Error running strategy {strategy_name}: {e}"
         print(f"[LIVE] {error_msg}")
-        from quant_engine.db import log_strategy_event, update_strategy_status
+        from quant_engine.db import update_strategy_status
+        from quant_engine.log_writer import log_strategy_event
         log_strategy_event(strategy_name, 'ERROR', 'ERROR', error_msg)
         update_strategy_status(strategy_name, 'ERROR', error_msg)
     finally:
@@ -483,15 +498,22 @@ def run_strategy_thread(strategy_name, symbol, leverage, client, interval_bar='1
             del active_strategies[strategy_name]
 
 # Initialize OKX Client
+_okx_client = None
+
 def get_okx_client():
     api_key = config_loader.get('OKX_API_KEY')
     secret_key = config_loader.get('OKX_SECRET_KEY')
     passphrase = config_loader.get('OKX_PASSPHRASE')
     base_url = config_loader.get('OKX_API_ENDPOINT', 'https://www.okx.com')
     proxy_url = config_loader.get('PROXY_URL')
-    if api_key and secret_key and passphrase:
-        return OKXClient(api_key, secret_key, passphrase, base_url, proxy_url)
-    return None
+    if not (api_key and secret_key and passphrase):
+        return None
+    # Reuse the client (and its keep-alive session) until the config changes
+    global _okx_client
+    key = (api_key, secret_key, passphrase, base_url, proxy_url)
+    if _okx_client is None or _okx_client[0] != key:
+        _okx_client = (key, OKXClient(api_key, secret_key, passphrase, base_url, proxy_url))
+    return _okx_client[1]
 
 @app.route('/api/run_strategy', methods=['POST'])
 def run_strategy():
@@ -516,15 +538,13 @@ def run_strategy():
         interval_bar = '1H'
 
     # Update database - scheduler.py will pick this up and start the process
-    from quant_engine.db import get_db_connection
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO strategy_status (name, symbol, leverage, interval, status, last_heartbeat)
-        VALUES (?, ?, ?, ?, 'RUNNING', datetime('now'))
-    ''', (strategy_name, symbol, leverage, interval_bar))
-    conn.commit()
-    conn.close()
+    from quant_engine.db import get_connection
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO strategy_status (name, symbol, leverage, interval, status, last_heartbeat)
+            VALUES (?, ?, ?, ?, 'RUNNING', datetime('now'))
+        ''', (strategy_name, symbol, leverage, interval_bar))
 
     # Map interval to description
     interval_desc = {
@@ -668,6 +688,38 @@ def run_backtest():
     return jsonify(result)
 
 
+@app.route('/api/backtest/optimize', methods=['POST'])
+def optimize_backtest():
+    """参数网格搜索：param_grid 为 {参数名: [候选值, ...]}，返回按 sort_by 排序的结果表"""
+    data = request.json
+    strategy_name = data.get('strategy_name')
+    symbol = data.get('symbol', 'BTC-USDT')
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+    mode = data.get('mode', 'database')
+    bar = data.get('bar', '1H')
+    initial_balance = data.get('initial_balance', 10000.0)
+    param_grid = data.get('param_grid') or {}
+    sort_by = data.get('sort_by', 'pnl_ratio')
+    max_workers = data.get('max_workers')
+
+    path = os.path.join(os.getcwd(), 'strategy', strategy_name)
+    if not os.path.exists(path):
+        return jsonify({'status': 'error', 'msg': '策略文件不存在'})
+
+    with open(path, 'r', encoding='utf-8') as f:
+        code = f.read()
+
+    from quant_engine.backtest_engine import BacktestMode
+    from quant_engine.optimizer import BacktestOptimizer
+    backtest_mode = BacktestMode.DATABASE if mode == 'database' else BacktestMode.LIVE
+    optimizer = BacktestOptimizer(code, symbol, start_date, end_date, mode=backtest_mode, bar=bar,
+                                  initial_balance=initial_balance, max_workers=max_workers)
+    result = optimizer.run(param_grid, sort_by=sort_by)
+
+    return jsonify(result)
+
+
 # ========== 市场数据管理API ==========
 
 @app.route('/api/market_data/sync', methods=['POST'])
@@ -684,7 +736,38 @@ def sync_market_data():
     client = get_okx_client()
     manager = MarketDataManager(client)
 
-    result = manager.fetch_and_save_klines(symbol, bar, start_date, end_date)
+    # full=true 时重新下载整个范围，默认只补齐缺失区间
+    result = manager.fetch_and_save_klines(symbol, bar, start_date, end_date, incremental=not data.get('full', False))
+
+    return jsonify(result)
+
+
+@app.route('/api/market_data/sync_batch', methods=['POST'])
+def sync_market_data_batch():
+    """
+    并发同步多个交易对/周期的K线数据
+
+    请求体: {'symbols': [...], 'bars': [...], 'start_date', 'end_date', 'max_workers'}
+    或直接给出任务列表 {'jobs': [{'symbol', 'bar', 'start_date', 'end_date'}, ...]}
+    """
+    data = request.json
+    start_date = data.get('start_date', '2024-01-01')
+    end_date = data.get('end_date')
+    max_workers = data.get('max_workers', 4)
+
+    jobs = data.get('jobs')
+    if not jobs:
+        jobs = [{'symbol': symbol, 'bar': bar, 'start_date': start_date, 'end_date': end_date}
+                for symbol in data.get('symbols', []) for bar in data.get('bars', ['1H'])]
+    if not jobs:
+        return jsonify({'status': 'error', 'msg': '请指定交易对'})
+
+    from quant_engine.market_data import MarketDataManager
+
+    client = get_okx_client()
+    manager = MarketDataManager(client)
+
+    result = manager.sync_klines(jobs, max_workers=max_workers, incremental=not data.get('full', False))
 
     return jsonify(result)
 
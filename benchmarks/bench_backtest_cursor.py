@@ -0,0 +1,80 @@
+"""
+Benchmark: per-bar DataFrame.iloc lookups vs the NumPy bar cursor in BacktestClient.
+
+Runs the same simulated loop (one get_ticker per bar, one order every 100 bars)
+over synthetic 1m bars and prints bars/second for both access paths.
+
+Usage:
+    python benchmarks/bench_backtest_cursor.py [n_bars]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quant_engine.backtest_engine import BacktestClient
+
+
+class IlocBacktestClient(BacktestClient):
+    """The pre-cursor access path: one pandas row build per call."""
+
+    def get_ticker(self, instId):
+        if self.current_index < len(self.data):
+            price = self.data.iloc[self.current_index]['close']
+            return {'data': [{'last': str(price)}]}
+        return {'data': [{'last': '0'}]}
+
+    def place_order(self, instId, tdMode, side, ordType, sz, px=None):
+        self.data.iloc[self.current_index]['ts']
+        return super().place_order(instId, tdMode, side, ordType, sz, px or self.data.iloc[self.current_index]['close'])
+
+
+def make_bars(n):
+    rng = np.random.default_rng(42)
+    close = 30000 + np.cumsum(rng.normal(0, 10, n))
+    return pd.DataFrame({
+        'ts': 1704067200000 + np.arange(n, dtype=np.int64) * 60000,
+        'open': close,
+        'high': close + 5,
+        'low': close - 5,
+        'close': close,
+        'vol': rng.random(n),
+    })
+
+
+def run(client, n):
+    start = time.perf_counter()
+    for i in range(n):
+        client.current_index = i
+        float(client.get_ticker('BTC-USDT')['data'][0]['last'])
+        if i % 100 == 0:
+            client.place_order('BTC-USDT', 'cash', 'buy' if i % 200 == 0 else 'sell', 'limit', 0.001)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    df = make_bars(n)
+
+    # iloc is slow enough that timing a slice and extrapolating is representative
+    iloc_n = min(n, 50_000)
+    iloc_rate = run(IlocBacktestClient(df), iloc_n)
+
+    start = time.perf_counter()
+    client = BacktestClient(df)
+    convert_s = time.perf_counter() - start
+    cursor_rate = run(client, n)
+
+    print(f"bars: {n}")
+    print(f"iloc lookups : {iloc_rate:>12,.0f} bars/s (measured on {iloc_n} bars)")
+    print(f"numpy cursor : {cursor_rate:>12,.0f} bars/s (+{convert_s * 1000:.1f} ms one-off conversion)")
+    print(f"speedup      : {cursor_rate / iloc_rate:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark: N strategy processes writing logs/trades to one SQLite file.
+
+Compares the old access pattern (a new sqlite3.connect per helper call on a
+rollback-journal database, default 5s timeout) with quant_engine.db's per-thread
+connection (WAL, busy_timeout, cached statements). Each writer process logs
+events and trades like a strategy_runner; one reader process polls
+get_strategy_logs like the web UI. Reports throughput and "database is locked" errors.
+
+Usage:
+    python benchmarks/bench_db_contention.py [writers] [ops_per_writer]
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quant_engine.db as db
+
+
+def legacy_log_event(path, name, i):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    INSERT INTO strategy_logs (strategy_name, timestamp, level, event_type, message, data)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (name, datetime.now(), 'INFO', 'SIGNAL', f'tick {i}', json.dumps({'i': i})))
+    conn.commit()
+    conn.close()
+
+
+def legacy_log_trade(path, name, i):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    INSERT INTO strategy_trades (strategy_name, timestamp, symbol, side, order_type, price, quantity, order_id, status, pnl)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (name, datetime.now(), 'BTC-USDT', 'buy', 'limit', 30000.0, 0.01, f'{name}-{i}', 'PENDING', None))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read_logs(path, name):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute('SELECT * FROM strategy_logs WHERE strategy_name = ? ORDER BY timestamp DESC LIMIT 100',
+                        (name,)).fetchall()
+    conn.close()
+    return rows
+
+
+def writer(mode, path, name, ops, errors):
+    db.DB_PATH = path
+    failed = 0
+    for i in range(ops):
+        try:
+            if mode == 'legacy':
+                legacy_log_event(path, name, i)
+                if i % 5 == 0:
+                    legacy_log_trade(path, name, i)
+            else:
+                db.log_strategy_event(name, 'INFO', 'SIGNAL', f'tick {i}', {'i': i})
+                if i % 5 == 0:
+                    db.log_trade(name, 'BTC-USDT', 'buy', 'limit', 30000.0, 0.01, f'{name}-{i}')
+        except sqlite3.OperationalError:
+            failed += 1
+    errors.put(failed)
+
+
+def reader(mode, path, stop, reads):
+    db.DB_PATH = path
+    count = 0
+    while not stop.is_set():
+        try:
+            if mode == 'legacy':
+                legacy_read_logs(path, 'writer-0')
+            else:
+                db.get_strategy_logs('writer-0')
+            count += 1
+        except sqlite3.OperationalError:
+            pass
+    reads.put(count)
+
+
+def run(mode, workdir, writers, ops):
+    path = os.path.join(workdir, f'{mode}.db')
+    db.DB_PATH = path
+    db.init_db()
+    db.close_connection()
+    if mode == 'legacy':
+        conn = sqlite3.connect(path)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+
+    errors, reads = multiprocessing.Queue(), multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    poller = multiprocessing.Process(target=reader, args=(mode, path, stop, reads))
+    procs = [multiprocessing.Process(target=writer, args=(mode, path, f'writer-{i}', ops, errors))
+             for i in range(writers)]
+
+    poller.start()
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    poller.join()
+
+    failed = sum(errors.get() for _ in procs)
+    conn = sqlite3.connect(path)
+    written = conn.execute('SELECT COUNT(*) FROM strategy_logs').fetchone()[0] + \
+        conn.execute('SELECT COUNT(*) FROM strategy_trades').fetchone()[0]
+    conn.close()
+    return elapsed, written, failed, reads.get()
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    workdir = tempfile.mkdtemp(prefix='db_contention_bench_')
+
+    print(f"{writers} writer processes x {ops} events (+1 trade per 5 events), 1 polling reader")
+    print(f"{'mode':<10}{'elapsed':>10}{'writes/s':>12}{'locked':>9}{'reads':>9}")
+    for mode in ('legacy', 'pooled'):
+        elapsed, written, failed, read_count = run(mode, workdir, writers, ops)
+        print(f"{mode:<10}{elapsed:>9.2f}s{written / elapsed:>12,.0f}{failed:>9}{read_count:>9}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
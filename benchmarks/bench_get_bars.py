@@ -0,0 +1,67 @@
+"""
+Benchmark: multi-timeframe history in a backtest, per-tick rebuild vs get_bars.
+
+A 1H event-loop backtest that needs the last 60 daily candles on every bar.
+The rebuild variant aggregates the 1H history seen so far into daily candles
+on each tick (what a strategy had to do without framework support);
+BacktestClient.get_bars loads the series once and returns a precomputed index
+slice. Both must return the same candles at every step.
+
+Usage:
+    python benchmarks/bench_get_bars.py [bars]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quant_engine.backtest_engine import BacktestClient
+from quant_engine.resampler import drop_partial_head, resample_columns
+
+WINDOW = 60
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = np.random.default_rng(7)
+    close = 30000 + np.cumsum(rng.normal(0, 20, n))
+    df = pd.DataFrame({
+        'ts': 1704067200000 + np.arange(n, dtype=np.int64) * 3600000,
+        'open': close, 'high': close + 10, 'low': close - 10, 'close': close, 'vol': np.ones(n),
+    })
+    # An unknown symbol keeps get_bars on the aggregated backtest data instead of the local database
+    client = BacktestClient(df, symbol='BENCH-USDT', bar='1H')
+
+    def rebuild():
+        out = []
+        for i in range(n):
+            seen = {name: values[:i + 1] for name, values in client.bars.items()}
+            daily = resample_columns(drop_partial_head(seen, '1D'), '1H', '1D')
+            out.append(daily['close'][-WINDOW:])
+        return out
+
+    def cached():
+        out = []
+        for i in range(n):
+            client.current_index = i
+            out.append(client.get_bars('BENCH-USDT', '1D', WINDOW)['close'])
+        return out
+
+    print(f"{n:,} 1H bars, last {WINDOW} daily candles per bar")
+    print(f"{'mode':<10}{'elapsed':>10}{'us/bar':>10}")
+    results = {}
+    for mode, fn in (('rebuild', rebuild), ('get_bars', cached)):
+        start = time.perf_counter()
+        results[mode] = fn()
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<10}{elapsed:>9.2f}s{elapsed / n * 1e6:>10.1f}")
+    assert all(np.array_equal(a, b) for a, b in zip(results['rebuild'], results['get_bars']))
+
+
+if __name__ == '__main__':
+    main()
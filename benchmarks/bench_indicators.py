@@ -0,0 +1,66 @@
+"""
+Benchmark: streaming indicators vs recomputing from price_history.
+
+Times one handle_data-style update per bar: the old pattern of recomputing
+from the whole history (calculate_ema loop, sum over a slice, max/min over the
+lookback list) against the O(1) streaming classes. Streaming/batch parity is
+covered by tests/test_indicators.py.
+
+Usage:
+    python benchmarks/bench_indicators.py [bars]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quant_engine import indicators
+
+
+def calculate_ema(prices, period):
+    """Full recompute as in strategy/ema.py"""
+    multiplier = 2.0 / (period + 1)
+    ema = sum(prices[:period]) / period
+    for price in prices[period:]:
+        ema = (price - ema) * multiplier + ema
+    return ema
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    prices = (30000 + np.cumsum(np.random.default_rng(1).normal(0, 20, n))).tolist()
+
+    def recompute():
+        history = []
+        for price in prices:
+            history.append(price)
+            if len(history) > 26:
+                calculate_ema(history, 12)
+                calculate_ema(history, 26)
+                sum(history[-20:]) / 20
+                max(history[-20:-1])
+                min(history[-20:-1])
+
+    def streaming():
+        fast, slow, sma, channel = indicators.EMA(12), indicators.EMA(26), indicators.SMA(20), indicators.Donchian(19)
+        for price in prices:
+            fast.update(price)
+            slow.update(price)
+            sma.update(price)
+            channel.update(price)
+
+    print(f"{n:,} bars, EMA(12) + EMA(26) + SMA(20) + 19-bar high/low per bar")
+    print(f"{'mode':<12}{'elapsed':>10}{'us/bar':>10}")
+    for mode, fn in (('recompute', recompute), ('streaming', streaming)):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<12}{elapsed:>9.3f}s{elapsed / n * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: per-row INSERT OR REPLACE vs the batched executemany upsert for market_klines.
+
+Generates n synthetic 1m candles in OKX's string format and times, for an empty
+table and again over existing rows (the re-sync case):
+  * the old path: per-candle cursor.execute loop on the old schema (with the duplicate
+    idx_klines_symbol_bar_ts index) plus klines_to_columns for the columnar store,
+  * the new path: parse_klines + MarketDataManager.bulk_save_klines.
+The columnar store write itself is excluded from both.
+
+Usage:
+    python benchmarks/bench_kline_bulk_insert.py [n_bars]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quant_engine.db as db
+from quant_engine.kline_store import KlineStore, klines_to_columns
+from quant_engine.market_data import MarketDataManager, parse_klines
+
+
+def make_klines(n):
+    rng = np.random.default_rng(5)
+    ts = 1704067200000 + np.arange(n, dtype=np.int64) * 60000
+    close = 30000 + np.cumsum(rng.normal(0, 5, n))
+    return [[str(t), f'{c:.2f}', f'{c + 1:.2f}', f'{c - 1:.2f}', f'{c:.2f}', '1.5', '45000', '45000', '1']
+            for t, c in zip(ts.tolist(), close.tolist())]
+
+
+def legacy_save(symbol, bar, klines):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    for k in klines:
+        cursor.execute('''
+        INSERT OR REPLACE INTO market_klines
+        (symbol, bar, ts, open, high, low, close, vol, vol_ccy, vol_ccy_quote)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            symbol, bar, int(k[0]),
+            float(k[1]), float(k[2]), float(k[3]), float(k[4]),
+            float(k[5]) if k[5] else None,
+            float(k[6]) if k[6] else None,
+            float(k[7]) if k[7] else None
+        ))
+    conn.commit()
+    conn.close()
+    return klines_to_columns(klines)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def fresh_db(workdir, name):
+    db.DB_PATH = os.path.join(workdir, name)
+    db.init_db()
+
+
+def count_rows():
+    conn = db.get_db_connection()
+    n = conn.execute('SELECT COUNT(*) FROM market_klines').fetchone()[0]
+    conn.close()
+    return n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workdir = tempfile.mkdtemp(prefix='kline_insert_bench_')
+    klines = make_klines(n)
+
+    fresh_db(workdir, 'legacy.db')
+    conn = db.get_db_connection()
+    conn.execute('CREATE INDEX idx_klines_symbol_bar_ts ON market_klines(symbol, bar, ts)')
+    conn.close()
+    legacy_s, _ = timed(lambda: legacy_save('BTC-USDT', '1m', klines))
+    assert count_rows() == n
+    legacy_update_s, _ = timed(lambda: legacy_save('BTC-USDT', '1m', klines))
+    assert count_rows() == n
+
+    fresh_db(workdir, 'bulk.db')
+    manager = MarketDataManager(store=KlineStore(os.path.join(workdir, 'store')))
+
+    def bulk_save():
+        manager.bulk_save_klines('BTC-USDT', '1m', parse_klines(klines), store=False)
+
+    bulk_s, _ = timed(bulk_save)
+    assert count_rows() == n
+    bulk_update_s, _ = timed(bulk_save)
+    assert count_rows() == n
+
+    print(f"rows: {n}")
+    print(f"{'':28}{'insert':>10}{'update':>10}")
+    print(f"{'per-row INSERT OR REPLACE':28}{legacy_s:>9.2f}s{legacy_update_s:>9.2f}s")
+    print(f"{'executemany upsert':28}{bulk_s:>9.2f}s{bulk_update_s:>9.2f}s")
+    print(f"{'speedup':28}{legacy_s / bulk_s:>9.1f}x{legacy_update_s / bulk_update_s:>9.1f}x")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
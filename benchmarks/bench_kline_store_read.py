@@ -0,0 +1,72 @@
+"""
+Benchmark: reading klines through pd.read_sql_query vs the columnar kline store.
+
+Builds a throwaway SQLite database with n synthetic 1m candles, migrates it
+into a KlineStore, then times MarketDataManager.get_klines_from_db on both paths.
+
+Usage:
+    python benchmarks/bench_kline_store_read.py [n_bars]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quant_engine.db as db
+from quant_engine.kline_store import KlineStore
+from quant_engine.market_data import MarketDataManager
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workdir = tempfile.mkdtemp(prefix='kline_bench_')
+    db.DB_PATH = os.path.join(workdir, 'quant.db')
+    db.init_db()
+
+    rng = np.random.default_rng(3)
+    ts = 1704067200000 + np.arange(n, dtype=np.int64) * 60000
+    close = 30000 + np.cumsum(rng.normal(0, 5, n))
+    conn = db.get_db_connection()
+    conn.executemany(
+        'INSERT INTO market_klines (symbol, bar, ts, open, high, low, close, vol, vol_ccy, vol_ccy_quote) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (('BTC-USDT', '1m', int(t), c, c + 1, c - 1, c, 1.0, 1.0, 1.0) for t, c in zip(ts.tolist(), close.tolist()))
+    )
+    conn.commit()
+    conn.close()
+
+    store = KlineStore(os.path.join(workdir, 'kline_store'))
+    sqlite_only = MarketDataManager(store=KlineStore(os.path.join(workdir, 'empty')))
+    columnar = MarketDataManager(store=store)
+    start = time.perf_counter()
+    columnar.migrate_to_store('BTC-USDT', '1m')
+    migrate_s = time.perf_counter() - start
+
+    sql_s, df_sql = timed(lambda: sqlite_only.get_klines_from_db('BTC-USDT', '1m'), repeat=1)
+    store_s, df_store = timed(lambda: columnar.get_klines_from_db('BTC-USDT', '1m'))
+    assert len(df_sql) == len(df_store) == n
+
+    print(f"rows: {n}  (migration took {migrate_s:.2f}s)")
+    print(f"sqlite read_sql_query : {sql_s:>8.3f}s  {n / sql_s:>14,.0f} rows/s")
+    print(f"columnar store (mmap) : {store_s:>8.3f}s  {n / store_s:>14,.0f} rows/s")
+    print(f"speedup               : {sql_s / store_s:.1f}x")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: BacktestOptimizer wall time with 1 worker vs N workers.
+
+Sweeps ma_crossover.py (event-loop strategy) over a parameter grid on synthetic
+1H bars; the kline DataFrame is built once and handed to every worker.
+
+Usage:
+    python benchmarks/bench_optimizer_scaling.py [n_bars] [max_workers]
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from quant_engine.optimizer import BacktestOptimizer
+
+PARAM_GRID = {
+    'short_period': [3, 5, 8, 10],
+    'long_period': [20, 30, 40, 60],
+}
+
+
+def make_bars(n):
+    rng = np.random.default_rng(7)
+    close = 30000 + np.cumsum(rng.normal(0, 50, n))
+    return pd.DataFrame({
+        'ts': 1704067200000 + np.arange(n, dtype=np.int64) * 3600000,
+        'open': close, 'high': close + 20, 'low': close - 20, 'close': close,
+        'vol': np.ones(n),
+    })
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    df = make_bars(n)
+    with open(os.path.join(ROOT, 'strategy', 'ma_crossover.py'), encoding='utf-8') as f:
+        code = f.read()
+
+    print(f"bars: {n}, combinations: {np.prod([len(v) for v in PARAM_GRID.values()])}, cpus: {os.cpu_count()}")
+    counts = sorted({1, max_workers} | {w for w in (2, 4, 8, 16) if w < max_workers})
+    baseline = None
+    for workers in counts:
+        result = BacktestOptimizer(code, 'BTC-USDT', None, None, max_workers=workers).run(PARAM_GRID, data=df)
+        baseline = baseline or result['elapsed']
+        print(f"workers={result['workers']:>2}  elapsed={result['elapsed']:>7.2f}s  speedup={baseline / result['elapsed']:.2f}x")
+
+    best = result['results'][0]
+    print(f"best: {best['params']} pnl_ratio={best['pnl_ratio']:.3f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: deriving higher timeframes from stored 1m klines.
+
+Writes n synthetic 1m candles into a throwaway KlineStore, then for each
+target bar times reading the 1m klines and aggregating them with pandas
+DataFrame.resample (what a caller had to do before) against the Resampler: the first get_klines_from_db call aggregates with reduceat and
+caches the result, later calls memory-map the cached partitions.
+
+Usage:
+    python benchmarks/bench_resample.py [n_bars]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quant_engine.db as db
+from quant_engine.kline_store import KlineStore
+from quant_engine.market_data import MarketDataManager
+
+TARGETS = ('5m', '1H', '4H', '1D')
+AGG = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+       'vol': 'sum', 'vol_ccy': 'sum', 'vol_ccy_quote': 'sum'}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workdir = tempfile.mkdtemp(prefix='resample_bench_')
+    db.DB_PATH = os.path.join(workdir, 'quant.db')
+    db.init_db()
+
+    rng = np.random.default_rng(5)
+    close = 30000 + np.cumsum(rng.normal(0, 5, n))
+    columns = {
+        'ts': 1704067200000 + np.arange(n, dtype=np.int64) * 60000,
+        'open': close, 'high': close + 2, 'low': close - 2, 'close': close,
+        'vol': np.ones(n), 'vol_ccy': np.ones(n), 'vol_ccy_quote': close,
+    }
+    manager = MarketDataManager(store=KlineStore(os.path.join(workdir, 'kline_store')))
+    manager.store.write('BTC-USDT', '1m', columns)
+    manager.store.mark_complete('BTC-USDT', '1m')
+
+    print(f"{n:,} 1m klines")
+    print(f"{'bar':<6}{'pandas':>10}{'build':>10}{'cached':>10}{'bars':>10}")
+    for bar in TARGETS:
+        start = time.perf_counter()
+        frame = manager.get_klines_from_db('BTC-USDT', '1m')
+        frame.set_index(pd.to_datetime(frame['ts'], unit='ms')).resample(bar.replace('H', 'h').replace('m', 'min')).agg(AGG)
+        pandas_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager.get_klines_from_db('BTC-USDT', bar)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df = manager.get_klines_from_db('BTC-USDT', bar)
+        cached_s = time.perf_counter() - start
+        print(f"{bar:<6}{pandas_s * 1e3:>8.1f}ms{build_s * 1e3:>8.1f}ms{cached_s * 1e3:>8.1f}ms{len(df):>10,}")
+
+
+if __name__ == '__main__':
+    main()
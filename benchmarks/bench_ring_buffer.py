@@ -0,0 +1,66 @@
+"""
+Benchmark: strategy price history as a list vs RingBuffer.
+
+Each step appends one price and reads a 20-bar window, the way strategies use
+self.price_history. The list variants trim with pop(0) or by re-slicing the
+tail (a full copy); RingBuffer has a fixed capacity and returns the window as
+a zero-copy view.
+
+Usage:
+    python benchmarks/bench_ring_buffer.py [steps] [capacity]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quant_engine.ring_buffer import RingBuffer
+
+WINDOW = 20
+
+
+def run_pop(prices, capacity):
+    history = []
+    for price in prices:
+        history.append(price)
+        if len(history) > capacity:
+            history.pop(0)
+        max(history[-WINDOW:])
+
+
+def run_slice(prices, capacity):
+    history = []
+    for price in prices:
+        history.append(price)
+        if len(history) > capacity:
+            history = history[-capacity:]
+        max(history[-WINDOW:])
+
+
+def run_ring(prices, capacity):
+    history = RingBuffer(capacity)
+    for price in prices:
+        history.append(price)
+        history.view(WINDOW).max()
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    prices = (30000 + np.cumsum(np.random.default_rng(0).normal(0, 20, steps))).tolist()
+
+    print(f"{steps:,} appends, capacity {capacity:,}, {WINDOW}-bar max per step")
+    print(f"{'mode':<10}{'elapsed':>10}{'us/step':>10}")
+    for mode, fn in (('pop(0)', run_pop), ('slice', run_slice), ('ring', run_ring)):
+        start = time.perf_counter()
+        fn(prices, capacity)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<10}{elapsed:>9.2f}s{elapsed / steps * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Backtest Analytics - 回测结果的向量化统计
+输入逐K线的盯市权益和持仓数组（BacktestEngine 预分配并填充）以及成交列表，一次 NumPy 计算得到:
+
+- 最大回撤（比例、金额、持续K线数）
+- 年化 Sharpe / Sortino（按K线周期折算，加密货币全年 365 天交易）
+- 持仓暴露：有持仓的K线占比
+- 往返交易：持仓从 0 开始到回到 0 为一笔，统计胜率、盈亏比、平均每笔盈亏
+- 换手率：成交额 / 初始资金
+- 降采样的权益曲线，供前端绘图
+"""
+
+import numpy as np
+
+from quant_engine.sync_engine import BAR_MS
+
+# 返回给前端的权益曲线最多点数
+MAX_CURVE_POINTS = 1000
+
+YEAR_MS = 365 * 24 * 3600 * 1000
+
+# 持仓数量小于该值视为空仓
+FLAT_EPS = 1e-9
+
+
+def periods_per_year(bar):
+    return YEAR_MS / BAR_MS.get(bar, BAR_MS['1H'])
+
+
+def drawdown(equity):
+    """
+    Returns:
+        dict: max_drawdown（比例，%）、max_drawdown_amount、max_drawdown_bars（从前高到最低点的K线数）
+    """
+    if len(equity) == 0:
+        return {'max_drawdown': 0.0, 'max_drawdown_amount': 0.0, 'max_drawdown_bars': 0}
+    peak = np.maximum.accumulate(equity)
+    amount = peak - equity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(peak > 0, amount / peak, 0.0)
+    trough = int(np.argmax(ratio))
+    # 回撤从最低点之前最后一次处于前高的K线开始（前高可能被多次触及）
+    peak_at = int(np.flatnonzero(equity[:trough + 1] == peak[trough])[-1])
+    return {
+        'max_drawdown': float(ratio[trough] * 100),
+        'max_drawdown_amount': float(amount.max()),
+        'max_drawdown_bars': trough - peak_at
+    }
+
+
+def risk_ratios(equity, bar):
+    """按K线收益率计算的年化 Sharpe 和 Sortino（无风险利率取 0）"""
+    if len(equity) < 2:
+        return {'sharpe': 0.0, 'sortino': 0.0}
+    prev = equity[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(prev > 0, np.diff(equity) / prev, 0.0)
+    scale = np.sqrt(periods_per_year(bar))
+    mean = returns.mean()
+    std = returns.std()
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+    return {
+        'sharpe': float(mean / std * scale) if std > 0 else 0.0,
+        'sortino': float(mean / downside * scale) if downside > 0 else 0.0
+    }
+
+
+def round_trips(orders):
+    """
+    按净持仓从 0 到回到 0 划分往返交易
+
+    Returns:
+        np.ndarray: 每笔已平仓往返交易的盈亏（未平仓的部分不计入）
+    """
+    if not orders:
+        return np.empty(0)
+    signed, price = _order_arrays(orders)
+    closes = np.flatnonzero(np.abs(np.cumsum(signed)) < FLAT_EPS)
+    if len(closes) == 0:
+        return np.empty(0)
+    # 每笔往返交易从上一次空仓之后的第一笔成交开始，到再次空仓的成交为止
+    starts = np.concatenate(([0], closes[:-1] + 1))
+    cash_flow = -signed * price
+    return np.add.reduceat(cash_flow[:closes[-1] + 1], starts)
+
+
+def _order_arrays(orders):
+    """成交列表 -> (带方向的数量, 价格)"""
+    signed = np.fromiter((o['qty'] if o['side'] == 'buy' else -o['qty'] for o in orders), np.float64, len(orders))
+    price = np.fromiter((o['price'] for o in orders), np.float64, len(orders))
+    return signed, price
+
+
+def trade_stats(trips):
+    if len(trips) == 0:
+        return {'round_trips': 0, 'win_rate': 0.0, 'profit_factor': None, 'avg_trade': 0.0,
+                'best_trade': 0.0, 'worst_trade': 0.0}
+    profit = trips[trips > 0].sum()
+    loss = -trips[trips < 0].sum()
+    return {
+        'round_trips': int(len(trips)),
+        'win_rate': float((trips > 0).mean() * 100),
+        'profit_factor': float(profit / loss) if loss > 0 else None,
+        'avg_trade': float(trips.mean()),
+        'best_trade': float(trips.max()),
+        'worst_trade': float(trips.min())
+    }
+
+
+def downsample(ts, values, max_points=MAX_CURVE_POINTS):
+    """
+    把曲线降到最多 max_points 个点：按桶保留每桶的最低点和最高点（保持时间顺序），回撤形状不会被抹平
+
+    Returns:
+        list: [[ts, value], ...]
+    """
+    n = len(values)
+    if n <= max_points:
+        idx = np.arange(n)
+    else:
+        size = int(np.ceil(n / (max_points // 2)))
+        buckets = int(np.ceil(n / size))
+        padded = np.concatenate((values, np.full(buckets * size - n, values[-1])))
+        grid = padded.reshape(buckets, size)
+        base = np.arange(buckets) * size
+        lo = np.minimum(base + grid.argmin(axis=1), n - 1)
+        hi = np.minimum(base + grid.argmax(axis=1), n - 1)
+        idx = np.unique(np.concatenate((lo, hi, [0, n - 1])))
+    return [[int(t), round(float(v), 4)] for t, v in zip(ts[idx], values[idx])]
+
+
+def analyze(ts, equity, position, orders, initial_balance, bar, max_points=MAX_CURVE_POINTS):
+    """
+    Args:
+        ts, equity, position: 逐K线数组（equity 为该K线收盘后的盯市权益，position 为净持仓）
+        orders: 成交列表 [{'time', 'side', 'price', 'qty', ...}]
+
+    Returns:
+        dict: 统计指标和 'equity_curve'
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    position = np.asarray(position, dtype=np.float64)
+    stats = {}
+    stats.update(drawdown(equity))
+    stats.update(risk_ratios(equity, bar))
+    stats['exposure'] = float((np.abs(position) > FLAT_EPS).mean() * 100) if len(position) else 0.0
+    if orders and initial_balance:
+        signed, price = _order_arrays(orders)
+        stats['turnover'] = float(np.abs(signed * price).sum() / initial_balance)
+    else:
+        stats['turnover'] = 0.0
+    stats.update(trade_stats(round_trips(orders)))
+    stats['equity_curve'] = downsample(np.asarray(ts), equity, max_points)
+    return stats
@@ -1,18 +1,55 @@
+import numpy as np
 import pandas as pd
 import requests
 import datetime
 import math
 from quant_engine.strategy_framework import *
+from quant_engine.indicators import INDICATOR_SCOPE
 from quant_engine.market_data import MarketDataManager
+from quant_engine.backtest_analytics import analyze
+from quant_engine.bar_cache import HistoricalBars
 
 # 回测模式枚举
 class BacktestMode:
     DATABASE = 'database'  # 使用数据库中的历史数据
     LIVE = 'live'          # 实时从OKX获取数据
 
+BAR_COLUMNS = ('ts', 'open', 'high', 'low', 'close', 'vol')
+
+def to_bar_arrays(df):
+    """
+    将K线DataFrame一次性转换为连续的NumPy数组，回测循环中按下标读取标量，
+    避免每根K线都通过 DataFrame.iloc 构造一整行。
+
+    缺失的 open/high/low 列用 close 补齐，缺失的 vol 用 0 补齐（模拟数据只有 ts/close）。
+    """
+    close = np.ascontiguousarray(df['close'].to_numpy(dtype=np.float64))
+    arrays = {
+        'ts': np.ascontiguousarray(df['ts'].to_numpy(dtype=np.int64)),
+        'close': close,
+    }
+    for col in ('open', 'high', 'low'):
+        arrays[col] = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)) if col in df.columns else close
+    if 'vol' in df.columns:
+        vol = np.ascontiguousarray(df['vol'].to_numpy(dtype=np.float64, na_value=0.0))
+        arrays['vol'] = vol
+    else:
+        arrays['vol'] = np.zeros(len(close), dtype=np.float64)
+    return arrays
+
 class BacktestClient:
-    def __init__(self, data):
+    # 模拟成交，place_limit 不写入实盘交易记录
+    simulated = True
+
+    def __init__(self, data, bars=None, symbol=None, bar=None):
         self.data = data
+        self.bars = bars if bars is not None else to_bar_arrays(data)
+        self.symbol = symbol
+        self.bar = bar
+        self.history = None  # get_bars 的多周期数据，首次调用时创建
+        self.ts = self.bars['ts']
+        self.close = self.bars['close']
+        self.length = len(self.close)
         self.current_index = 0
         self.orders = []
         self.balance = 10000.0 # Initial USDT
@@ -20,11 +57,17 @@ class BacktestClient:
 
     def get_ticker(self, instId):
         # Return price at current timestamp
-        if self.current_index < len(self.data):
-            price = self.data.iloc[self.current_index]['close']
+        if self.current_index < self.length:
+            price = float(self.close[self.current_index])
             return {'data': [{'last': str(price)}]}
         return {'data': [{'last': '0'}]}
 
+    def get_bars(self, symbol, bar, n):
+        # 只返回当前K线收盘时已收盘的K线，不含未来数据
+        if self.history is None:
+            self.history = HistoricalBars(self.bars, self.symbol, self.bar)
+        return self.history.get(symbol, bar, n, self.current_index)
+
     def get_account_balance(self):
         return {
             'code': '0',
@@ -50,7 +93,7 @@ class BacktestClient:
         }
 
     def place_order(self, instId, tdMode, side, ordType, sz, px=None):
-        price = float(px) if px else float(self.data.iloc[self.current_index]['close'])
+        price = float(px) if px else float(self.close[self.current_index])
         qty = float(sz)
         
         cost = price * qty
@@ -60,7 +103,7 @@ class BacktestClient:
                 self.balance -= cost
                 self.positions[instId] = self.positions.get(instId, 0) + qty
                 self.orders.append({
-                    'time': self.data.iloc[self.current_index]['ts'],
+                    'time': int(self.ts[self.current_index]),
                     'side': 'buy',
                     'price': price,
                     'qty': qty,
@@ -72,7 +115,7 @@ class BacktestClient:
                 self.balance += cost
                 self.positions[instId] = current_pos - qty
                 self.orders.append({
-                    'time': self.data.iloc[self.current_index]['ts'],
+                    'time': int(self.ts[self.current_index]),
                     'side': 'sell',
                     'price': price,
                     'qty': qty,
@@ -81,8 +124,33 @@ class BacktestClient:
         
         return {'code': '0', 'msg': 'success', 'data': [{'ordId': 'mock_id', 'state': 'filled'}]}
 
+    def place_orders_batch(self, orders):
+        # 逐笔模拟成交，余额或持仓不足而未成交的订单标记为失败（与 OKX 批量下单的返回格式相同）
+        data = []
+        for order in orders:
+            filled = len(self.orders)
+            self.place_order(**order)
+            if len(self.orders) > filled:
+                data.append({'ordId': f'mock_{len(self.orders)}', 'sCode': '0', 'sMsg': ''})
+            else:
+                data.append({'ordId': '', 'sCode': '51008', 'sMsg': 'Insufficient balance'})
+        succeeded = sum(1 for item in data if item['sCode'] == '0')
+        code = '0' if succeeded == len(data) else ('2' if succeeded else '1')
+        return {'code': code, 'msg': '', 'data': data}
+
+    def cancel_orders_batch(self, orders):
+        # 回测中限价单立即成交，没有可撤销的挂单
+        data = [{'ordId': str(o['ordId']), 'sCode': '51402', 'sMsg': 'Order already filled'} for o in orders]
+        return {'code': '1' if data else '0', 'msg': '', 'data': data}
+
 class BacktestEngine:
-    def __init__(self, strategy_code, symbol, start_date, end_date, mode=BacktestMode.DATABASE, bar='1H', initial_balance=10000.0):
+    def __init__(self, strategy_code, symbol, start_date, end_date, mode=BacktestMode.DATABASE, bar='1H', initial_balance=10000.0,
+                 data=None, params=None):
+        """
+        Args:
+            data: 预先加载的K线DataFrame，提供时不再查询数据库/OKX（参数优化时多次回测共用一份数据）
+            params: 覆盖策略 show_variable 参数的字典，如 {'fast_ema_period': 10}
+        """
         self.strategy_code = strategy_code
         self.symbol = symbol
         self.start_date = start_date
@@ -90,6 +158,8 @@ class BacktestEngine:
         self.mode = mode
         self.bar = bar
         self.initial_balance = initial_balance
+        self.data = data
+        self.params = params or {}
         self.results = {}
         self.data_manager = MarketDataManager()
 
@@ -167,6 +237,8 @@ class BacktestEngine:
 
     def fetch_data(self):
         """根据模式获取数据"""
+        if self.data is not None:
+            return self.data, None
         if self.mode == BacktestMode.DATABASE:
             df = self.fetch_data_from_db()
             if df is None or df.empty:
@@ -182,6 +254,52 @@ class BacktestEngine:
                 df = pd.DataFrame({'ts': dates.astype(int) // 10**6, 'close': prices})
             return df, None
 
+    def apply_params(self, strategy):
+        """在 initialize() 之后用 self.params 覆盖策略参数，并保持原参数类型"""
+        for name, value in self.params.items():
+            if not hasattr(strategy, name):
+                raise ValueError(f"Unknown strategy parameter: {name}")
+            current = getattr(strategy, name)
+            if isinstance(current, bool):
+                value = bool(value)
+            elif isinstance(current, int):
+                value = int(value)
+            elif isinstance(current, float):
+                value = float(value)
+            setattr(strategy, name, value)
+
+    def run_signals(self, bars, signals):
+        """
+        向量化信号模式：一次性由目标持仓数组计算成交、权益曲线和盈亏。
+
+        signals[i] 为第 i 根K线收盘后的目标持仓数量（基础币），持仓变化按该K线收盘价成交，
+        与事件循环中 place_limit 以当前价格成交的语义一致。不检查资金是否充足，
+        下单金额由策略自行控制。
+
+        Returns:
+            (orders, equity, positions): 成交列表、逐K线权益和持仓数组
+        """
+        close = bars['close']
+        positions = np.asarray(signals, dtype=np.float64)
+        if positions.shape != close.shape:
+            raise ValueError(f"compute_signals returned {positions.shape[0] if positions.ndim else 0} values for {close.shape[0]} bars")
+        positions = np.nan_to_num(positions, nan=0.0)
+
+        delta = np.diff(positions, prepend=0.0)
+        cash = self.initial_balance - np.cumsum(delta * close)
+        equity = cash + positions * close
+
+        fills = np.flatnonzero(delta)
+        orders = [{
+            'time': int(t),
+            'side': 'buy' if d > 0 else 'sell',
+            'price': float(p),
+            'qty': float(abs(d)),
+            'balance': float(b)
+        } for t, d, p, b in zip(bars['ts'][fills], delta[fills], close[fills], cash[fills])]
+
+        return orders, equity, positions
+
     def run(self):
         df, error = self.fetch_data()
         if error:
@@ -189,7 +307,8 @@ class BacktestEngine:
         if df is None or df.empty:
             return {'status': 'error', 'msg': 'No data found'}
 
-        client = BacktestClient(df)
+        bars = to_bar_arrays(df)
+        client = BacktestClient(df, bars, self.symbol, self.bar)
         client.balance = self.initial_balance
 
         # Prepare scope (similar to run_strategy_thread)
@@ -212,6 +331,10 @@ class BacktestEngine:
             'max_qty_to_buy_on_margin': max_qty_to_buy_on_margin,
             'position_pl_ratio': position_pl_ratio,
             'place_limit': place_limit,
+            'place_limits_batch': place_limits_batch,
+            'cancel_orders_batch': cancel_orders_batch,
+            'get_bars': get_bars,
+            **INDICATOR_SCOPE,
             'ceil': ceil
         })
 
@@ -221,17 +344,27 @@ class BacktestEngine:
                 set_context(client, self.symbol)
                 strategy = scope['Strategy'](client, self.symbol)
                 strategy.initialize()
-
-                # Run loop
-                for i in range(len(df)):
-                    client.current_index = i
-                    strategy.handle_data()
-
-                # Calculate final equity
-                final_price = float(df.iloc[-1]['close'])
-                equity = float(client.balance)
-                for sym, qty in client.positions.items():
-                    equity += float(qty) * final_price
+                self.apply_params(strategy)
+
+                # 策略若实现了 compute_signals，则走向量化信号模式，否则逐K线事件循环
+                signals = strategy.compute_signals(df)
+                if signals is not None:
+                    engine_mode = 'signal'
+                    orders, equity_curve, position_curve = self.run_signals(bars, signals)
+                else:
+                    engine_mode = 'event'
+                    # 逐K线收盘后的盯市权益和持仓，预分配避免循环中追加
+                    close = bars['close']
+                    equity_curve = np.empty(client.length)
+                    position_curve = np.empty(client.length)
+                    for i in range(client.length):
+                        client.current_index = i
+                        strategy.handle_data()
+                        held = sum(client.positions.values())
+                        position_curve[i] = held
+                        equity_curve[i] = client.balance + held * close[i]
+                    orders = client.orders
+                equity = float(equity_curve[-1])
 
                 # 计算详细统计
                 pnl = float(equity - self.initial_balance)
@@ -239,7 +372,7 @@ class BacktestEngine:
 
                 # 确保订单数据可以JSON序列化
                 serializable_orders = []
-                for order in client.orders:
+                for order in orders:
                     serializable_order = {}
                     for k, v in order.items():
                         if hasattr(v, 'item'):  # numpy类型
@@ -250,16 +383,21 @@ class BacktestEngine:
                             serializable_order[k] = v
                     serializable_orders.append(serializable_order)
 
+                # 回撤、Sharpe/Sortino、暴露、往返交易和降采样的权益曲线
+                analytics = analyze(bars['ts'], equity_curve, position_curve, orders, self.initial_balance, self.bar)
+
                 return {
+                    **analytics,
                     'status': 'success',
                     'initial_balance': float(self.initial_balance),
                     'final_equity': float(equity),
                     'pnl': float(pnl),
                     'pnl_ratio': float(pnl_ratio),
-                    'total_orders': int(len(client.orders)),
+                    'total_orders': int(len(orders)),
                     'data_points': int(len(df)),
                     'mode': str(self.mode),
                     'bar': str(self.bar),
+                    'engine': engine_mode,
                     'orders': serializable_orders
                 }
         except Exception as e:
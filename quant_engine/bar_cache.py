@@ -0,0 +1,182 @@
+"""
+Bar Cache - 策略的多周期K线接口
+strategy_framework.get_bars(symbol, bar, n) 返回最近 n 根已收盘的K线 {'ts', 'open', 'high', 'low', 'close', 'vol'}（NumPy 数组，只读），
+策略可以在 1H 上运行的同时读取周线、日线计算 MACD/KDJ，不必自己请求和维护历史。
+
+实盘（BarCache）:
+    进程内按 (交易对, 周期) 共享缓存，首次读取用 load_warmup_candles（本地 market_klines，必要时由 resampler 合成，
+    缺少的最新部分用一次 get_candles 补齐）；之后只有新K线收盘时才用一次 get_candles 取增量，
+    同一周期内的重复调用不发请求
+
+回测 / 预热（HistoricalBars）:
+    每个 (交易对, 周期) 只加载一次，并预先计算主周期第 i 根K线收盘时已收盘的K线数 ends[i]，
+    get_bars 返回 [ends[i] - n, ends[i]) 的切片视图，不会读到未来数据。
+    主周期直接切片回测数据；其他周期读取本地数据（含回测开始之前的历史），没有时由回测数据聚合
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from quant_engine.bar_clock import BarClock
+from quant_engine.resampler import can_derive, drop_partial_head, resample_columns
+from quant_engine.sync_engine import BAR_MS
+from quant_engine.warmup import WARMUP_CANDLE_LIMIT, WARMUP_COLUMNS, fetch_closed_candles, load_warmup_candles
+
+BAR_FIELDS = WARMUP_COLUMNS
+
+# 新K线收盘后交易所可能尚未确认，两次增量请求之间至少间隔的秒数
+BAR_CACHE_RETRY = 5.0
+
+
+def empty_bars():
+    return {name: np.array([], dtype=np.int64 if name == 'ts' else np.float64) for name in BAR_FIELDS}
+
+
+def _frozen(columns):
+    """只读的连续数组，策略修改返回值时报错而不是改动缓存"""
+    out = {}
+    for name in BAR_FIELDS:
+        values = np.array(columns[name], dtype=np.int64 if name == 'ts' else np.float64)
+        values.setflags(write=False)
+        out[name] = values
+    return out
+
+
+def _tail(columns, n):
+    return {name: values[max(0, len(values) - int(n)):] for name, values in columns.items()}
+
+
+def _db_bars(symbol, bar, end_ts):
+    """本地 end_ts（含）之前的全部K线，库中没有该周期时由 resampler 合成"""
+    from quant_engine.market_data import MarketDataManager
+
+    df = MarketDataManager().get_klines_from_db(symbol, bar, end_date=pd.Timestamp(end_ts, unit='ms'))
+    return {name: df[name].to_numpy() for name in BAR_FIELDS}
+
+
+class HistoricalBars:
+    def __init__(self, bars, symbol, bar, loader=None):
+        """
+        Args:
+            bars: 主周期K线 {列名: ndarray}（回测的 to_bar_arrays 结果或预热K线）
+            symbol, bar: 主周期的交易对和周期
+            loader: 可选的 loader(symbol, bar, end_ts) -> {列名: ndarray}，读取其他周期，默认读取本地数据
+        """
+        self.bars = _frozen(bars)
+        self.symbol = symbol
+        self.bar = bar
+        self.loader = loader or _db_bars
+        # 主周期每根K线的收盘时间
+        self.close_ts = self.bars['ts'] + BAR_MS.get(bar, 0)
+        self._series = {}
+
+    def get(self, symbol, bar, n, index):
+        """主周期第 index 根K线收盘时，symbol 在 bar 周期上最近 n 根已收盘的K线"""
+        key = (symbol, bar)
+        if key not in self._series:
+            self._series[key] = self._load(symbol, bar)
+        columns, ends = self._series[key]
+        end = index + 1 if ends is None else int(ends[index])
+        return {name: values[max(0, end - int(n)):end] for name, values in columns.items()}
+
+    def _load(self, symbol, bar):
+        if symbol == self.symbol and bar == self.bar:
+            return self.bars, None
+        if bar not in BAR_MS:
+            raise ValueError(f'Unknown bar: {bar}')
+        columns = empty_bars()
+        if len(self.bars['ts']):
+            try:
+                columns = self.loader(symbol, bar, int(self.close_ts[-1]))
+            except Exception as e:
+                print(f"[BARS] Failed to load {symbol} {bar}: {e}")
+            if not len(columns['ts']) and symbol == self.symbol and can_derive(self.bar, bar):
+                columns = resample_columns(drop_partial_head(self.bars, bar), self.bar, bar)
+        columns = _frozen(columns)
+        ends = np.searchsorted(columns['ts'] + BAR_MS[bar], self.close_ts, side='right')
+        return columns, ends
+
+
+class BarCache:
+    """实盘的进程内K线缓存，所有策略线程共享"""
+
+    def __init__(self):
+        self._series = {}  # (symbol, bar) -> {'columns', 'capacity', 'checked'}
+        self._fetching = {}  # (symbol, bar) -> Lock，请求交易所 / 读库期间只阻塞同一周期的调用
+        self._lock = threading.Lock()  # 只保护上面两个字典的查找和插入
+
+    def get(self, client, symbol, bar, n, now=None):
+        if bar not in BAR_MS:
+            raise ValueError(f'Unknown bar: {bar}')
+        now = now or time.time()
+        period = BAR_MS[bar]
+        last_open = int(BarClock(bar).last_close_time(now) * 1000) - period
+        n = int(n)
+        key = (symbol, bar)
+        with self._lock:
+            entry = self._series.get(key)
+            fetching = self._fetching.setdefault(key, threading.Lock())
+        if entry is not None and n <= entry['capacity'] and not self._stale(entry, last_open, now):
+            return _tail(entry['columns'], n)
+        with fetching:
+            # 等待期间其他线程可能已经加载或更新过
+            with self._lock:
+                entry = self._series.get(key)
+            if entry is None or n > entry['capacity']:
+                entry = self._load(client, symbol, bar, n, now)
+                with self._lock:
+                    self._series[key] = entry
+            elif self._stale(entry, last_open, now):
+                self._update(client, symbol, bar, entry, last_open, now)
+            return _tail(entry['columns'], n)
+
+    @staticmethod
+    def _stale(entry, last_open, now):
+        """距上次检查超过 BAR_CACHE_RETRY 且缓存中还没有最近收盘的K线"""
+        if now - entry['checked'] < BAR_CACHE_RETRY:
+            return False
+        ts = entry['columns']['ts']
+        return not len(ts) or ts[-1] < last_open
+
+    def _load(self, client, symbol, bar, n, now):
+        try:
+            df, source = load_warmup_candles(client, symbol, bar, n, now)
+            columns = {name: df[name].to_numpy() for name in BAR_FIELDS}
+            print(f"[BARS] Loaded {len(df)} {symbol} {bar} bars ({source or 'no data'})")
+        except Exception as e:
+            print(f"[BARS] Failed to load {symbol} {bar}: {e}")
+            columns = empty_bars()
+        return {'columns': _frozen(columns), 'capacity': n, 'checked': now}
+
+    def _update(self, client, symbol, bar, entry, last_open, now):
+        """只请求缓存之后新收盘的K线；缺口超过单次请求上限时重新加载"""
+        columns = entry['columns']
+        entry['checked'] = now
+        if not len(columns['ts']):
+            entry.update(self._load(client, symbol, bar, entry['capacity'], now))
+            return
+        missing = (last_open - int(columns['ts'][-1])) // BAR_MS[bar]
+        if missing + 1 > WARMUP_CANDLE_LIMIT:
+            entry.update(self._load(client, symbol, bar, entry['capacity'], now))
+            return
+        try:
+            # +1：返回结果中包含尚未收盘的当前K线
+            df = fetch_closed_candles(client, symbol, bar, missing + 1)
+        except Exception as e:
+            print(f"[BARS] Failed to update {symbol} {bar}: {e}")
+            return
+        df = df[df['ts'] > columns['ts'][-1]].sort_values('ts')
+        if len(df):
+            merged = {name: np.concatenate((columns[name], df[name].to_numpy())) for name in BAR_FIELDS}
+            entry['columns'] = _frozen(_tail(merged, entry['capacity']))
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._fetching.clear()
+
+
+BAR_CACHE = BarCache()
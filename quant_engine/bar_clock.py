@@ -0,0 +1,145 @@
+"""
+Bar Clock - 按K线收盘时间调度 handle_data
+取代固定的 time.sleep(loop_interval)：每次都等到下一根K线收盘的精确时间点，处理耗时不会累积成漂移。
+有行情推送（OKXClient.stream）时，收盘后等到已确认的K线（confirm=1）到达再触发，超时则按时间触发。
+
+统计:
+    drift  - 触发时间相对K线收盘时间的延迟（秒）
+    missed - 因 handle_data 耗时过长或进程被挂起而跳过的收盘次数
+"""
+
+import threading
+import time
+
+from quant_engine.sync_engine import BAR_MS
+
+# OKX 的 6H/12H/1D/1W K线按香港时间（UTC+8）开盘
+HKT_OFFSET = 8 * 3600
+HKT_ALIGNED_BARS = ('6H', '12H', '1D', '1W')
+
+# 1970-01-01 是周四，周线从 1970-01-05（周一）起算
+WEEK_ANCHOR = 4 * 86400
+
+# 收盘后延迟多少秒再按时间触发，给交易所生成已确认K线留出时间
+CLOSE_DELAY = 1.0
+
+# 有推送时等待已确认K线的最长秒数
+CONFIRM_TIMEOUT = 10.0
+
+
+def bar_anchor(bar):
+    """K线边界相对 Unix 纪元的偏移（秒）"""
+    anchor = -HKT_OFFSET if bar in HKT_ALIGNED_BARS else 0
+    if bar == '1W':
+        anchor += WEEK_ANCHOR
+    return anchor
+
+
+class BarClock:
+    def __init__(self, bar, stream=None, symbol=None, close_delay=CLOSE_DELAY, confirm_timeout=CONFIRM_TIMEOUT):
+        """
+        Args:
+            bar: K线周期，如 1m, 15m, 1H, 1D
+            stream: 可选的 MarketStream / HubClient，用已确认K线的推送触发
+            symbol: 订阅K线的交易对（与 stream 一起使用）
+        """
+        if bar not in BAR_MS:
+            raise ValueError(f'Unsupported bar: {bar}')
+        self.bar = bar
+        self.period = BAR_MS[bar] / 1000
+        self.anchor = bar_anchor(bar)
+        self.close_delay = close_delay
+        self.confirm_timeout = confirm_timeout
+        self.symbol = symbol
+        self.stream = stream
+
+        self.bars = 0
+        self.missed = 0
+        self.last_drift = 0.0
+        self.max_drift = 0.0
+        self.total_drift = 0.0
+        self.last_close = None
+
+        self._confirmed_ts = 0
+        self._confirm_cond = threading.Condition()
+        if stream is not None and symbol:
+            stream.add_listener(self._on_message)
+            stream.subscribe_candles(symbol, bar)
+
+    def last_close_time(self, now):
+        """now 之前（含）最近一次K线收盘的时间戳（秒）"""
+        return self.anchor + ((now - self.anchor) // self.period) * self.period
+
+    def next_close_time(self, now):
+        return self.last_close_time(now) + self.period
+
+    def wait_next(self, should_stop=None, poll=1.0):
+        """
+        阻塞到下一根K线收盘后返回
+
+        Args:
+            should_stop: 可选的无参函数，返回 True 时立即停止等待
+            poll: 检查 should_stop 的间隔（秒）
+
+        Returns:
+            float: 本次收盘时间戳（秒）；被 should_stop 打断时返回 None
+        """
+        close = self.next_close_time(time.time())
+        if self.last_close is not None:
+            skipped = int(round((close - self.last_close) / self.period)) - 1
+            if skipped > 0:
+                self.missed += skipped
+
+        wake_at = close + (0 if self.stream is not None else self.close_delay)
+        while True:
+            remaining = wake_at - time.time()
+            if remaining <= 0:
+                break
+            if should_stop and should_stop():
+                return None
+            time.sleep(min(remaining, poll))
+
+        if self.stream is not None:
+            self._wait_confirmed(close, should_stop)
+            if should_stop and should_stop():
+                return None
+
+        drift = time.time() - close
+        self.last_close = close
+        self.bars += 1
+        self.last_drift = drift
+        self.max_drift = max(self.max_drift, drift)
+        self.total_drift += drift
+        return close
+
+    def stats(self):
+        return {
+            'bar': self.bar,
+            'bars': self.bars,
+            'missed': self.missed,
+            'last_drift': round(self.last_drift, 3),
+            'max_drift': round(self.max_drift, 3),
+            'avg_drift': round(self.total_drift / self.bars, 3) if self.bars else 0.0
+        }
+
+    def _wait_confirmed(self, close, should_stop):
+        """等待开盘时间为 close - period 的K线确认推送，超时后放弃"""
+        open_ts = int((close - self.period) * 1000)
+        deadline = time.time() + self.confirm_timeout
+        with self._confirm_cond:
+            while self._confirmed_ts < open_ts:
+                remaining = deadline - time.time()
+                if remaining <= 0 or (should_stop and should_stop()):
+                    return False
+                self._confirm_cond.wait(min(remaining, 1.0))
+        return True
+
+    def _on_message(self, message):
+        arg = message.get('arg') or {}
+        if arg.get('channel') != f'candle{self.bar}' or arg.get('instId') != self.symbol:
+            return
+        confirmed = [int(row[0]) for row in message.get('data') or [] if len(row) > 8 and row[8] == '1']
+        if confirmed:
+            with self._confirm_cond:
+                self._confirmed_ts = max(self._confirmed_ts, max(confirmed))
+                self._confirm_cond.notify_all()
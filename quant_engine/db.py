@@ -1,17 +1,76 @@
 import sqlite3
 import os
 import json
+import threading
 from datetime import datetime
 
 DB_PATH = os.path.join(os.getcwd(), 'quant.db')
 
+# Seconds a connection waits for another writer before raising "database is locked".
+# The web app, the scheduler and every strategy_runner process share one database file.
+BUSY_TIMEOUT = 30
+
+# Prepared statements cached per connection (sqlite3's statement LRU)
+STATEMENT_CACHE_SIZE = 128
+
+# Applied to every connection. journal_mode is persistent in the file; WAL lets readers run
+# alongside a writer, and synchronous=NORMAL is durable under WAL without an fsync per commit.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+)
+
+_local = threading.local()
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    """Open a new connection; the caller is responsible for closing it"""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db():
+def get_connection():
+    """
+    Return this thread's shared connection, opening it on first use.
+
+    The connection is reused across calls so its prepared statements stay cached; do not
+    close it. Wrap writes in ``with conn:`` so they commit, or roll back on error, before
+    the connection is used again. A forked child or a changed DB_PATH gets a fresh connection.
+    """
+    key = (os.getpid(), DB_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.key != key:
+        if conn is not None and _local.key[0] == key[0]:
+            conn.close()
+        conn = get_db_connection()
+        _local.conn, _local.key = conn, key
+    return conn
+
+def close_connection():
+    """Close this thread's shared connection, if any"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        if _local.key[0] == os.getpid():
+            conn.close()
+
+# Extra pragmas for bulk kline ingestion: a 64MB page cache keeps the (symbol, bar, ts)
+# index hot while upserting.
+BULK_LOAD_PRAGMAS = (
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+)
+
+def get_bulk_connection():
+    """New connection tuned for large batched writes (see BULK_LOAD_PRAGMAS); caller closes it"""
     conn = get_db_connection()
+    for pragma in BULK_LOAD_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def init_db():
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Create strategy_status table
@@ -63,6 +122,13 @@ def init_db():
     )
     ''')
     
+    # Fill tracking columns (migration for existing databases), maintained by OrderTracker
+    for column in ('filled_quantity REAL', 'fill_price REAL', 'fee REAL'):
+        try:
+            cursor.execute(f'ALTER TABLE strategy_trades ADD COLUMN {column}')
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
     # Create strategy_metrics table
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS strategy_metrics (
@@ -75,6 +141,17 @@ def init_db():
         last_updated DATETIME
     )
     ''')
+
+    # Running aggregate columns (migration for existing databases); values are rebuilt once when added
+    added_metrics = False
+    for column in METRICS_AGGREGATE_COLUMNS:
+        try:
+            cursor.execute(f'ALTER TABLE strategy_metrics ADD COLUMN {column}')
+            added_metrics = True
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+    for trigger in METRICS_TRIGGERS:
+        cursor.execute(trigger)
     
     # Create market_klines table for historical data
     cursor.execute('''
@@ -97,17 +174,21 @@ def init_db():
     # Create indexes for better query performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_strategy ON strategy_logs(strategy_name, timestamp DESC)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_trades_strategy ON strategy_trades(strategy_name, timestamp DESC)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_klines_symbol_bar_ts ON market_klines(symbol, bar, ts)')
+    # UNIQUE(symbol, bar, ts) already creates this index; a second copy only doubles the
+    # b-tree work on every kline insert
+    cursor.execute('DROP INDEX IF EXISTS idx_klines_symbol_bar_ts')
 
     conn.commit()
-    conn.close()
+
+    if added_metrics:
+        rebuild_strategy_metrics()
 
 def reset_database():
     """
     Clear all data from the database while preserving table structures.
     Returns a dict with the number of rows deleted from each table.
     """
-    conn = get_db_connection()
+    conn = get_connection()
     cursor = conn.cursor()
 
     tables = ['strategy_status', 'strategy_logs', 'strategy_trades', 'strategy_metrics', 'market_klines']
@@ -127,49 +208,137 @@ def reset_database():
         cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('strategy_logs', 'strategy_trades', 'market_klines')")
 
         conn.commit()
+
+        # The columnar kline store mirrors market_klines, clear it too
+        from quant_engine.kline_store import KlineStore
+        KlineStore().clear()
+
         return {'status': 'success', 'deleted': deleted_counts}
     except Exception as e:
         conn.rollback()
         return {'status': 'error', 'msg': str(e)}
-    finally:
-        conn.close()
 
 def update_strategy_status(name, status, error_message=None):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     
-    if error_message:
-        cursor.execute('''
-        UPDATE strategy_status 
-        SET status = ?, error_message = ?, last_heartbeat = ?
-        WHERE name = ?
-        ''', (status, error_message, datetime.now(), name))
-    else:
-        cursor.execute('''
-        UPDATE strategy_status 
-        SET status = ?, last_heartbeat = ?
-        WHERE name = ?
-        ''', (status, datetime.now(), name))
-        
-    conn.commit()
-    conn.close()
+    with conn:
+        if error_message:
+            conn.execute('''
+            UPDATE strategy_status 
+            SET status = ?, error_message = ?, last_heartbeat = ?
+            WHERE name = ?
+            ''', (status, error_message, datetime.now(), name))
+        else:
+            conn.execute('''
+            UPDATE strategy_status 
+            SET status = ?, last_heartbeat = ?
+            WHERE name = ?
+            ''', (status, datetime.now(), name))
 
 def get_active_strategies():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM strategy_status WHERE status = 'RUNNING'")
-    strategies = cursor.fetchall()
-    conn.close()
-    return strategies
+    conn = get_connection()
+    return conn.execute("SELECT * FROM strategy_status WHERE status = 'RUNNING'").fetchall()
 
 def get_all_strategies_status():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM strategy_status")
-    rows = cursor.fetchall()
-    conn.close()
+    conn = get_connection()
+    rows = conn.execute("SELECT * FROM strategy_status").fetchall()
     return {row['name']: dict(row) for row in rows}
 
+# Statements shared with quant_engine.log_writer, which batches the same inserts
+INSERT_LOG_SQL = '''
+INSERT INTO strategy_logs (strategy_name, timestamp, level, event_type, message, data)
+VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_TRADE_SQL = '''
+INSERT INTO strategy_trades (strategy_name, timestamp, symbol, side, order_type, price, quantity, order_id, status, pnl)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPDATE_TRADE_STATUS_SQL = '''
+UPDATE strategy_trades SET status = ?, pnl = COALESCE(?, pnl) WHERE order_id = ?
+'''
+
+UPDATE_TRADE_FILL_SQL = '''
+UPDATE strategy_trades SET status = ?, filled_quantity = ?, fill_price = ?, fee = ?, pnl = COALESCE(?, pnl)
+WHERE order_id = ?
+'''
+
+# Order statuses whose pnl counts in strategy_metrics (a cancelled order may have filled partially)
+FILL_STATUSES = ('FILLED', 'PARTIALLY_FILLED', 'CANCELLED')
+
+METRICS_AGGREGATE_COLUMNS = (
+    'gross_profit REAL DEFAULT 0',
+    'gross_loss REAL DEFAULT 0',
+    'peak_pnl REAL DEFAULT 0',
+    'max_drawdown REAL DEFAULT 0',
+    'profit_factor REAL',
+    'avg_trade REAL DEFAULT 0',
+)
+
+
+def _metrics_trigger_sql(name, event, has_old):
+    """
+    Trigger keeping strategy_metrics as running aggregates of strategy_trades.
+
+    A trade counts once it has a pnl and one of FILL_STATUSES. The trigger removes the
+    old row's contribution and adds the new one, so repeated pnl updates of a partially
+    filled order stay correct. Max drawdown is measured on cumulative realized pnl
+    (starting from 0) in the order the pnl changes are written.
+    """
+    statuses = ', '.join(f"'{status}'" for status in FILL_STATUSES)
+
+    def counted(row):
+        return f"({row}.status IN ({statuses}) AND {row}.pnl IS NOT NULL)"
+
+    def pnl(row):
+        return f"(CASE WHEN {counted(row)} THEN {row}.pnl ELSE 0 END)"
+
+    def delta(expr):
+        new = expr('NEW')
+        return f"({new} - {expr('OLD')})" if has_old else new
+
+    d_trades = delta(counted)
+    d_win = delta(lambda row: f"({counted(row)} AND {row}.pnl > 0)")
+    d_loss = delta(lambda row: f"({counted(row)} AND {row}.pnl < 0)")
+    d_pnl = delta(pnl)
+    d_profit = delta(lambda row: f"MAX({pnl(row)}, 0)")
+    d_loss_amount = delta(lambda row: f"MAX(-{pnl(row)}, 0)")
+    total = f"(total_pnl + {d_pnl})"
+    when = f"{counted('NEW')} OR {counted('OLD')}" if has_old else counted('NEW')
+
+    return f'''
+    CREATE TRIGGER IF NOT EXISTS {name}
+    AFTER {event} ON strategy_trades
+    WHEN {when}
+    BEGIN
+        INSERT INTO strategy_metrics (strategy_name) VALUES (NEW.strategy_name)
+        ON CONFLICT(strategy_name) DO NOTHING;
+        UPDATE strategy_metrics SET
+            total_trades = total_trades + {d_trades},
+            winning_trades = winning_trades + {d_win},
+            losing_trades = losing_trades + {d_loss},
+            total_pnl = {total},
+            gross_profit = gross_profit + {d_profit},
+            gross_loss = gross_loss + {d_loss_amount},
+            peak_pnl = MAX(peak_pnl, {total}),
+            max_drawdown = MAX(max_drawdown, MAX(peak_pnl, {total}) - {total}),
+            last_updated = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+        WHERE strategy_name = NEW.strategy_name;
+        UPDATE strategy_metrics SET
+            win_rate = CASE WHEN total_trades > 0 THEN winning_trades * 100.0 / total_trades ELSE 0 END,
+            avg_trade = CASE WHEN total_trades > 0 THEN total_pnl / total_trades ELSE 0 END,
+            profit_factor = CASE WHEN gross_loss > 0 THEN gross_profit / gross_loss END
+        WHERE strategy_name = NEW.strategy_name;
+    END
+    '''
+
+
+METRICS_TRIGGERS = (
+    _metrics_trigger_sql('trg_trades_metrics_insert', 'INSERT', has_old=False),
+    _metrics_trigger_sql('trg_trades_metrics_update', 'UPDATE OF status, pnl', has_old=True),
+)
+
 # Strategy Logging Functions
 def log_strategy_event(strategy_name, level, event_type, message, data=None):
     """
@@ -182,22 +351,16 @@ def log_strategy_event(strategy_name, level, event_type, message, data=None):
         message: Log message
         data: Optional dict with additional data
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     
     data_json = json.dumps(data) if data else None
     
-    cursor.execute('''
-    INSERT INTO strategy_logs (strategy_name, timestamp, level, event_type, message, data)
-    VALUES (?, ?, ?, ?, ?, ?)
-    ''', (strategy_name, datetime.now(), level, event_type, message, data_json))
-    
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(INSERT_LOG_SQL, (strategy_name, datetime.now(), level, event_type, message, data_json))
 
 def get_strategy_logs(strategy_name, limit=100, level=None):
     """Get recent logs for a strategy"""
-    conn = get_db_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     
     if level:
@@ -216,7 +379,6 @@ def get_strategy_logs(strategy_name, limit=100, level=None):
         ''', (strategy_name, limit))
     
     rows = cursor.fetchall()
-    conn.close()
     
     logs = []
     for row in rows:
@@ -230,97 +392,164 @@ def get_strategy_logs(strategy_name, limit=100, level=None):
 # Trade Recording Functions
 def log_trade(strategy_name, symbol, side, order_type, price, quantity, order_id=None, status='PENDING', pnl=None):
     """Record a trade"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     
-    cursor.execute('''
-    INSERT INTO strategy_trades (strategy_name, timestamp, symbol, side, order_type, price, quantity, order_id, status, pnl)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (strategy_name, datetime.now(), symbol, side, order_type, price, quantity, order_id, status, pnl))
-    
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(INSERT_TRADE_SQL, (strategy_name, datetime.now(), symbol, side, order_type, price, quantity,
+                                        order_id, status, pnl))
 
 def update_trade_status(order_id, status, pnl=None):
     """Update trade status"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     
-    if pnl is not None:
-        cursor.execute('''
-        UPDATE strategy_trades 
-        SET status = ?, pnl = ?
-        WHERE order_id = ?
-        ''', (status, pnl, order_id))
-    else:
-        cursor.execute('''
-        UPDATE strategy_trades 
-        SET status = ?
-        WHERE order_id = ?
-        ''', (status, order_id))
+    with conn:
+        conn.execute(UPDATE_TRADE_STATUS_SQL, (status, pnl, order_id))
+
+def update_trade_fill(order_id, status, filled_quantity, fill_price, fee=None, pnl=None):
+    """Update status, cumulative fill and realized pnl of an order"""
+    conn = get_connection()
     
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(UPDATE_TRADE_FILL_SQL, (status, filled_quantity, fill_price, fee, pnl, order_id))
+
+def get_open_trades(strategy_name):
+    """Submitted orders of a strategy that are not filled or cancelled yet"""
+    conn = get_connection()
+    
+    rows = conn.execute('''
+    SELECT * FROM strategy_trades
+    WHERE strategy_name = ? AND status IN ('SUBMITTED', 'PARTIALLY_FILLED') AND order_id IS NOT NULL
+    ORDER BY id
+    ''', (strategy_name,)).fetchall()
+    
+    return [dict(row) for row in rows]
+
+def get_filled_trades(strategy_name):
+    """Trades of a strategy with a recorded fill, oldest first (used to rebuild position cost)"""
+    conn = get_connection()
+    
+    rows = conn.execute('''
+    SELECT * FROM strategy_trades
+    WHERE strategy_name = ? AND filled_quantity > 0
+    ORDER BY id
+    ''', (strategy_name,)).fetchall()
+    
+    return [dict(row) for row in rows]
 
 def get_strategy_trades(strategy_name, limit=50):
     """Get recent trades for a strategy"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     
-    cursor.execute('''
+    rows = conn.execute('''
     SELECT * FROM strategy_trades 
     WHERE strategy_name = ?
     ORDER BY timestamp DESC 
     LIMIT ?
-    ''', (strategy_name, limit))
-    
-    rows = cursor.fetchall()
-    conn.close()
+    ''', (strategy_name, limit)).fetchall()
     
     return [dict(row) for row in rows]
 
 # Metrics Functions
-def update_strategy_metrics(strategy_name):
-    """Calculate and update strategy performance metrics"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all completed trades
-    cursor.execute('''
-    SELECT * FROM strategy_trades 
-    WHERE strategy_name = ? AND status = 'FILLED' AND pnl IS NOT NULL
-    ''', (strategy_name,))
-    
-    trades = cursor.fetchall()
-    
-    total_trades = len(trades)
-    winning_trades = sum(1 for t in trades if t['pnl'] > 0)
-    losing_trades = sum(1 for t in trades if t['pnl'] < 0)
-    total_pnl = sum(t['pnl'] for t in trades if t['pnl'])
-    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-    
-    # Insert or update metrics
-    cursor.execute('''
-    INSERT OR REPLACE INTO strategy_metrics 
-    (strategy_name, total_trades, winning_trades, losing_trades, total_pnl, win_rate, last_updated)
-    VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (strategy_name, total_trades, winning_trades, losing_trades, total_pnl, win_rate, datetime.now()))
+DRAWDOWN_COLUMNS = ('peak_pnl', 'max_drawdown')
+
+def compute_strategy_metrics(trades):
+    """Metrics of an iterable of strategy_trades rows in id order (the full recompute the triggers mirror)"""
+    metrics = {'total_trades': 0, 'winning_trades': 0, 'losing_trades': 0, 'total_pnl': 0.0, 'win_rate': 0.0,
+               'gross_profit': 0.0, 'gross_loss': 0.0, 'peak_pnl': 0.0, 'max_drawdown': 0.0,
+               'profit_factor': None, 'avg_trade': 0.0}
+    for t in trades:
+        pnl = t['pnl']
+        if pnl is None or t['status'] not in FILL_STATUSES:
+            continue
+        metrics['total_trades'] += 1
+        if pnl > 0:
+            metrics['winning_trades'] += 1
+            metrics['gross_profit'] += pnl
+        elif pnl < 0:
+            metrics['losing_trades'] += 1
+            metrics['gross_loss'] -= pnl
+        metrics['total_pnl'] += pnl
+        metrics['peak_pnl'] = max(metrics['peak_pnl'], metrics['total_pnl'])
+        metrics['max_drawdown'] = max(metrics['max_drawdown'], metrics['peak_pnl'] - metrics['total_pnl'])
+    if metrics['total_trades']:
+        metrics['win_rate'] = metrics['winning_trades'] * 100.0 / metrics['total_trades']
+        metrics['avg_trade'] = metrics['total_pnl'] / metrics['total_trades']
+    if metrics['gross_loss'] > 0:
+        metrics['profit_factor'] = metrics['gross_profit'] / metrics['gross_loss']
+    return metrics
+
+def rebuild_strategy_metrics(strategy_name=None, write=True):
+    """
+    Recompute strategy_metrics from the full trade history.
+
+    The triggers keep metrics up to date incrementally; this is for verification and
+    for repairing rows after manual edits. Covers every strategy with trades when
+    strategy_name is None.
+
+    Returns:
+        dict: strategy_name -> recomputed metrics
+    """
+    conn = get_connection()
     
-    conn.commit()
-    conn.close()
+    if strategy_name is None:
+        names = [row[0] for row in conn.execute('SELECT DISTINCT strategy_name FROM strategy_trades')]
+    else:
+        names = [strategy_name]
+
+    results = {}
+    with conn:
+        for name in names:
+            trades = conn.execute(
+                'SELECT status, pnl FROM strategy_trades WHERE strategy_name = ? ORDER BY id', (name,))
+            metrics = compute_strategy_metrics(trades)
+            results[name] = metrics
+            if write:
+                conn.execute(f'''
+                INSERT OR REPLACE INTO strategy_metrics (strategy_name, {', '.join(metrics)}, last_updated)
+                VALUES (?, {', '.join('?' * len(metrics))}, ?)
+                ''', (name, *metrics.values(), datetime.now()))
+    return results
+
+def update_strategy_metrics(strategy_name):
+    """Recalculate strategy performance metrics from trade history"""
+    return rebuild_strategy_metrics(strategy_name)[strategy_name]
+
+def check_strategy_metrics(strategy_name=None, tolerance=1e-6, include_drawdown=False):
+    """
+    Compare the incrementally maintained metrics with a full recompute.
+
+    peak_pnl and max_drawdown depend on the order pnl was realized (including partial
+    fills), which the history replay in id order cannot reproduce, so they are only
+    compared with include_drawdown=True.
+
+    Returns:
+        dict: strategy_name -> {column: (stored, recomputed)} for columns that differ
+    """
+    mismatches = {}
+    for name, expected in rebuild_strategy_metrics(strategy_name, write=False).items():
+        stored = get_strategy_metrics(name)
+        diff = {}
+        for column, value in expected.items():
+            if column in DRAWDOWN_COLUMNS and not include_drawdown:
+                continue
+            current = stored.get(column)
+            if value is None or current is None:
+                if value != current:
+                    diff[column] = (current, value)
+            elif abs(current - value) > tolerance * max(1.0, abs(value)):
+                diff[column] = (current, value)
+        if diff:
+            mismatches[name] = diff
+    return mismatches
 
 def get_strategy_metrics(strategy_name):
     """Get performance metrics for a strategy"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     
-    cursor.execute('''
+    row = conn.execute('''
     SELECT * FROM strategy_metrics 
     WHERE strategy_name = ?
-    ''', (strategy_name,))
-    
-    row = cursor.fetchone()
-    conn.close()
+    ''', (strategy_name,)).fetchone()
     
     if row:
         return dict(row)
@@ -333,5 +562,31 @@ def get_strategy_metrics(strategy_name):
             'losing_trades': 0,
             'total_pnl': 0,
             'win_rate': 0,
+            'gross_profit': 0,
+            'gross_loss': 0,
+            'peak_pnl': 0,
+            'max_drawdown': 0,
+            'profit_factor': None,
+            'avg_trade': 0,
             'last_updated': None
         }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintenance commands for the quant database')
+    parser.add_argument('command', choices=['rebuild-metrics', 'check-metrics'])
+    parser.add_argument('strategy_name', nargs='?', help='Only this strategy (default: all)')
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == 'rebuild-metrics':
+        for name, metrics in rebuild_strategy_metrics(args.strategy_name).items():
+            print(f"{name}: {metrics['total_trades']} trades, pnl {metrics['total_pnl']:.4f}, "
+                  f"max drawdown {metrics['max_drawdown']:.4f}")
+    else:
+        mismatches = check_strategy_metrics(args.strategy_name)
+        for name, diff in mismatches.items():
+            print(f"{name}: " + ', '.join(f"{col} stored={a} expected={b}" for col, (a, b) in diff.items()))
+        print('OK' if not mismatches else f'{len(mismatches)} strategies differ')
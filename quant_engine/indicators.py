@@ -0,0 +1,431 @@
+"""
+Indicators - 技术指标
+每个指标提供两种形式，数值一致（预热期之外逐点相同）:
+
+- 流式类（EMA、SMA、RSI、ATR、MACD、KDJ、Bollinger、Donchian）：每根K线调用一次 update()，O(1) 更新，
+  供 handle_data 使用，不必每个周期从整段 price_history 重算。预热期内 update() 返回 None
+- 批量函数（ema、sma、rsi、atr、macd、kdj、bollinger、donchian）：输入整段数组，返回同长度的 NumPy 数组，
+  预热期为 NaN，供 compute_signals 向量化回测使用
+
+约定:
+    EMA 以前 period 个值的简单平均作为初值（与 strategy/ema.py 的 calculate_ema 相同）
+    RSI、ATR 使用 Wilder 平滑（alpha = 1/period），初值同样为前 period 个值的简单平均
+    MACD 返回 (DIF, DEA, 柱)，柱 = DIF - DEA
+    KDJ 的 K、D 初值为 50，最高价等于最低价时 RSV 取 50
+    Bollinger 的标准差为总体标准差（ddof=0）
+
+策略代码中可直接使用流式类，批量函数通过 indicators.ema(...) 等调用（见 INDICATOR_SCOPE）。
+"""
+
+import math
+import sys
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _check_period(period):
+    period = int(period)
+    if period < 1:
+        raise ValueError(f'period must be >= 1, got {period}')
+    return period
+
+
+# ---------------------------------------------------------------------------
+# 流式指标
+# ---------------------------------------------------------------------------
+
+class EMA:
+    def __init__(self, period):
+        self.period = _check_period(period)
+        self.alpha = 2.0 / (self.period + 1)
+        self.value = None
+        self._count = 0
+        self._seed = 0.0
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, price):
+        if self.value is not None:
+            self.value += (price - self.value) * self.alpha
+            return self.value
+        self._count += 1
+        self._seed += price
+        if self._count == self.period:
+            self.value = self._seed / self.period
+        return self.value
+
+
+class _Wilder(EMA):
+    """Wilder 平滑：alpha = 1/period 的 EMA"""
+
+    def __init__(self, period):
+        super().__init__(period)
+        self.alpha = 1.0 / self.period
+
+
+class SMA:
+    def __init__(self, period):
+        self.period = _check_period(period)
+        self.window = deque(maxlen=self.period)
+        self.total = 0.0
+        self.value = None
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, price):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(price)
+        self.total += price
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+class RSI:
+    def __init__(self, period=14):
+        self.period = _check_period(period)
+        self.gain = _Wilder(self.period)
+        self.loss = _Wilder(self.period)
+        self.prev = None
+        self.value = None
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, price):
+        if self.prev is None:
+            self.prev = price
+            return None
+        change = price - self.prev
+        self.prev = price
+        gain = self.gain.update(max(change, 0.0))
+        loss = self.loss.update(max(-change, 0.0))
+        if gain is not None:
+            self.value = _rsi_value(gain, loss)
+        return self.value
+
+
+def _rsi_value(gain, loss):
+    if loss == 0:
+        return 100.0 if gain > 0 else 50.0
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+class ATR:
+    def __init__(self, period=14):
+        self.period = _check_period(period)
+        self.smooth = _Wilder(self.period)
+        self.prev_close = None
+        self.value = None
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, high, low, close):
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.value = self.smooth.update(tr)
+        return self.value
+
+
+class MACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.dif = None
+        self.dea = None
+        self.hist = None
+
+    @property
+    def ready(self):
+        return self.dea is not None
+
+    def update(self, price):
+        """Returns: (dif, dea, hist)，DEA 预热完成前返回 None（dif 属性可能已有值）"""
+        fast = self.fast.update(price)
+        slow = self.slow.update(price)
+        if fast is None or slow is None:
+            return None
+        self.dif = fast - slow
+        self.dea = self.signal.update(self.dif)
+        if self.dea is None:
+            return None
+        self.hist = self.dif - self.dea
+        return self.dif, self.dea, self.hist
+
+
+class Donchian:
+    """最近 period 根K线（含当前）的最高价 / 最低价，单调队列维护，每次更新均摊 O(1)"""
+
+    def __init__(self, period=20):
+        self.period = _check_period(period)
+        self.count = 0
+        self._highs = deque()  # (序号, 价格)，价格单调递减
+        self._lows = deque()  # 价格单调递增
+        self.upper = None
+        self.lower = None
+
+    @property
+    def ready(self):
+        return self.upper is not None
+
+    @property
+    def mid(self):
+        return None if self.upper is None else (self.upper + self.lower) / 2
+
+    def update(self, high, low=None):
+        """
+        Args:
+            high, low: 当根K线的最高价和最低价；只有收盘价时只传一个值
+
+        Returns:
+            (upper, lower)，预热期返回 None
+        """
+        if low is None:
+            low = high
+        i = self.count
+        self.count += 1
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((i, high))
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((i, low))
+        start = i - self.period + 1
+        if self._highs[0][0] < start:
+            self._highs.popleft()
+        if self._lows[0][0] < start:
+            self._lows.popleft()
+        if self.count < self.period:
+            return None
+        self.upper = self._highs[0][1]
+        self.lower = self._lows[0][1]
+        return self.upper, self.lower
+
+
+class KDJ:
+    def __init__(self, n=9, m1=3, m2=3):
+        self.range = Donchian(n)
+        self.k_alpha = 1.0 / _check_period(m1)
+        self.d_alpha = 1.0 / _check_period(m2)
+        self.k = 50.0
+        self.d = 50.0
+        self.j = None
+
+    @property
+    def ready(self):
+        return self.j is not None
+
+    def update(self, high, low, close):
+        """Returns: (k, d, j)，预热期返回 None"""
+        if self.range.update(high, low) is None:
+            return None
+        self.k += (_rsv(close, self.range.upper, self.range.lower) - self.k) * self.k_alpha
+        self.d += (self.k - self.d) * self.d_alpha
+        self.j = 3 * self.k - 2 * self.d
+        return self.k, self.d, self.j
+
+
+def _rsv(close, upper, lower):
+    spread = upper - lower
+    return (close - lower) / spread * 100 if spread > 0 else 50.0
+
+
+class Bollinger:
+    """
+    中轨为 period 周期均线，上下轨为中轨 ± k 倍标准差
+    滑动窗口上的 Welford 更新均值和平方差和，避免 sum(x^2) 在高价位时的精度损失
+    """
+
+    def __init__(self, period=20, k=2.0):
+        self.period = _check_period(period)
+        self.k = k
+        self.window = deque(maxlen=self.period)
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.mid = None
+        self.upper = None
+        self.lower = None
+
+    @property
+    def ready(self):
+        return self.mid is not None
+
+    def update(self, price):
+        """Returns: (mid, upper, lower)，预热期返回 None"""
+        if len(self.window) == self.period:
+            old = self.window[0]
+            self.window.append(price)
+            mean = self._mean + (price - old) / self.period
+            self._m2 += (price - old) * (price - mean + old - self._mean)
+            self._mean = mean
+        else:
+            self.window.append(price)
+            delta = price - self._mean
+            self._mean += delta / len(self.window)
+            self._m2 += delta * (price - self._mean)
+        if len(self.window) < self.period:
+            return None
+        std = math.sqrt(max(self._m2, 0.0) / self.period)
+        self.mid = self._mean
+        self.upper = self._mean + self.k * std
+        self.lower = self._mean - self.k * std
+        return self.mid, self.upper, self.lower
+
+
+# ---------------------------------------------------------------------------
+# 批量指标
+# ---------------------------------------------------------------------------
+
+def _array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _smooth(values, alpha, period):
+    """以前 period 个值的平均为初值的递推平滑（EMA / Wilder），递推由 pandas ewm 在 C 层完成"""
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+    seeded = values[period - 1:].copy()
+    seeded[0] = values[:period].mean()
+    out[period - 1:] = pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+def _smooth_from(values, alpha, seed):
+    """以固定初值 seed 开始的递推平滑，第一个输出已包含 values[0]"""
+    if len(values) == 0:
+        return np.empty(0)
+    return pd.Series(np.concatenate(([seed], values))).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def _tail(values, start, series):
+    """把从 start 开始计算出的序列放回与 values 等长的 NaN 数组"""
+    out = np.full(len(values), np.nan)
+    out[start:] = series
+    return out
+
+
+def ema(values, period):
+    period = _check_period(period)
+    return _smooth(_array(values), 2.0 / (period + 1), period)
+
+
+def sma(values, period):
+    period = _check_period(period)
+    values = _array(values)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = sliding_window_view(values, period).mean(axis=1)
+    return out
+
+
+def rsi(values, period=14):
+    period = _check_period(period)
+    values = _array(values)
+    out = np.full(len(values), np.nan)
+    if len(values) < 2:
+        return out
+    change = np.diff(values)
+    gain = _smooth(np.maximum(change, 0.0), 1.0 / period, period)
+    loss = _smooth(np.maximum(-change, 0.0), 1.0 / period, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100.0 - 100.0 / (1.0 + gain / loss)
+    value = np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), value)
+    out[1:] = np.where(np.isnan(gain), np.nan, value)
+    return out
+
+
+def true_range(high, low, close):
+    high, low, close = _array(high), _array(low), _array(close)
+    tr = high - low
+    if len(tr) > 1:
+        prev = close[:-1]
+        tr[1:] = np.maximum.reduce([tr[1:], np.abs(high[1:] - prev), np.abs(low[1:] - prev)])
+    return tr
+
+
+def atr(high, low, close, period=14):
+    period = _check_period(period)
+    return _smooth(true_range(high, low, close), 1.0 / period, period)
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """Returns: (dif, dea, hist) 三个数组"""
+    values = _array(values)
+    dif = ema(values, fast) - ema(values, slow)
+    start = max(_check_period(fast), _check_period(slow)) - 1
+    dea = np.full(len(values), np.nan)
+    if len(values) > start:
+        dea[start:] = ema(dif[start:], signal)
+    return dif, dea, dif - dea
+
+
+def donchian(high, low=None, period=20):
+    """Returns: (upper, lower)，含当前K线的最近 period 根最高价 / 最低价"""
+    period = _check_period(period)
+    high = _array(high)
+    low = high if low is None else _array(low)
+    upper = np.full(len(high), np.nan)
+    lower = np.full(len(low), np.nan)
+    if len(high) >= period:
+        upper[period - 1:] = sliding_window_view(high, period).max(axis=1)
+        lower[period - 1:] = sliding_window_view(low, period).min(axis=1)
+    return upper, lower
+
+
+def kdj(high, low, close, n=9, m1=3, m2=3):
+    """Returns: (k, d, j) 三个数组"""
+    close = _array(close)
+    upper, lower = donchian(high, low, n)
+    start = _check_period(n) - 1
+    if len(close) <= start:
+        empty = np.full(len(close), np.nan)
+        return empty, empty.copy(), empty.copy()
+    spread = upper[start:] - lower[start:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = np.where(spread > 0, (close[start:] - lower[start:]) / spread * 100, 50.0)
+    k = _smooth_from(rsv, 1.0 / _check_period(m1), 50.0)
+    d = _smooth_from(k, 1.0 / _check_period(m2), 50.0)
+    return _tail(close, start, k), _tail(close, start, d), _tail(close, start, 3 * k - 2 * d)
+
+
+def bollinger(values, period=20, k=2.0):
+    """Returns: (mid, upper, lower) 三个数组"""
+    period = _check_period(period)
+    values = _array(values)
+    mid = np.full(len(values), np.nan)
+    std = np.full(len(values), np.nan)
+    if len(values) >= period:
+        windows = sliding_window_view(values, period)
+        mid[period - 1:] = windows.mean(axis=1)
+        std[period - 1:] = windows.std(axis=1)
+    return mid, mid + k * std, mid - k * std
+
+
+# 注入策略 exec 作用域的名称（strategy_runner、app.run_strategy_thread、BacktestEngine.run）
+INDICATOR_SCOPE = {
+    'indicators': sys.modules[__name__],
+    'EMA': EMA,
+    'SMA': SMA,
+    'RSI': RSI,
+    'ATR': ATR,
+    'MACD': MACD,
+    'KDJ': KDJ,
+    'Bollinger': Bollinger,
+    'Donchian': Donchian,
+}
@@ -0,0 +1,198 @@
+"""
+Kline Store - 列式K线存储
+与 SQLite market_klines 并存，按 symbol/bar/月 分区保存为每列一个 .npy 文件，
+读取时内存映射（mmap），避免逐行经过 pd.read_sql_query。
+
+目录结构:
+    kline_store/<symbol>/<bar>/<YYYY-MM>/{ts,open,high,low,close,vol,vol_ccy,vol_ccy_quote}.npy
+
+迁移已有数据:
+    python -m quant_engine.kline_store migrate [--symbol BTC-USDT] [--bar 1H]
+
+完整性标记:
+    序列目录下的 COMPLETE_MARKER 表示该序列已包含 SQLite 中的全部K线（migrate 或首次写入时回填后设置），
+    MarketDataManager 只在有标记时从列式存储读取，否则读取 SQLite，不会因为只写入了部分新数据而丢失旧历史
+"""
+
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.path.join(os.getcwd(), 'kline_store')
+
+COMPLETE_MARKER = '.complete'
+
+STORE_COLUMNS = (
+    ('ts', 'int64'),
+    ('open', 'float64'),
+    ('high', 'float64'),
+    ('low', 'float64'),
+    ('close', 'float64'),
+    ('vol', 'float64'),
+    ('vol_ccy', 'float64'),
+    ('vol_ccy_quote', 'float64'),
+)
+
+
+def klines_to_columns(klines):
+    """OKX K线列表 [[ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm], ...] -> {列名: ndarray}"""
+    columns = {}
+    for i, (name, dtype) in enumerate(STORE_COLUMNS):
+        if dtype == 'int64':
+            columns[name] = np.array([int(k[i]) for k in klines], dtype=np.int64)
+        else:
+            columns[name] = np.array([float(k[i]) if len(k) > i and k[i] else np.nan for k in klines], dtype=np.float64)
+    return columns
+
+
+def month_keys(ts):
+    """毫秒时间戳数组 -> 'YYYY-MM' 分区键数组（UTC）"""
+    return np.datetime_as_string(ts.astype('datetime64[ms]').astype('datetime64[M]'), unit='M')
+
+
+class KlineStore:
+    def __init__(self, root=None):
+        self.root = root or STORE_DIR
+
+    def _series_dir(self, symbol, bar):
+        return os.path.join(self.root, symbol, bar)
+
+    def partitions(self, symbol, bar):
+        """已有的月份分区，升序"""
+        path = self._series_dir(symbol, bar)
+        if not os.path.isdir(path):
+            return []
+        return sorted(p for p in os.listdir(path) if len(p) == 7 and p[4] == '-')
+
+    def has(self, symbol, bar):
+        return bool(self.partitions(symbol, bar))
+
+    def is_complete(self, symbol, bar):
+        """序列是否已包含 SQLite 中的全部K线（见 mark_complete）"""
+        return os.path.exists(os.path.join(self._series_dir(symbol, bar), COMPLETE_MARKER))
+
+    def mark_complete(self, symbol, bar):
+        series_dir = self._series_dir(symbol, bar)
+        os.makedirs(series_dir, exist_ok=True)
+        with open(os.path.join(series_dir, COMPLETE_MARKER), 'w'):
+            pass
+
+    def _load_partition(self, symbol, bar, month, mmap=True):
+        path = os.path.join(self._series_dir(symbol, bar), month)
+        mode = 'r' if mmap else None
+        columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode) for name, _ in STORE_COLUMNS}
+        if len({len(c) for c in columns.values()}) != 1:
+            raise ValueError(f'Corrupt kline partition: {path}')
+        return columns
+
+    def _write_partition(self, symbol, bar, month, columns):
+        """先写临时目录再整体替换，读取方不会看到列长度不一致的分区"""
+        series_dir = self._series_dir(symbol, bar)
+        final = os.path.join(series_dir, month)
+        tmp = f'{final}.tmp-{os.getpid()}'
+        old = f'{final}.old-{os.getpid()}'
+        os.makedirs(tmp, exist_ok=True)
+        for name, dtype in STORE_COLUMNS:
+            np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(columns[name], dtype=dtype))
+        if os.path.isdir(final):
+            os.replace(final, old)
+        os.replace(tmp, final)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def write(self, symbol, bar, columns):
+        """
+        合并写入K线列数据，按 ts 去重（新数据覆盖旧数据）并排序
+
+        Args:
+            columns: {列名: ndarray}，至少包含 ts/open/high/low/close
+
+        Returns:
+            int: 写入的K线数量
+        """
+        ts = np.asarray(columns['ts'], dtype=np.int64)
+        if len(ts) == 0:
+            return 0
+        new = {name: np.asarray(columns[name], dtype=dtype) if name in columns else np.full(len(ts), np.nan)
+               for name, dtype in STORE_COLUMNS}
+        keys = month_keys(ts)
+        existing = set(self.partitions(symbol, bar))
+
+        for month in np.unique(keys):
+            mask = keys == month
+            part = {name: values[mask] for name, values in new.items()}
+            if month in existing:
+                old = self._load_partition(symbol, bar, month, mmap=False)
+                part = {name: np.concatenate([old[name], part[name]]) for name, _ in STORE_COLUMNS}
+            # 倒序后 np.unique 取到的是每个 ts 最后写入的那一条
+            reversed_ts = part['ts'][::-1]
+            _, idx = np.unique(reversed_ts, return_index=True)
+            order = len(reversed_ts) - 1 - idx
+            self._write_partition(symbol, bar, month, {name: values[order] for name, values in part.items()})
+        return int(len(ts))
+
+    def read(self, symbol, bar, start_ts=None, end_ts=None):
+        """
+        读取 [start_ts, end_ts] 范围内的K线，单个分区时返回的列直接是内存映射
+
+        Returns:
+            DataFrame: ts, open, high, low, close, vol, vol_ccy, vol_ccy_quote（按 ts 升序）
+        """
+        months = self.partitions(symbol, bar)
+        if start_ts is not None:
+            first = str(month_keys(np.array([start_ts], dtype=np.int64))[0])
+            months = [m for m in months if m >= first]
+        if end_ts is not None:
+            last = str(month_keys(np.array([end_ts], dtype=np.int64))[0])
+            months = [m for m in months if m <= last]
+
+        parts = [self._load_partition(symbol, bar, m) for m in months]
+        if not parts:
+            return pd.DataFrame({name: np.array([], dtype=dtype) for name, dtype in STORE_COLUMNS})
+        if len(parts) == 1:
+            columns = parts[0]
+        else:
+            columns = {name: np.concatenate([p[name] for p in parts]) for name, _ in STORE_COLUMNS}
+
+        ts = columns['ts']
+        lo = np.searchsorted(ts, start_ts, side='left') if start_ts is not None else 0
+        hi = np.searchsorted(ts, end_ts, side='right') if end_ts is not None else len(ts)
+        return pd.DataFrame({name: values[lo:hi] for name, values in columns.items()}, copy=False)
+
+    def info(self, symbol, bar):
+        """{'count', 'min_ts', 'max_ts'}，只读取每个分区的 ts 列"""
+        count, min_ts, max_ts = 0, None, None
+        for month in self.partitions(symbol, bar):
+            ts = np.load(os.path.join(self._series_dir(symbol, bar), month, 'ts.npy'), mmap_mode='r')
+            if len(ts):
+                count += len(ts)
+                min_ts = int(ts[0]) if min_ts is None else min_ts
+                max_ts = int(ts[-1])
+        return {'count': count, 'min_ts': min_ts, 'max_ts': max_ts}
+
+    def delete(self, symbol, bar=None):
+        path = self._series_dir(symbol, bar) if bar else os.path.join(self.root, symbol)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar kline store maintenance')
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate = sub.add_parser('migrate', help='Copy existing SQLite market_klines rows into the columnar store')
+    migrate.add_argument('--symbol', type=str, default=None)
+    migrate.add_argument('--bar', type=str, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        from quant_engine.market_data import MarketDataManager
+        for item in MarketDataManager().migrate_to_store(args.symbol, args.bar):
+            print(f"{item['symbol']} {item['bar']}: {item['count']} klines")
+
+
+if __name__ == '__main__':
+    main()
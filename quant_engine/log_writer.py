@@ -0,0 +1,325 @@
+"""
+Log Writer - 策略日志/成交记录的后台批量写入
+交易循环只把记录放进队列，由每个进程一个的后台线程按数量或时间阈值合并成一个事务写入，
+慢磁盘或数据库锁不会再阻塞下单。
+
+- 队列过长时施加背压：普通日志最多等待 BACKPRESSURE_TIMEOUT 秒后丢弃并计数；成交记录一直等待，不丢弃
+- 进程正常退出（atexit）和收到 SIGTERM/SIGINT 时写完队列中的所有记录
+- submit_many 提交的一组记录（如一次批量下单的全部成交和日志）总在同一个事务中写入
+"""
+
+import atexit
+import json
+import os
+import queue
+import signal
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+
+from quant_engine.db import get_connection, INSERT_LOG_SQL, INSERT_TRADE_SQL, UPDATE_TRADE_STATUS_SQL, UPDATE_TRADE_FILL_SQL
+
+# 攒够多少条记录写一次
+FLUSH_BATCH_SIZE = 200
+
+# 第一条记录入队后最多等待多少秒写入
+FLUSH_INTERVAL = 0.5
+
+# 队列上限，超过后对写入方施加背压
+MAX_PENDING = 10000
+
+# 普通日志在队列满时最多等待的秒数
+BACKPRESSURE_TIMEOUT = 1.0
+
+# 退出时数据库仍被锁，最多再重试的次数
+MAX_RETRIES = 8
+
+_WAKE = object()
+
+
+class BufferedLogWriter:
+    def __init__(self, batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING,
+                 backpressure_timeout=BACKPRESSURE_TIMEOUT, max_retries=MAX_RETRIES):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure_timeout = backpressure_timeout
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._cond = threading.Condition()
+        self._submitted = 0
+        self._done = 0
+        self._closing = False
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, sql, params, critical=False):
+        """
+        放入一条待写入的记录
+
+        Args:
+            critical: 成交记录等不可丢失的数据，队列满时一直等待
+
+        Returns:
+            bool: False 表示队列持续满载，记录被丢弃
+        """
+        record = (sql, params)
+        if self._closing:
+            # 写入线程已退出（如 atexit 之后仍有日志），直接同步写入
+            self._write([record])
+            return True
+
+        self._ensure_started()
+        with self._cond:
+            self._submitted += 1
+        try:
+            self._queue.put(record, timeout=None if critical else self.backpressure_timeout)
+        except queue.Full:
+            with self._cond:
+                self._submitted -= 1
+                self.dropped += 1
+                self._cond.notify_all()
+            return False
+        return True
+
+    def submit_many(self, records, critical=False):
+        """
+        放入一组 (sql, params) 记录，作为队列中的一项，保证在同一个事务中写入
+
+        Returns:
+            bool: False 表示队列持续满载，整组记录被丢弃
+        """
+        records = list(records)
+        if not records:
+            return True
+        if self._closing:
+            self._write(records)
+            return True
+        self._ensure_started()
+        with self._cond:
+            self._submitted += len(records)
+        try:
+            self._queue.put(records, timeout=None if critical else self.backpressure_timeout)
+        except queue.Full:
+            with self._cond:
+                self._submitted -= len(records)
+                self.dropped += len(records)
+                self._cond.notify_all()
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """等待此前提交的记录全部写入，返回是否在超时前完成"""
+        if self._thread is None:
+            return True
+        with self._cond:
+            target = self._submitted
+        self._queue.put(_WAKE)
+        with self._cond:
+            return self._cond.wait_for(lambda: self._done >= min(target, self._submitted), timeout)
+
+    def close(self, timeout=None):
+        """写完队列中的记录并停止后台线程"""
+        if self._closing:
+            return
+        self._closing = True
+        if self._thread is not None:
+            self._queue.put(_WAKE)
+            self._thread.join(timeout)
+        # 后台线程退出前其他线程刚放入的记录
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, list):
+                leftover.extend(item)
+            elif item is not _WAKE:
+                leftover.append(item)
+        if leftover:
+            self._write(leftover)
+
+    def stats(self):
+        return {'pending': self._queue.qsize(), 'written': self.written, 'dropped': self.dropped,
+                'failed_flushes': self.failed_flushes}
+
+    def _collect(self):
+        """取出一批记录：攒满 batch_size、第一条记录等待超过 flush_interval 或收到 flush 请求时返回"""
+        batch = []
+        deadline = None
+        urgent = False
+        while len(batch) < self.batch_size:
+            if urgent or self._closing:
+                timeout = 0
+            elif deadline is None:
+                timeout = self.flush_interval
+            else:
+                timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                if batch or urgent or self._closing:
+                    break
+                continue
+            if item is _WAKE:
+                urgent = True
+                continue
+            if isinstance(item, list):
+                batch.extend(item)  # submit_many 的一组记录不拆开
+            else:
+                batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+            elif self._closing and self._queue.empty():
+                return
+
+    def _execute(self, batch):
+        conn = get_connection()
+        with conn:
+            # 相邻的同类记录合并成一次 executemany，保持提交顺序（先插入成交，再更新状态）
+            for sql, group in groupby(batch, key=lambda record: record[0]):
+                conn.executemany(sql, [params for _, params in group])
+
+    def _write(self, batch):
+        attempt = 0
+        while True:
+            try:
+                self._execute(batch)
+                self.written += len(batch)
+                break
+            except sqlite3.OperationalError as e:
+                # 数据库被锁是暂时的：运行期间一直重试（队列因此变长，由背压限制），退出时最多重试 max_retries 次
+                if not _is_transient(e) or (self._closing and attempt >= self.max_retries):
+                    self._write_each(batch)
+                    break
+                attempt += 1
+                self.failed_flushes += 1
+                if attempt == 1 or attempt % 10 == 0:
+                    print(f"[LOG WRITER] Flush of {len(batch)} records failed ({e}), retrying")
+                time.sleep(min(0.1 * 2 ** attempt, 5))
+            except sqlite3.Error:
+                self._write_each(batch)
+                break
+
+        with self._cond:
+            self._done += len(batch)
+            self._cond.notify_all()
+
+    def _write_each(self, batch):
+        """逐条写入，只丢弃本身无法写入的记录，并打印到标准输出留底"""
+        for record in batch:
+            try:
+                self._execute([record])
+                self.written += 1
+            except sqlite3.Error as e:
+                self.dropped += 1
+                print(f"[LOG WRITER] Dropped record {record[1]}: {e}")
+
+
+def _is_transient(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """当前进程的写入器（fork 出的子进程会新建自己的）"""
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = BufferedLogWriter()
+                _writer_pid = os.getpid()
+    return _writer
+
+
+def trade_record(strategy_name, symbol, side, order_type, price, quantity, order_id=None, status='PENDING', pnl=None):
+    """log_trade 对应的 (sql, params)，用于 submit_many"""
+    return INSERT_TRADE_SQL, (strategy_name, datetime.now(), symbol, side, order_type, price, quantity, order_id,
+                              status, pnl)
+
+
+def event_record(strategy_name, level, event_type, message, data=None):
+    """log_strategy_event 对应的 (sql, params)，用于 submit_many"""
+    return INSERT_LOG_SQL, (strategy_name, datetime.now(), level, event_type, message,
+                            json.dumps(data) if data else None)
+
+
+def trade_status_record(order_id, status, pnl=None):
+    """update_trade_status 对应的 (sql, params)，用于 submit_many"""
+    return UPDATE_TRADE_STATUS_SQL, (status, pnl, order_id)
+
+
+def log_strategy_event(strategy_name, level, event_type, message, data=None):
+    """与 db.log_strategy_event 参数相同，异步写入"""
+    return get_writer().submit(*event_record(strategy_name, level, event_type, message, data))
+
+
+def log_trade(strategy_name, symbol, side, order_type, price, quantity, order_id=None, status='PENDING', pnl=None):
+    """与 db.log_trade 参数相同，异步写入；队列满时阻塞而不是丢弃"""
+    return get_writer().submit(*trade_record(strategy_name, symbol, side, order_type, price, quantity, order_id,
+                                             status, pnl), critical=True)
+
+
+def update_trade_status(order_id, status, pnl=None):
+    """与 db.update_trade_status 参数相同；走同一队列，保证排在对应的 log_trade 之后"""
+    return get_writer().submit(*trade_status_record(order_id, status, pnl), critical=True)
+
+
+def update_trade_fill(order_id, status, filled_quantity, fill_price, fee=None, pnl=None):
+    """与 db.update_trade_fill 参数相同；走同一队列，保证排在对应的 log_trade 之后"""
+    return get_writer().submit(UPDATE_TRADE_FILL_SQL, (status, filled_quantity, fill_price, fee, pnl, order_id),
+                               critical=True)
+
+
+def log_records(records):
+    """在一个事务中写入一组成交/状态/日志记录（批量下单、批量撤单）；不丢弃"""
+    return get_writer().submit_many(records, critical=True)
+
+
+def flush(timeout=None):
+    if _writer is None or _writer_pid != os.getpid():
+        return True
+    return _writer.flush(timeout)
+
+
+def shutdown(timeout=None):
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.close(timeout)
+
+
+def install_signal_handlers(signals=(signal.SIGTERM, signal.SIGINT)):
+    """
+    收到信号时以 SystemExit 退出主线程，让 finally 块和 atexit 中的 shutdown 把队列写完。
+    只能在主线程调用。
+    """
+    def handle(signum, frame):
+        raise SystemExit(128 + signum)
+
+    for sig in signals:
+        signal.signal(sig, handle)
+
+
+atexit.register(shutdown)
@@ -3,20 +3,82 @@ Market Data Manager - 市场数据管理模块
 用于从OKX获取历史K线数据并存入数据库
 """
 
-import time
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from quant_engine.db import get_db_connection
+from itertools import repeat
+from quant_engine.db import get_connection, get_db_connection, get_bulk_connection
+from quant_engine.kline_store import KlineStore, STORE_COLUMNS, klines_to_columns
+from quant_engine.resampler import Resampler
+
+# 按 (symbol, bar, ts) 原地更新，不像 INSERT OR REPLACE 那样删除重插（会改变 id、重写索引）
+KLINE_UPSERT_SQL = '''
+INSERT INTO market_klines (symbol, bar, ts, open, high, low, close, vol, vol_ccy, vol_ccy_quote)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(symbol, bar, ts) DO UPDATE SET
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    vol = excluded.vol,
+    vol_ccy = excluded.vol_ccy,
+    vol_ccy_quote = excluded.vol_ccy_quote
+'''
+
+# 批量写入时每个事务提交的行数
+SAVE_CHUNK_SIZE = 50000
+
+# 不允许为空的价格列
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+
+def _sql_values(values):
+    """float ndarray -> list，NaN 转为 None（写入 NULL）"""
+    if not np.isnan(values).any():
+        return values.tolist()
+    return [None if v != v else v for v in values.tolist()]
+
+
+def parse_klines(klines):
+    """
+    OKX K线列表 -> 列数组，丢弃无法解析或价格为空的K线
+
+    Returns:
+        dict: {列名: ndarray}
+    """
+    try:
+        columns = klines_to_columns(klines)
+    except (ValueError, TypeError, IndexError):
+        # 有格式错误的K线时逐条解析，跳过坏数据
+        valid = []
+        for k in klines:
+            try:
+                klines_to_columns([k])
+                valid.append(k)
+            except (ValueError, TypeError, IndexError) as e:
+                print(f"Error saving kline: {e}")
+        columns = klines_to_columns(valid)
+
+    valid = np.ones(len(columns['ts']), dtype=bool)
+    for name in PRICE_COLUMNS:
+        valid &= ~np.isnan(columns[name])
+    if not valid.all():
+        print(f"Error saving kline: {int((~valid).sum())} klines with empty prices skipped")
+        columns = {name: values[valid] for name, values in columns.items()}
+    return columns
 
 
 class MarketDataManager:
-    def __init__(self, okx_client=None):
+    def __init__(self, okx_client=None, store=None):
         self.client = okx_client
+        self.store = store or KlineStore()
+        self.resampler = Resampler(self)
     
     def set_client(self, okx_client):
         self.client = okx_client
     
-    def fetch_and_save_klines(self, symbol, bar='1H', start_date=None, end_date=None, progress_callback=None):
+    def fetch_and_save_klines(self, symbol, bar='1H', start_date=None, end_date=None, progress_callback=None,
+                              incremental=True):
         """
         从OKX获取历史K线数据并存入数据库
         
@@ -26,141 +88,182 @@ class MarketDataManager:
             start_date: 开始日期，格式 'YYYY-MM-DD' 或 datetime
             end_date: 结束日期，格式 'YYYY-MM-DD' 或 datetime
             progress_callback: 进度回调函数 callback(current, total, message)
+            incremental: 只拉取库中缺失的区间，False 时重新下载整个范围
         
         Returns:
-            dict: {'status': 'success'/'error', 'msg': str, 'count': int}
+            dict: {'status': 'success'/'error', 'msg': str, 'count': int, 'unfilled_gaps': list}
         """
-        import requests
-        
+        from quant_engine.sync_engine import KlineSyncEngine
+
         if not start_date:
             start_date = '2024-01-01'
         if not end_date:
             end_date = datetime.now().strftime('%Y-%m-%d')
-        
-        # 转换日期为时间戳
-        if isinstance(start_date, str):
-            start_ts = int(pd.Timestamp(start_date).timestamp() * 1000)
-        else:
-            start_ts = int(start_date.timestamp() * 1000)
-            
-        if isinstance(end_date, str):
-            end_ts = int(pd.Timestamp(end_date).timestamp() * 1000)
-        else:
-            end_ts = int(end_date.timestamp() * 1000)
-        
-        all_data = []
-        current_after = end_ts  # OKX API: after参数获取该时间之前的数据
-        batch_count = 0
-        max_batches = 500  # 防止无限循环
-        
-        base_url = "https://www.okx.com"
-        if self.client:
-            base_url = self.client.base_url
-        
-        try:
-            while batch_count < max_batches:
-                url = f"{base_url}/api/v5/market/history-candles?instId={symbol}&bar={bar}&limit=100&after={current_after}"
-                
-                response = requests.get(url, proxies=self.client.proxies if self.client else None)
-                data = response.json()
-                
-                if data.get('code') != '0' or not data.get('data'):
-                    break
-                
-                klines = data['data']
-                if not klines:
-                    break
-                
-                # 检查是否已经超出开始时间范围
-                oldest_ts = int(klines[-1][0])
-                if oldest_ts < start_ts:
-                    # 过滤掉超出范围的数据
-                    klines = [k for k in klines if int(k[0]) >= start_ts]
-                    all_data.extend(klines)
-                    break
-                
-                all_data.extend(klines)
-                batch_count += 1
-                
-                # 更新进度
-                if progress_callback:
-                    progress_callback(batch_count, max_batches, f"已获取 {len(all_data)} 条数据...")
-                
-                # 使用最老数据的时间戳作为下一次请求的after参数
-                current_after = oldest_ts
-                
-                # 避免请求过快
-                time.sleep(0.2)
-            
-            if not all_data:
-                return {'status': 'error', 'msg': '未获取到数据', 'count': 0}
-            
-            # 存入数据库
-            count = self._save_klines_to_db(symbol, bar, all_data)
-            
-            return {
-                'status': 'success',
-                'msg': f'成功获取并保存 {count} 条K线数据',
-                'count': count
-            }
-            
-        except Exception as e:
-            return {'status': 'error', 'msg': str(e), 'count': 0}
+
+        engine = KlineSyncEngine(self, max_workers=1, incremental=incremental)
+        job = {'symbol': symbol, 'bar': bar, 'start_date': start_date, 'end_date': end_date}
+        total = engine.estimate_pages(job)
+        fetched = {'count': 0}
+
+        def on_page(job, pages, count):
+            fetched['count'] += count
+            if progress_callback:
+                progress_callback(min(pages, total), total, f"已获取 {fetched['count']} 条数据...")
+
+        result = engine.sync_job(job, on_page)
+        if result['status'] == 'success' and result['count'] == 0 and result['gaps'] > 0 and not self.has_klines(symbol, bar):
+            return {'status': 'error', 'msg': '未获取到数据', 'count': 0, 'unfilled_gaps': result['unfilled_gaps']}
+        return {'status': result['status'], 'msg': result['msg'], 'count': result['count'],
+                'unfilled_gaps': result['unfilled_gaps']}
+
+    def is_stored(self, symbol, bar):
+        """bar 周期是否有直接存储的K线（列式存储或 SQLite）"""
+        return self.store.is_complete(symbol, bar) or self.has_klines(symbol, bar)
+
+    def has_klines(self, symbol, bar):
+        conn = get_connection()
+        row = conn.execute('SELECT 1 FROM market_klines WHERE symbol = ? AND bar = ? LIMIT 1', (symbol, bar)).fetchone()
+        return row is not None
+
+    def sync_klines(self, jobs, max_workers=4, progress_callback=None, incremental=True):
+        """
+        并发同步多个交易对/周期的K线数据
+
+        Args:
+            jobs: [{'symbol', 'bar', 'start_date', 'end_date'}, ...]
+            max_workers: 并发任务数
+            incremental: 只拉取库中缺失的区间
+
+        Returns:
+            dict: {'status', 'jobs', 'count', 'failed', 'elapsed'}
+        """
+        from quant_engine.sync_engine import KlineSyncEngine
+        return KlineSyncEngine(self, max_workers=max_workers, incremental=incremental).run(jobs, progress_callback)
     
     def _save_klines_to_db(self, symbol, bar, klines):
-        """将K线数据保存到数据库"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        count = 0
-        for k in klines:
-            try:
-                cursor.execute('''
-                INSERT OR REPLACE INTO market_klines 
-                (symbol, bar, ts, open, high, low, close, vol, vol_ccy, vol_ccy_quote)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    symbol, bar, int(k[0]),
-                    float(k[1]), float(k[2]), float(k[3]), float(k[4]),
-                    float(k[5]) if k[5] else None,
-                    float(k[6]) if k[6] else None,
-                    float(k[7]) if k[7] else None
-                ))
-                count += 1
-            except Exception as e:
-                print(f"Error saving kline: {e}")
-        
-        conn.commit()
-        conn.close()
+        """将K线数据保存到数据库（一次性转换为列数组，批量 upsert）"""
+        columns = parse_klines(klines)
+        count = self.bulk_save_klines(symbol, bar, columns, store=False)
+        self._save_klines_to_store(symbol, bar, columns)
         return count
-    
+
+    def bulk_save_klines(self, symbol, bar, columns, chunk_size=SAVE_CHUNK_SIZE, store=True):
+        """
+        批量写入K线列数据：executemany upsert，每 chunk_size 行提交一次
+
+        Args:
+            columns: {列名: ndarray}，至少包含 ts/open/high/low/close
+            store: 是否同时写入列式存储
+
+        Returns:
+            int: 写入的K线数量
+        """
+        ts = np.asarray(columns['ts'], dtype=np.int64)
+        n = len(ts)
+        if n == 0:
+            return 0
+        values = [np.asarray(columns[name], dtype=np.float64) if name in columns else np.full(n, np.nan)
+                  for name, _ in STORE_COLUMNS[1:]]
+
+        conn = get_bulk_connection()
+        try:
+            for lo in range(0, n, chunk_size):
+                hi = min(lo + chunk_size, n)
+                rows = zip(repeat(symbol), repeat(bar), ts[lo:hi].tolist(),
+                           *(_sql_values(v[lo:hi]) for v in values))
+                conn.executemany(KLINE_UPSERT_SQL, rows)
+                conn.commit()
+        finally:
+            conn.close()
+
+        if store:
+            self._save_klines_to_store(symbol, bar, columns)
+        return n
+
+    def _save_klines_to_store(self, symbol, bar, columns):
+        """
+        同步写入列式存储；失败时删除该序列，读取回退到 SQLite，避免读到过期数据。之后更新由该周期合成的缓存
+        序列尚未完整（升级后首次写入、之前写入失败）时，从 SQLite 回填整个序列（此时 SQLite 已包含本次数据）
+        """
+        try:
+            if self.store.is_complete(symbol, bar):
+                self.store.write(symbol, bar, columns)
+            else:
+                self.migrate_to_store(symbol, bar)
+        except Exception as e:
+            print(f"Error saving klines to store: {e}")
+            self.store.delete(symbol, bar)
+        try:
+            self.resampler.extend(symbol, bar, columns['ts'])
+        except Exception as e:
+            print(f"Error extending resampled klines: {e}")
+            self.resampler.invalidate(symbol, bar)
+
+    def get_existing_ts(self, symbol, bar, start_ts, end_ts):
+        """已存储K线在 [start_ts, end_ts) 内的时间戳（升序 int64 数组）"""
+        if self.store.is_complete(symbol, bar):
+            ts = self.store.read(symbol, bar, start_ts, end_ts)['ts'].to_numpy()
+            return ts[ts < end_ts]
+
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT ts FROM market_klines
+        WHERE symbol = ? AND bar = ? AND ts >= ? AND ts < ?
+        ORDER BY ts ASC
+        ''', (symbol, bar, start_ts, end_ts))
+        return np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+
+    def find_missing_ranges(self, symbol, bar, start_ts, end_ts):
+        """
+        按K线间距找出 [start_ts, end_ts) 内库中缺失的区间
+
+        Returns:
+            list: [(gap_start, gap_end), ...]
+        """
+        from quant_engine.sync_engine import BAR_MS, find_gaps
+        ts = self.get_existing_ts(symbol, bar, start_ts, end_ts)
+        return find_gaps(ts, start_ts, end_ts, BAR_MS[bar])
+
     def get_klines_from_db(self, symbol, bar='1H', start_date=None, end_date=None):
-        """从数据库获取K线数据"""
-        conn = get_db_connection()
+        """
+        从数据库获取K线数据（列式存储中有该序列时直接内存映射读取）
+        库中没有该周期时，由已存储的最细周期合成（见 quant_engine.resampler）
+        """
+        start_ts = int(pd.Timestamp(start_date).timestamp() * 1000) if start_date else None
+        end_ts = int(pd.Timestamp(end_date).timestamp() * 1000) if end_date else None
+        df = self.read_klines(symbol, bar, start_ts, end_ts)
+        if df.empty and not self.is_stored(symbol, bar):
+            resampled = self.resampler.read(symbol, bar, start_ts, end_ts)
+            if resampled is not None:
+                return resampled
+        return df
+
+    def read_klines(self, symbol, bar, start_ts=None, end_ts=None):
+        """读取已存储的 bar 周期K线 [start_ts, end_ts]（毫秒），不做合成；列式存储不完整时读取 SQLite"""
+        if self.store.is_complete(symbol, bar):
+            return self.store.read(symbol, bar, start_ts, end_ts)
+
+        conn = get_connection()
         
         query = 'SELECT * FROM market_klines WHERE symbol = ? AND bar = ?'
         params = [symbol, bar]
         
-        if start_date:
-            start_ts = int(pd.Timestamp(start_date).timestamp() * 1000)
+        if start_ts is not None:
             query += ' AND ts >= ?'
             params.append(start_ts)
         
-        if end_date:
-            end_ts = int(pd.Timestamp(end_date).timestamp() * 1000)
+        if end_ts is not None:
             query += ' AND ts <= ?'
             params.append(end_ts)
         
         query += ' ORDER BY ts ASC'
 
-        df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
-
-        return df
+        return pd.read_sql_query(query, conn, params=params)
 
     def get_data_info(self, symbol=None, bar=None):
         """获取数据库中已有数据的统计信息"""
-        conn = get_db_connection()
+        conn = get_connection()
         cursor = conn.cursor()
 
         if symbol and bar:
@@ -180,7 +283,6 @@ class MarketDataManager:
             ''')
 
         rows = cursor.fetchall()
-        conn.close()
 
         result = []
         for row in rows:
@@ -198,17 +300,60 @@ class MarketDataManager:
 
     def delete_klines(self, symbol, bar=None):
         """删除指定交易对的K线数据"""
+        conn = get_connection()
+
+        with conn:
+            if bar:
+                cursor = conn.execute('DELETE FROM market_klines WHERE symbol = ? AND bar = ?', (symbol, bar))
+            else:
+                cursor = conn.execute('DELETE FROM market_klines WHERE symbol = ?', (symbol,))
+
+        count = cursor.rowcount
+
+        self.store.delete(symbol, bar)
+        self.resampler.invalidate(symbol, bar)
+        return count
+
+    def migrate_to_store(self, symbol=None, bar=None, chunk_size=200000):
+        """
+        将 SQLite market_klines 中已有的数据转换到列式存储（按序列重建），完成后标记序列完整
+
+        Returns:
+            list: [{'symbol', 'bar', 'count'}, ...]
+        """
         conn = get_db_connection()
         cursor = conn.cursor()
 
+        query = 'SELECT DISTINCT symbol, bar FROM market_klines'
+        conditions, params = [], []
+        if symbol:
+            conditions.append('symbol = ?')
+            params.append(symbol)
         if bar:
-            cursor.execute('DELETE FROM market_klines WHERE symbol = ? AND bar = ?', (symbol, bar))
-        else:
-            cursor.execute('DELETE FROM market_klines WHERE symbol = ?', (symbol,))
+            conditions.append('bar = ?')
+            params.append(bar)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        cursor.execute(query, params)
+        series = [(row['symbol'], row['bar']) for row in cursor.fetchall()]
 
-        count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        names = [name for name, _ in STORE_COLUMNS]
+        migrated = []
+        for sym, b in series:
+            self.store.delete(sym, b)
+            cursor.execute(f'SELECT {", ".join(names)} FROM market_klines WHERE symbol = ? AND bar = ? ORDER BY ts ASC',
+                           (sym, b))
+            count = 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                columns = {name: np.array([r[i] for r in rows], dtype=dtype if name == 'ts' else np.float64)
+                           for i, (name, dtype) in enumerate(STORE_COLUMNS)}
+                count += self.store.write(sym, b, columns)
+            self.store.mark_complete(sym, b)
+            migrated.append({'symbol': sym, 'bar': b, 'count': count})
 
-        return count
+        conn.close()
+        return migrated
 
@@ -0,0 +1,293 @@
+"""
+Market Hub - 本机共享行情中心
+scheduler 启动一个 hub 进程，持有唯一一组上游 WebSocket 连接（MarketStream），
+通过本地 socket（multiprocessing.connection：Linux/macOS 为 Unix socket，Windows 为命名管道）
+把 ticker 和K线推送分发给各个 strategy_runner。同一交易对无论有多少策略只订阅一次。
+
+runner 端的 HubClient 与 MarketStream 接口相同，挂在 OKXClient.stream 上后 current_price 等函数无需改动。
+
+安全:
+    socket 放在仅当前用户可访问（0700）的随机临时目录中；连接用 scheduler 每次启动时随机生成的 authkey 认证，
+    经 HUB_AUTHKEY_ENV 传给 runner。消息是 JSON 帧而不是 pickle，即使连接被冒充也无法在进程中执行代码。
+
+协议（JSON 编码的 dict，每条消息一帧）:
+    runner -> hub: {'op': 'subscribe', 'args': [{'channel': 'tickers', 'instId': ...}, ...]}
+    hub -> runner: OKX 原始推送 {'arg': {...}, 'data': [...]}；订阅时先发送一次缓存快照
+"""
+
+import json
+import os
+import queue
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from quant_engine.market_stream import MarketStream, MAX_RECONNECT_DELAY
+
+# scheduler 通过这两个环境变量把 hub 地址和 authkey（十六进制）传给 strategy_runner 子进程
+HUB_ADDRESS_ENV = 'QUANT_MARKET_HUB'
+HUB_AUTHKEY_ENV = 'QUANT_MARKET_HUB_KEY'
+
+# 每个 runner 的待发送队列上限；runner 处理不过来时丢弃新推送（ticker 只需要最新值）
+CLIENT_QUEUE_SIZE = 1000
+
+
+def default_address():
+    """新的 hub 地址：Windows 为随机命名管道，其他系统为新建的 0700 临时目录中的 Unix socket"""
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\quant-okx-market-hub-{secrets.token_hex(16)}'
+    return os.path.join(tempfile.mkdtemp(prefix='quant-okx-market-hub-'), 'hub.sock')
+
+
+def new_authkey():
+    return secrets.token_bytes(32)
+
+
+def env_authkey():
+    """scheduler 传入的 authkey，未设置时为 None"""
+    value = os.environ.get(HUB_AUTHKEY_ENV)
+    return bytes.fromhex(value) if value else None
+
+
+def _send(conn, message):
+    conn.send_bytes(json.dumps(message).encode())
+
+
+def _recv(conn):
+    message = json.loads(conn.recv_bytes())
+    if not isinstance(message, dict):
+        raise ValueError(f'Unexpected message: {message!r}')
+    return message
+
+
+def _arg_key(arg):
+    return arg.get('channel'), arg.get('instId')
+
+
+class _Subscriber:
+    """hub 中的一个 runner 连接：订阅集合 + 独立发送线程，慢的 runner 不会阻塞其他 runner"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.keys = set()
+        self.queue = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def run_sender(self):
+        while not self.closed:
+            message = self.queue.get()
+            if message is None:
+                break
+            try:
+                _send(self.conn, message)
+            except (OSError, EOFError):
+                break
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass  # 发送线程正阻塞在 send 上，关闭连接后会退出
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+class MarketHub:
+    def __init__(self, address=None, stream=None, authkey=None):
+        """
+        Args:
+            address: 本地 socket 地址，默认 default_address()
+            stream: 上游 MarketStream，默认连接 OKX 正式环境
+            authkey: 连接认证密钥，默认随机生成（HubClient 需使用同一个密钥）
+        """
+        self.address = address or default_address()
+        self.authkey = authkey or new_authkey()
+        self.stream = stream or MarketStream().start()
+        self.stream.add_listener(self._broadcast)
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def serve_forever(self):
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            os.unlink(self.address)  # 上次异常退出遗留的 socket 文件
+        self.listener = Listener(self.address, authkey=self.authkey)
+        print(f"[HUB] Market hub listening on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = self.listener.accept()
+                except Exception as e:
+                    if self.listener is None:
+                        break
+                    print(f"[HUB] Rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def start(self):
+        """在后台线程中运行（测试或嵌入其他进程时使用）"""
+        thread = threading.Thread(target=self.serve_forever, name='market-hub', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.close()
+        with self.lock:
+            subscribers, self.subscribers = self.subscribers, []
+        for sub in subscribers:
+            sub.close()
+        self.stream.stop()
+
+    def stats(self):
+        with self.lock:
+            return {'clients': len(self.subscribers),
+                    'dropped': sum(sub.dropped for sub in self.subscribers),
+                    'upstream': [arg for conn in (self.stream.public, self.stream.business) for arg in conn.args]}
+
+    def _serve_client(self, conn):
+        sub = _Subscriber(conn)
+        with self.lock:
+            self.subscribers.append(sub)
+        threading.Thread(target=sub.run_sender, daemon=True).start()
+        try:
+            while not sub.closed:
+                request = _recv(conn)
+                if request.get('op') == 'subscribe':
+                    for arg in request.get('args', []):
+                        self._subscribe(sub, arg)
+        except (OSError, EOFError):
+            pass
+        except ValueError as e:
+            print(f"[HUB] Dropping client after malformed message: {e}")
+        finally:
+            with self.lock:
+                if sub in self.subscribers:
+                    self.subscribers.remove(sub)
+            sub.close()
+
+    def _subscribe(self, sub, arg):
+        channel, instId = _arg_key(arg)
+        sub.keys.add((channel, instId))
+        if channel == 'tickers':
+            self.stream.subscribe_ticker(instId)
+            data = self.stream.ticker(instId)
+            if data is not None:
+                sub.push({'arg': arg, 'data': [data]})
+        elif channel and channel.startswith('candle'):
+            bar = channel[len('candle'):]
+            self.stream.subscribe_candles(instId, bar)
+            rows = self.stream.candles(instId, bar)
+            if rows:
+                sub.push({'arg': arg, 'data': rows})
+
+    def _broadcast(self, message):
+        key = _arg_key(message.get('arg') or {})
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            if key in sub.keys:
+                sub.push(message)
+
+
+class _HubConnection:
+    """HubClient 到 hub 的连接，接口与 market_stream._Connection 相同"""
+
+    def __init__(self, stream, address, authkey):
+        self.stream = stream
+        self.address = address
+        self.authkey = authkey
+        self.args = []
+        self.conn = None
+        self.connected = threading.Event()
+        self.send_lock = threading.Lock()
+        self.thread = None
+        self.reconnects = 0
+        self.connected_at = 0.0
+
+    def subscribe(self, arg):
+        with self.send_lock:
+            if arg in self.args:
+                return
+            self.args.append(arg)
+            if self.connected.is_set():
+                _send(self.conn, {'op': 'subscribe', 'args': [arg]})
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='market-hub-client', daemon=True)
+            self.thread.start()
+
+    def close(self):
+        conn = self.conn
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _run(self):
+        delay = 1
+        while not self.stream.stopped.is_set():
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+                with self.send_lock:
+                    self.conn = conn
+                    if self.args:
+                        _send(conn, {'op': 'subscribe', 'args': list(self.args)})
+                    self.connected_at = time.monotonic()
+                    self.connected.set()
+                delay = 1
+                while not self.stream.stopped.is_set():
+                    self.stream._handle(_recv(conn))
+            except Exception as e:
+                if not self.stream.stopped.is_set():
+                    print(f"[HUB] Connection to {self.address} lost: {e!r}, reconnecting in {delay}s")
+            finally:
+                self.connected.clear()
+                self.close()
+            if self.stream.stopped.wait(delay):
+                break
+            self.reconnects += 1
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+class HubClient(MarketStream):
+    """从本机 hub 接收行情的 MarketStream，ticker/candles/last_price 等接口不变"""
+
+    def __init__(self, address=None, authkey=None, stale_after=None):
+        """
+        Args:
+            address, authkey: hub 的地址和密钥，默认读取 scheduler 设置的 HUB_ADDRESS_ENV / HUB_AUTHKEY_ENV
+        """
+        kwargs = {'stale_after': stale_after} if stale_after else {}
+        super().__init__(**kwargs)
+        self.address = address or os.environ.get(HUB_ADDRESS_ENV)
+        authkey = authkey or env_authkey()
+        if not self.address or not authkey:
+            raise ValueError('Market hub address and authkey are required')
+        # tickers 和 candles 共用一条到 hub 的连接
+        self.public = self.business = _HubConnection(self, self.address, authkey)
+
+
+def run_hub(address, authkey, proxy_url=None, public_url=None, business_url=None):
+    """hub 进程入口（由 scheduler 以子进程启动）"""
+    stream = MarketStream(public_url, business_url, proxy_url).start()
+    MarketHub(address, stream, authkey).serve_forever()
@@ -0,0 +1,236 @@
+"""
+Market Stream - OKX WebSocket 行情缓存
+订阅 tickers / candle 频道，把最新行情保存在内存中，current_price 等函数直接读取，
+不再每次 handle_data 都用 REST 轮询 ticker。
+
+- 每个 WebSocket 地址一个后台线程：断线后指数退避重连，并重新订阅全部频道
+- 心跳：超过 heartbeat_interval 秒没有消息时发送 'ping'，再过一个周期收不到任何消息视为断线
+- 重连后 OKX 会重新推送最新K线，与缓存完全相同的K线不再交给监听者，同一根已确认K线只送达一次
+- 断线或行情超过 stale_after 秒未更新时 last_price 返回 None，调用方回退到 REST
+"""
+
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+OKX_WS_PUBLIC_URL = 'wss://ws.okx.com:8443/ws/v5/public'
+# K线频道在 business 地址上
+OKX_WS_BUSINESS_URL = 'wss://ws.okx.com:8443/ws/v5/business'
+
+# OKX 30 秒无数据会断开连接
+HEARTBEAT_INTERVAL = 25
+
+# 行情超过多少秒未更新视为过期
+STALE_AFTER = 30
+
+# 每个 (instId, bar) 缓存的K线数量
+CANDLE_CACHE_SIZE = 500
+
+MAX_RECONNECT_DELAY = 30
+
+
+class _Connection:
+    """一个 WebSocket 地址上的连接和订阅列表"""
+
+    def __init__(self, stream, url):
+        self.stream = stream
+        self.url = url
+        self.args = []
+        self.ws = None
+        self.connected = threading.Event()
+        self.send_lock = threading.Lock()
+        self.thread = None
+        self.reconnects = 0
+        self.connected_at = 0.0
+
+    def subscribe(self, arg):
+        with self.send_lock:
+            if arg in self.args:
+                return
+            self.args.append(arg)
+            if self.connected.is_set():
+                self._send({'op': 'subscribe', 'args': [arg]})
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=f'market-stream {self.url}', daemon=True)
+            self.thread.start()
+
+    def close(self):
+        ws = self.ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _send(self, message):
+        self.ws.send(message if isinstance(message, str) else json.dumps(message))
+
+    def _connect(self):
+        import websocket
+
+        options = {'timeout': self.stream.heartbeat_interval}
+        if self.stream.proxy_url:
+            proxy = urlparse(self.stream.proxy_url)
+            options.update(http_proxy_host=proxy.hostname, http_proxy_port=proxy.port,
+                           proxy_type=proxy.scheme if proxy.scheme in ('socks4', 'socks5', 'socks5h') else 'http')
+        ws = websocket.create_connection(self.url, **options)
+        with self.send_lock:
+            self.ws = ws
+            if self.args:
+                self._send({'op': 'subscribe', 'args': list(self.args)})
+            self.connected_at = time.monotonic()
+            self.connected.set()
+        return ws
+
+    def _run(self):
+        import websocket
+
+        delay = 1
+        while not self.stream.stopped.is_set():
+            try:
+                ws = self._connect()
+                delay = 1
+                awaiting_pong = False
+                while not self.stream.stopped.is_set():
+                    try:
+                        message = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        if awaiting_pong:
+                            raise ConnectionError('heartbeat timeout')
+                        with self.send_lock:
+                            self._send('ping')
+                        awaiting_pong = True
+                        continue
+                    awaiting_pong = False
+                    if not message:
+                        raise ConnectionError('connection closed')
+                    if message != 'pong':
+                        self.stream._handle(json.loads(message))
+            except Exception as e:
+                if not self.stream.stopped.is_set():
+                    print(f"[WS] {self.url} disconnected: {e}, reconnecting in {delay}s")
+            finally:
+                self.connected.clear()
+                self.close()
+            if self.stream.stopped.wait(delay):
+                break
+            self.reconnects += 1
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+class MarketStream:
+    def __init__(self, public_url=None, business_url=None, proxy_url=None,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, stale_after=STALE_AFTER):
+        """
+        Args:
+            public_url: tickers 频道地址，默认 OKX 正式环境；测试时可指向本地 WebSocket 服务
+            business_url: candle 频道地址
+            proxy_url: 与 OKXClient 相同的代理地址
+        """
+        self.proxy_url = proxy_url
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.public = _Connection(self, public_url or OKX_WS_PUBLIC_URL)
+        self.business = _Connection(self, business_url or OKX_WS_BUSINESS_URL)
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.tickers = {}
+        self.candle_cache = {}
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """callback(message)：每条行情推送（OKX 原始格式 {'arg', 'data'}）写入缓存后在接收线程中调用"""
+        self.listeners.append(callback)
+
+    def start(self):
+        self.stopped.clear()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        for conn in (self.public, self.business):
+            conn.close()
+        for conn in (self.public, self.business):
+            if conn.thread is not None:
+                conn.thread.join(timeout=5)
+                conn.thread = None
+
+    def subscribe_ticker(self, instId):
+        self.public.subscribe({'channel': 'tickers', 'instId': instId})
+        self.public.start()
+
+    def subscribe_candles(self, instId, bar='1H'):
+        self.business.subscribe({'channel': f'candle{bar}', 'instId': instId})
+        self.business.start()
+
+    def is_connected(self):
+        return self.public.connected.is_set()
+
+    def wait_connected(self, timeout=None):
+        return self.public.connected.wait(timeout)
+
+    def ticker(self, instId):
+        """最新的原始 ticker 推送（字段与 REST /market/ticker 的 data[0] 相同），过期或断线时为 None"""
+        with self.lock:
+            entry = self.tickers.get(instId)
+        if entry is None or not self.public.connected.is_set():
+            return None
+        received, data = entry
+        # 重连前的旧值不用，订阅后 OKX 会立即推送一次快照
+        if received < self.public.connected_at or time.monotonic() - received > self.stale_after:
+            return None
+        return data
+
+    def last_price(self, instId, subscribe=True):
+        """
+        缓存中的最新成交价；尚未订阅时自动订阅并返回 None（本次由调用方走 REST）
+        """
+        data = self.ticker(instId)
+        if data is None:
+            if subscribe:
+                self.subscribe_ticker(instId)
+            return None
+        return float(data['last'])
+
+    def candles(self, instId, bar='1H', limit=None):
+        """缓存的K线，格式与 REST 接口相同（新 -> 旧）"""
+        with self.lock:
+            cache = self.candle_cache.get((instId, bar), {})
+            rows = [cache[ts] for ts in sorted(cache, reverse=True)]
+        return rows[:limit] if limit else rows
+
+    def _handle(self, message):
+        if 'event' in message:
+            if message['event'] == 'error':
+                print(f"[WS] Error: {message.get('code')} {message.get('msg')}")
+            return
+        arg = message.get('arg') or {}
+        channel, instId = arg.get('channel', ''), arg.get('instId')
+        data = message.get('data') or []
+        if channel == 'tickers':
+            with self.lock:
+                for item in data:
+                    self.tickers[item.get('instId', instId)] = (time.monotonic(), item)
+        elif channel.startswith('candle'):
+            key = (instId, channel[len('candle'):])
+            with self.lock:
+                cache = self.candle_cache.setdefault(key, {})
+                data = [row for row in data if cache.get(int(row[0])) != row]
+                for row in data:
+                    cache[int(row[0])] = row
+                if len(cache) > CANDLE_CACHE_SIZE:
+                    for ts in sorted(cache)[:len(cache) - CANDLE_CACHE_SIZE]:
+                        del cache[ts]
+            if not data:
+                return
+            message = dict(message, data=data)
+        else:
+            return
+        for callback in self.listeners:
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"[WS] Listener error: {e}")
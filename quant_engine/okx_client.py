@@ -1,19 +1,122 @@
+import asyncio
+import functools
+import hashlib
 import hmac
 import base64
-import datetime
 import json
+import threading
+import uuid
 import requests
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import time
 
+from quant_engine.rate_limiter import RateLimiter
+
+# OKX batch order/cancel endpoints accept at most 20 orders per request
+BATCH_ORDER_LIMIT = 20
+
+# sCode of batch items whose request may have reached OKX but whose outcome could not be confirmed
+UNKNOWN_SCODE = 'unknown'
+# OKX error code for "Order does not exist"
+ORDER_NOT_FOUND = '51603'
+
+# Keep-alive connections per host; also the number of requests the async client runs at once
+POOL_SIZE = 16
+
+# Rate limits are per account/IP, so all clients in a process share the windows and worker threads
+_shared_limiter = None
+_shared_executor = None
+_shared_lock = threading.Lock()
+
+
+def _get_shared_pool():
+    global _shared_limiter, _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_limiter = RateLimiter()
+            _shared_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='okx-request')
+        return _shared_limiter, _shared_executor
+
+
+def _not_sent(error):
+    """True when a request failed before reaching OKX (no connection), so sending it again cannot duplicate it"""
+    return (isinstance(error, requests.exceptions.ConnectionError)
+            and not isinstance(error, requests.exceptions.ReadTimeout))
+
+class OKXSigner:
+    """
+    Builds OKX signed request headers.
+
+    The HMAC keyed with the secret is created once and copied per request, and the
+    constant headers are kept in a template dict. Every call to headers() takes a
+    fresh timestamp, so retries must call it again rather than reuse old headers
+    (OKX rejects timestamps older than 30 seconds).
+    """
+
+    def __init__(self, api_key, secret_key, passphrase):
+        self._mac = hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha256)
+        self._template = {
+            'OK-ACCESS-KEY': api_key,
+            'OK-ACCESS-PASSPHRASE': passphrase,
+            'Content-Type': 'application/json'
+        }
+
+    @staticmethod
+    def timestamp():
+        """ISO 8601 UTC timestamp with milliseconds, e.g. 2024-01-01T00:00:00.000Z"""
+        now = time.time()
+        return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)) + '.%03dZ' % (int(now * 1000) % 1000)
+
+    def sign(self, timestamp, method, request_path, body=''):
+        if body in ('{}', 'None', None):
+            body = ''
+        mac = self._mac.copy()
+        mac.update(f'{timestamp}{method}{request_path}{body}'.encode('utf-8'))
+        return base64.b64encode(mac.digest())
+
+    def headers(self, method, request_path, body='', timestamp=None):
+        timestamp = timestamp or self.timestamp()
+        headers = self._template.copy()
+        headers['OK-ACCESS-SIGN'] = self.sign(timestamp, method, request_path, body)
+        headers['OK-ACCESS-TIMESTAMP'] = timestamp
+        return headers
+
+    def headers_batch(self, method, request_path, bodies):
+        """
+        Sign several requests to one endpoint with a shared timestamp
+
+        Only for requests that are sent concurrently right away; requests sent one after
+        another must be signed individually just before sending, or later ones can fall
+        outside OKX's 30 second timestamp window.
+
+        Args:
+            bodies: request bodies; lists/dicts are serialized with json.dumps
+
+        Returns:
+            list: (body_str, headers) per body, in order
+        """
+        timestamp = self.timestamp()
+        signed = []
+        for body in bodies:
+            if not isinstance(body, str):
+                body = json.dumps(body)
+            signed.append((body, self.headers(method, request_path, body, timestamp)))
+        return signed
+
+
 class OKXClient:
     def __init__(self, api_key, secret_key, passphrase, base_url="https://www.okx.com", proxy_url=None):
         self.api_key = api_key
         self.secret_key = secret_key
         self.passphrase = passphrase
         self.base_url = base_url
+        self.proxy_url = proxy_url
         self.proxies = {'http': proxy_url, 'https': proxy_url} if proxy_url else None
+        self.stream = None
+        self.signer = OKXSigner(api_key, secret_key, passphrase)
 
         # Create session with retry strategy
         self.session = requests.Session()
@@ -22,36 +125,81 @@ class OKXClient:
             backoff_factor=1,
             status_forcelist=[429, 500, 502, 503, 504],
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
+        self._aio = None
+
+    @property
+    def aio(self):
+        """AsyncOKXClient sharing this client's session and credentials"""
+        if self._aio is None:
+            self._aio = AsyncOKXClient(self)
+        return self._aio
+
+    def gather(self, *calls):
+        """
+        Issue several requests concurrently and wait for all of them.
+
+        Args:
+            calls: (method_name, *args) tuples, e.g. ('get_account_balance',), ('get_ticker', 'BTC-USDT')
+
+        Returns:
+            list: results in the same order as calls
+
+        Must not be called from a running event loop; use `await client.aio.gather(...)` there.
+        """
+        aio = self.aio
+
+        async def run():
+            return await aio.gather(*(getattr(aio, name)(*args) for name, *args in calls))
+        return asyncio.run(run())
+
+    def start_stream(self, tickers=(), candles=(), public_url=None, business_url=None, hub_address=None):
+        """
+        开启 WebSocket 行情推送，current_price 优先读取推送缓存
+
+        Args:
+            tickers: 订阅 ticker 的交易对列表
+            candles: 订阅K线的 (instId, bar) 列表
+            public_url / business_url: WebSocket 地址，默认 OKX 正式环境
+            hub_address: 本机行情中心地址（见 market_hub），设置时从 hub 接收行情而不直连 OKX
+
+        Returns:
+            MarketStream / HubClient，websocket-client 未安装时返回 None（继续使用 REST）
+        """
+        if self.stream is None:
+            if hub_address:
+                from quant_engine.market_hub import HubClient
+                self.stream = HubClient(hub_address).start()
+            else:
+                try:
+                    import websocket  # noqa: F401
+                except ImportError:
+                    print("[OKX WS] websocket-client not installed, using REST polling")
+                    return None
+
+                from quant_engine.market_stream import MarketStream
+                self.stream = MarketStream(public_url, business_url, self.proxy_url).start()
+        for instId in tickers:
+            self.stream.subscribe_ticker(instId)
+        for instId, bar in candles:
+            self.stream.subscribe_candles(instId, bar)
+        return self.stream
+
+    def stop_stream(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
 
     def _get_timestamp(self):
-        return datetime.datetime.utcnow().isoformat("T", "milliseconds") + "Z"
+        return OKXSigner.timestamp()
 
     def _sign(self, timestamp, method, request_path, body):
-        if str(body) == '{}' or str(body) == 'None':
-            body = ''
-        message = str(timestamp) + str(method) + str(request_path) + str(body)
-        mac = hmac.new(
-            bytes(self.secret_key, encoding='utf8'),
-            bytes(message, encoding='utf8'),
-            digestmod='sha256'
-        )
-        d = mac.digest()
-        return base64.b64encode(d)
+        return self.signer.sign(timestamp, method, request_path, str(body))
 
     def _get_headers(self, method, request_path, body):
-        timestamp = self._get_timestamp()
-        sign = self._sign(timestamp, method, request_path, body)
-        header = {
-            'OK-ACCESS-KEY': self.api_key,
-            'OK-ACCESS-SIGN': sign,
-            'OK-ACCESS-TIMESTAMP': timestamp,
-            'OK-ACCESS-PASSPHRASE': self.passphrase,
-            'Content-Type': 'application/json'
-        }
-        return header
+        return self.signer.headers(method, request_path, str(body))
 
     def get_account_balance(self):
         path = '/api/v5/account/balance'
@@ -71,6 +219,31 @@ class OKXClient:
         except Exception as e:
             return {"code": "500", "msg": str(e)}
 
+    def _signed_get(self, path, params=None):
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        if params:
+            path += '?' + urlencode(params)
+        headers = self._get_headers('GET', path, '')
+        try:
+            response = self.session.get(self.base_url + path, headers=headers, proxies=self.proxies, timeout=30)
+            return response.json()
+        except Exception as e:
+            return {"code": "500", "msg": str(e)}
+
+    def get_orders_pending(self, instType=None, instId=None, after=None, limit=100):
+        """Open orders of the account (all instruments unless filtered), newest first, at most 100 per page"""
+        return self._signed_get('/api/v5/trade/orders-pending',
+                                {'instType': instType, 'instId': instId, 'after': after, 'limit': limit})
+
+    def get_orders_history(self, instType, begin=None, after=None, limit=100):
+        """Completed (filled/canceled) orders of the last 7 days, newest first"""
+        return self._signed_get('/api/v5/trade/orders-history',
+                                {'instType': instType, 'begin': begin, 'after': after, 'limit': limit})
+
+    def get_order(self, instId, ordId=None, clOrdId=None):
+        """Details of a single order, looked up by ordId or clOrdId"""
+        return self._signed_get('/api/v5/trade/order', {'instId': instId, 'ordId': ordId, 'clOrdId': clOrdId})
+
     def get_ticker(self, instId):
         path = f'/api/v5/market/ticker?instId={instId}'
         try:
@@ -92,7 +265,36 @@ class OKXClient:
             px: Price (required for limit orders)
         """
         path = '/api/v5/trade/order'
+        body = self._order_body(instId, tdMode, side, ordType, sz, px)
+
+        print(f"[OKX API] Placing order: {body}")
 
+        body = json.dumps(body)
+
+        # Try up to 3 times, re-signing each attempt so the timestamp stays valid
+        last_error = None
+        for attempt in range(3):
+            try:
+                response = self.session.post(
+                    self.base_url + path,
+                    headers=self.signer.headers('POST', path, body),
+                    data=body,
+                    proxies=self.proxies,
+                    timeout=30
+                )
+                result = response.json()
+                print(f"[OKX API] Response: {result}")
+                return result
+            except Exception as e:
+                last_error = e
+                print(f"[OKX API] Attempt {attempt + 1} failed: {e}")
+                time.sleep(1)
+
+        print(f"[OKX API] All attempts failed: {last_error}")
+        return {"code": "500", "msg": str(last_error)}
+
+    @staticmethod
+    def _order_body(instId, tdMode, side, ordType, sz, px=None):
         # Format size to proper precision (avoid scientific notation)
         sz_formatted = f"{float(sz):.8f}".rstrip('0').rstrip('.')
 
@@ -109,32 +311,126 @@ class OKXClient:
             # Format price properly
             px_formatted = f"{float(px):.2f}"
             body["px"] = px_formatted
+        return body
 
-        print(f"[OKX API] Placing order: {body}")
+    def _post_batches(self, path, items):
+        """
+        POST items to a batch endpoint BATCH_ORDER_LIMIT at a time and merge the responses.
 
-        headers = self._get_headers('POST', path, json.dumps(body))
+        Returns a single response whose data has one entry per item, in order. code is
+        '0' when every item succeeded, '2' on partial success and '1' when all failed.
+        Items of a chunk that was never sent get sCode '500'; items that may have reached
+        OKX without a confirmed outcome get sCode UNKNOWN_SCODE.
+        """
+        chunks = [items[i:i + BATCH_ORDER_LIMIT] for i in range(0, len(items), BATCH_ORDER_LIMIT)]
+        data = []
+        for chunk in chunks:
+            data.extend(self._post_chunk(path, chunk))
 
-        # Try up to 3 times with different strategies
-        last_error = None
+        succeeded = sum(1 for item in data if item.get('sCode') == '0')
+        code = '0' if succeeded == len(data) else ('2' if succeeded else '1')
+        return {'code': code, 'msg': '', 'data': data}
+
+    def _post_chunk(self, path, chunk):
+        """
+        POST one chunk with up to 3 attempts, never sending an item twice.
+
+        A failed attempt is repeated as is only when the request never left this machine.
+        Otherwise orders carrying a clOrdId are looked up first and only those OKX does not
+        know are sent again; items that cannot be looked up are reported as unknown.
+        """
+        results = [None] * len(chunk)
+        pending = list(range(len(chunk)))
+        unknown = set()
+        in_doubt = False
+        error = 'Unknown error'
         for attempt in range(3):
+            if attempt:
+                time.sleep(1)
+            if in_doubt:
+                if not all(chunk[i].get('clOrdId') for i in pending):
+                    break
+                pending = self._lookup_placed(chunk, pending, results, unknown)
+                in_doubt = False
+                if not pending:
+                    break
+            body = json.dumps([chunk[i] for i in pending])
             try:
-                response = self.session.post(
-                    self.base_url + path,
-                    headers=headers,
-                    data=json.dumps(body),
-                    proxies=self.proxies,
-                    timeout=30
-                )
+                # Chunks go out one after another, so each attempt is signed just before it is sent
+                response = self.session.post(self.base_url + path, headers=self.signer.headers('POST', path, body),
+                                             data=body, proxies=self.proxies, timeout=30)
                 result = response.json()
-                print(f"[OKX API] Response: {result}")
-                return result
             except Exception as e:
-                last_error = e
-                print(f"[OKX API] Attempt {attempt + 1} failed: {e}")
-                time.sleep(1)
+                error = str(e)
+                in_doubt = not _not_sent(e)
+                print(f"[OKX API] {path} attempt {attempt + 1} failed: {e}")
+                continue
 
-        print(f"[OKX API] All attempts failed: {last_error}")
-        return {"code": "500", "msg": str(last_error)}
+            data = result.get('data') or []
+            if len(data) == len(pending):
+                for i, item in zip(pending, data):
+                    results[i] = item
+            else:
+                # OKX rejected the whole request (signature, rate limit, ...), nothing was placed
+                for i in pending:
+                    results[i] = {'ordId': chunk[i].get('ordId', ''), 'sCode': result.get('code') or '500',
+                                  'sMsg': result.get('msg', 'Unknown error')}
+            pending = []
+            break
+
+        if in_doubt:
+            unknown.update(pending)
+        for i, item in enumerate(chunk):
+            if results[i] is None:
+                results[i] = {'ordId': item.get('ordId', ''), 'clOrdId': item.get('clOrdId', ''),
+                              'sCode': UNKNOWN_SCODE if i in unknown else '500', 'sMsg': error}
+        return results
+
+    def _lookup_placed(self, chunk, indices, results, unknown):
+        """
+        Look up the orders chunk[indices] by clOrdId after a request that may have reached OKX.
+
+        Fills results for orders OKX has, adds indices whose lookup failed to unknown and
+        returns the indices OKX confirms it does not have, which are safe to send again.
+        """
+        absent = []
+        for i in indices:
+            item = chunk[i]
+            res = self.get_order(item['instId'], clOrdId=item['clOrdId'])
+            if res.get('code') == '0' and res.get('data'):
+                order = res['data'][0]
+                results[i] = {'ordId': order.get('ordId', ''), 'clOrdId': item['clOrdId'], 'sCode': '0', 'sMsg': ''}
+            elif res.get('code') == ORDER_NOT_FOUND:
+                absent.append(i)
+            else:
+                unknown.add(i)
+        return absent
+
+    def place_orders_batch(self, orders):
+        """
+        Place several orders via /api/v5/trade/batch-orders (BATCH_ORDER_LIMIT per request)
+
+        Args:
+            orders: list of dicts with place_order's arguments (instId, tdMode, side, ordType, sz, px)
+
+        Returns:
+            dict: merged response, data[i] ({ordId, clOrdId, sCode, sMsg}) belongs to orders[i]
+
+        Every order gets a fresh clOrdId so a request that timed out can be checked before it is retried.
+        """
+        bodies = [dict(self._order_body(**order), clOrdId=uuid.uuid4().hex) for order in orders]
+        print(f"[OKX API] Placing {len(bodies)} orders in batch")
+        return self._post_batches('/api/v5/trade/batch-orders', bodies)
+
+    def cancel_orders_batch(self, orders):
+        """
+        Cancel several orders via /api/v5/trade/cancel-batch-orders (BATCH_ORDER_LIMIT per request)
+
+        Args:
+            orders: list of {'instId': ..., 'ordId': ...}
+        """
+        return self._post_batches('/api/v5/trade/cancel-batch-orders',
+                                  [{'instId': o['instId'], 'ordId': str(o['ordId'])} for o in orders])
 
     def get_history_candles(self, instId, bar='1H', after=None, before=None, limit=100):
         """
@@ -157,7 +453,7 @@ class OKXClient:
             path += f'&before={before}'
 
         try:
-            response = requests.get(self.base_url + path, proxies=self.proxies)
+            response = self.session.get(self.base_url + path, proxies=self.proxies, timeout=30)
             return response.json()
         except Exception as e:
             return {"code": "500", "msg": str(e)}
@@ -184,7 +480,73 @@ class OKXClient:
             path += f'&before={before}'
 
         try:
-            response = requests.get(self.base_url + path, proxies=self.proxies)
+            response = self.session.get(self.base_url + path, proxies=self.proxies, timeout=30)
             return response.json()
         except Exception as e:
             return {"code": "500", "msg": str(e)}
+
+
+class AsyncOKXClient:
+    """
+    asyncio interface to OKXClient.
+
+    Requests run on a shared worker pool over the client's keep-alive session, so
+    independent calls overlap instead of queuing. Each call first waits (without
+    blocking the event loop) for its endpoint's window in the shared RateLimiter;
+    headers are signed when the request actually goes out, after that wait.
+    """
+
+    def __init__(self, client, rate_limiter=None, executor=None):
+        shared_limiter, shared_executor = _get_shared_pool()
+        self.client = client
+        self.rate_limiter = rate_limiter or shared_limiter
+        self.executor = executor or shared_executor
+
+    async def request(self, path, fn, *args, **kwargs):
+        """Run client method fn under the rate limit of endpoint path"""
+        window = self.rate_limiter.window(path)
+        while True:
+            wait = window.try_acquire()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def gather(self, *coros):
+        """asyncio.gather that returns request errors in the client's {'code': '500'} form"""
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        return [{"code": "500", "msg": str(r)} if isinstance(r, Exception) else r for r in results]
+
+    async def get_account_balance(self):
+        return await self.request('/api/v5/account/balance', self.client.get_account_balance)
+
+    async def get_positions(self):
+        return await self.request('/api/v5/account/positions', self.client.get_positions)
+
+    async def get_ticker(self, instId):
+        return await self.request('/api/v5/market/ticker', self.client.get_ticker, instId)
+
+    async def place_order(self, instId, tdMode, side, ordType, sz, px=None):
+        return await self.request('/api/v5/trade/order', self.client.place_order, instId, tdMode, side, ordType, sz, px)
+
+    async def get_orders_pending(self, instType=None, instId=None, after=None, limit=100):
+        return await self.request('/api/v5/trade/orders-pending', self.client.get_orders_pending,
+                                  instType, instId, after, limit)
+
+    async def get_orders_history(self, instType, begin=None, after=None, limit=100):
+        return await self.request('/api/v5/trade/orders-history', self.client.get_orders_history,
+                                  instType, begin, after, limit)
+
+    async def place_orders_batch(self, orders):
+        return await self.request('/api/v5/trade/batch-orders', self.client.place_orders_batch, orders)
+
+    async def cancel_orders_batch(self, orders):
+        return await self.request('/api/v5/trade/cancel-batch-orders', self.client.cancel_orders_batch, orders)
+
+    async def get_history_candles(self, instId, bar='1H', after=None, before=None, limit=100):
+        return await self.request('/api/v5/market/history-candles', self.client.get_history_candles,
+                                  instId, bar, after, before, limit)
+
+    async def get_candles(self, instId, bar='1H', after=None, before=None, limit=100):
+        return await self.request('/api/v5/market/candles', self.client.get_candles, instId, bar, after, before, limit)
@@ -0,0 +1,176 @@
+"""
+Backtest Optimizer - 参数网格搜索
+对策略的 show_variable 参数做网格组合，多进程并行回测并按收益排序
+"""
+
+import contextlib
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from quant_engine.backtest_engine import BacktestEngine, BacktestMode
+from quant_engine.shared_klines import SharedKlines, registry
+
+# 单次优化的最大组合数，防止误传过大的网格
+MAX_COMBINATIONS = 1000
+
+# 可用于 sort_by 的汇总指标，默认降序（越大越好）
+SORT_KEYS = ('final_equity', 'pnl', 'pnl_ratio', 'total_orders', 'max_drawdown', 'sharpe', 'sortino', 'win_rate',
+             'round_trips', 'profit_factor')
+
+# 越小越好、按升序排列的指标
+ASCENDING_SORT_KEYS = frozenset({'max_drawdown'})
+
+# 工作进程内的共享状态，由 _init_worker 在进程启动时设置一次
+_worker_state = {}
+
+
+def _init_worker(strategy_code, symbol, bar, initial_balance, descriptor):
+    # 映射父进程发布的共享K线，DataFrame 直接以共享内存为底层数据
+    shared = SharedKlines.attach(descriptor)
+    _worker_state.update({
+        'strategy_code': strategy_code,
+        'symbol': symbol,
+        'bar': bar,
+        'initial_balance': initial_balance,
+        'shared': shared,
+        'data': shared.to_dataframe()
+    })
+
+
+def _close_worker():
+    shared = _worker_state.pop('shared', None)
+    _worker_state.pop('data', None)
+    if shared is not None:
+        shared.close()
+
+
+def _run_combination(params):
+    """在工作进程中执行一次回测，只返回汇总指标"""
+    state = _worker_state
+    engine = BacktestEngine(
+        state['strategy_code'], state['symbol'], None, None,
+        bar=state['bar'], initial_balance=state['initial_balance'],
+        data=state['data'], params=params
+    )
+    # 策略逐K线打印的日志在多进程下没有意义，直接丢弃
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = engine.run()
+
+    summary = {'params': params, 'status': result.get('status')}
+    if result.get('status') == 'success':
+        for key in SORT_KEYS + ('engine',):
+            summary[key] = result[key]
+    else:
+        summary['msg'] = result.get('msg')
+    return summary
+
+
+def _sort_value(summary, sort_by, ascending):
+    """
+    排序键：没有亏损交易时 profit_factor 为 None，视为无穷大（最好）；
+    其他缺失值排在最后，不与真实的 0 混淆
+    """
+    value = summary.get(sort_by)
+    if value is not None:
+        return value
+    if sort_by == 'profit_factor' and summary.get('round_trips'):
+        return float('inf')
+    return float('inf') if ascending else float('-inf')
+
+
+def expand_grid(param_grid):
+    """{'a': [1, 2], 'b': [3]} -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]"""
+    names = list(param_grid.keys())
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in param_grid.values()]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+class BacktestOptimizer:
+    def __init__(self, strategy_code, symbol, start_date, end_date, mode=BacktestMode.DATABASE, bar='1H',
+                 initial_balance=10000.0, max_workers=None):
+        self.strategy_code = strategy_code
+        self.symbol = symbol
+        self.start_date = start_date
+        self.end_date = end_date
+        self.mode = mode
+        self.bar = bar
+        self.initial_balance = initial_balance
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def load_data(self):
+        """K线数据只加载一次，所有组合共用"""
+        engine = BacktestEngine(self.strategy_code, self.symbol, self.start_date, self.end_date,
+                                mode=self.mode, bar=self.bar, initial_balance=self.initial_balance)
+        return engine.fetch_data()
+
+    def run(self, param_grid, sort_by='pnl_ratio', data=None):
+        """
+        执行参数网格搜索
+
+        Args:
+            param_grid: 参数名 -> 候选值列表，如 {'fast_ema_period': [8, 12], 'slow_ema_period': [21, 26]}
+            sort_by: 排序指标，SORT_KEYS 之一；max_drawdown 按升序，其余按降序
+            data: 可选，预先加载的K线DataFrame
+
+        Returns:
+            dict: {'status', 'results'(按 sort_by 从优到劣), 'total_runs', 'workers', 'elapsed'}
+        """
+        if sort_by not in SORT_KEYS:
+            return {'status': 'error', 'msg': f'不支持的排序指标: {sort_by}，可选 {", ".join(SORT_KEYS)}'}
+        combinations = expand_grid(param_grid or {})
+        if not combinations:
+            return {'status': 'error', 'msg': '参数网格为空'}
+        if len(combinations) > MAX_COMBINATIONS:
+            return {'status': 'error', 'msg': f'参数组合过多: {len(combinations)} > {MAX_COMBINATIONS}'}
+
+        key = (self.symbol, self.bar, str(self.start_date), str(self.end_date), self.mode)
+        if data is not None:
+            key += (id(data),)
+
+        def loader():
+            if data is not None:
+                return data
+            df, error = self.load_data()
+            if error:
+                raise ValueError(error)
+            return df
+
+        workers = max(1, min(self.max_workers, len(combinations)))
+        start = time.perf_counter()
+        try:
+            # K线在本任务期间发布到共享内存，所有工作进程只读映射；任务结束后引用计数归零即释放
+            with registry.lease(key, loader) as descriptor:
+                data_points = descriptor['length']
+                init_args = (self.strategy_code, self.symbol, self.bar, self.initial_balance, descriptor)
+                if workers == 1:
+                    _init_worker(*init_args)
+                    try:
+                        results = [_run_combination(params) for params in combinations]
+                    finally:
+                        _close_worker()
+                else:
+                    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+                        results = list(pool.map(_run_combination, combinations))
+        except ValueError as e:
+            return {'status': 'error', 'msg': str(e)}
+        elapsed = time.perf_counter() - start
+
+        succeeded = [r for r in results if r['status'] == 'success']
+        failed = [r for r in results if r['status'] != 'success']
+        ascending = sort_by in ASCENDING_SORT_KEYS
+        succeeded.sort(key=lambda r: _sort_value(r, sort_by, ascending), reverse=not ascending)
+        for rank, r in enumerate(succeeded, 1):
+            r['rank'] = rank
+
+        return {
+            'status': 'success',
+            'results': succeeded + failed,
+            'total_runs': len(results),
+            'failed_runs': len(failed),
+            'workers': workers,
+            'data_points': int(data_points),
+            'sort_by': sort_by,
+            'elapsed': round(elapsed, 3)
+        }
@@ -0,0 +1,265 @@
+"""
+Order Tracker - 订单生命周期跟踪与成交对账
+place_limit / place_limits_batch 提交成功的订单登记到当前策略的 OrderTracker，策略每个周期开始时调用 reconcile()：
+
+- 一次 /trade/orders-pending 请求（超过 100 条时翻页）取回全部挂单，按 accFillSz 的增量记录部分成交
+- 从挂单中消失的订单按品种类型批量查询 /trade/orders-history 得到最终状态，查不到的再逐个查 /trade/order
+- 每笔新增成交按平均成本法计算已实现盈亏（含手续费），通过 log_writer.update_trade_fill 写回 strategy_trades；
+  strategy_metrics 由 strategy_trades 上的触发器在同一事务中更新
+
+重启后 restore() 从数据库恢复未完结的订单，并按已成交记录重建持仓成本。
+"""
+
+import threading
+import time
+from datetime import datetime
+
+# OKX 订单状态 -> strategy_trades.status
+OKX_STATE_STATUS = {
+    'live': 'SUBMITTED',
+    'partially_filled': 'PARTIALLY_FILLED',
+    'filled': 'FILLED',
+    'canceled': 'CANCELLED',
+    'mmp_canceled': 'CANCELLED',
+}
+
+FINAL_STATUSES = ('FILLED', 'CANCELLED')
+
+# orders-pending / orders-history 每页最大条数
+PAGE_LIMIT = 100
+
+# orders-history 最多翻几页
+MAX_HISTORY_PAGES = 5
+
+# 批量查询后仍找不到的订单，每次对账最多逐个查询几笔
+MAX_ORDER_LOOKUPS = 20
+
+EPS = 1e-12
+
+
+def inst_type(instId):
+    """由交易对推断 OKX instType"""
+    if instId.endswith('-SWAP'):
+        return 'SWAP'
+    if instId.count('-') >= 2:
+        return 'FUTURES'
+    return 'SPOT'
+
+
+def _float(value):
+    try:
+        return float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PositionBook:
+    """一个交易对的净持仓与平均成本（买入为正，卖出为负）"""
+
+    def __init__(self):
+        self.qty = 0.0
+        self.avg_price = 0.0
+
+    def apply(self, side, qty, price, fee=0.0):
+        """
+        记入一笔成交
+
+        Args:
+            fee: 以计价货币表示的手续费，OKX 中扣费为负数
+
+        Returns:
+            float: 平仓部分的已实现盈亏（开仓手续费计入成本，平仓手续费计入盈亏）；纯开仓返回 None
+        """
+        sign = 1 if side == 'buy' else -1
+        realized = None
+        closing = min(qty, abs(self.qty)) if self.qty * sign < 0 else 0.0
+        if closing > EPS:
+            direction = 1 if self.qty > 0 else -1
+            realized = (price - self.avg_price) * closing * direction + fee * closing / qty
+            self.qty += sign * closing
+            if abs(self.qty) < EPS:
+                self.qty = 0.0
+                self.avg_price = 0.0
+        opening = qty - closing
+        if opening > EPS:
+            cost = price - sign * fee / qty
+            held = abs(self.qty)
+            self.avg_price = (self.avg_price * held + cost * opening) / (held + opening)
+            self.qty += sign * opening
+        return realized
+
+
+class OrderTracker:
+    def __init__(self, client, strategy_name):
+        self.client = client
+        self.strategy_name = strategy_name
+        self.orders = {}
+        self.books = {}
+        self.lock = threading.Lock()
+        self.last_reconcile = None
+
+    def book(self, symbol):
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = PositionBook()
+        return book
+
+    def track(self, order_id, symbol, side, price, qty):
+        """登记一笔已提交的订单"""
+        if not order_id:
+            return
+        with self.lock:
+            self.orders[str(order_id)] = {
+                'order_id': str(order_id), 'symbol': symbol, 'side': side, 'price': price, 'qty': float(qty),
+                'filled': 0.0, 'avg_price': 0.0, 'fee': 0.0, 'pnl': None, 'status': 'SUBMITTED',
+                'submitted_at': int(time.time() * 1000)
+            }
+
+    def open_orders(self):
+        with self.lock:
+            return [dict(order) for order in self.orders.values()]
+
+    def restore(self):
+        """从 strategy_trades 恢复未完结订单和持仓成本（进程重启后调用）"""
+        from quant_engine import log_writer
+        from quant_engine.db import get_open_trades, get_filled_trades
+
+        log_writer.flush(timeout=5)  # 本进程中尚在队列里的成交记录
+        with self.lock:
+            self.books = {}
+            for trade in get_filled_trades(self.strategy_name):
+                qty = trade['filled_quantity']
+                self.book(trade['symbol']).apply(trade['side'], qty, trade['fill_price'] or trade['price'],
+                                                 trade['fee'] or 0.0)
+            for trade in get_open_trades(self.strategy_name):
+                submitted_at = trade['timestamp']
+                if isinstance(submitted_at, str):
+                    submitted_at = datetime.fromisoformat(submitted_at)
+                self.orders[trade['order_id']] = {
+                    'order_id': trade['order_id'], 'symbol': trade['symbol'], 'side': trade['side'],
+                    'price': trade['price'], 'qty': float(trade['quantity'] or 0),
+                    'filled': trade['filled_quantity'] or 0.0, 'avg_price': trade['fill_price'] or 0.0,
+                    'fee': trade['fee'] or 0.0, 'pnl': trade['pnl'], 'status': trade['status'],
+                    'submitted_at': int(submitted_at.timestamp() * 1000)
+                }
+        return len(self.orders)
+
+    def reconcile(self):
+        """
+        查询交易所并更新所有未完结订单
+
+        Returns:
+            dict: {'open', 'updated', 'filled', 'cancelled', 'realized_pnl'}，查询失败时带 'error'
+        """
+        summary = {'open': 0, 'updated': 0, 'filled': 0, 'cancelled': 0, 'realized_pnl': 0.0}
+        with self.lock:
+            tracked = dict(self.orders)
+        if not tracked:
+            return summary
+
+        pending, error = self._fetch_pending()
+        if pending is None:
+            summary['error'] = error
+            return summary
+
+        updates = [(order, pending[oid]) for oid, order in tracked.items() if oid in pending]
+        vanished = [order for oid, order in tracked.items() if oid not in pending]
+        if vanished:
+            history = self._fetch_history(vanished)
+            lookups = 0
+            for order in vanished:
+                data = history.get(order['order_id'])
+                if data is None and lookups < MAX_ORDER_LOOKUPS:
+                    lookups += 1
+                    res = self.client.get_order(order['symbol'], order['order_id'])
+                    if res.get('code') == '0' and res.get('data'):
+                        data = res['data'][0]
+                if data is not None:
+                    updates.append((order, data))
+
+        with self.lock:
+            for order, data in updates:
+                before = (order['filled'], order['status'], order['pnl'])
+                realized = self._apply(order, data)
+                if (order['filled'], order['status'], order['pnl']) != before:
+                    summary['updated'] += 1
+                if realized is not None:
+                    summary['realized_pnl'] += realized
+                if order['status'] in FINAL_STATUSES:
+                    self.orders.pop(order['order_id'], None)
+                    summary['filled' if order['status'] == 'FILLED' else 'cancelled'] += 1
+                else:
+                    self.orders[order['order_id']] = order
+            summary['open'] = len(self.orders)
+        self.last_reconcile = time.time()
+        return summary
+
+    def _apply(self, order, data):
+        """把 OKX 订单数据中的累计成交增量记入订单和持仓，返回本次新增的已实现盈亏"""
+        from quant_engine.log_writer import update_trade_fill
+
+        acc = _float(data.get('accFillSz'))
+        avg = _float(data.get('avgPx'))
+        fee = _float(data.get('fee'))
+        if data.get('feeCcy') == order['symbol'].split('-')[0]:
+            # 现货买入的手续费以基础货币扣除，按成交均价折算为计价货币（费率不变时与逐笔折算相同），
+            # order['fee'] 和写入 strategy_trades 的 fee 都是计价货币，restore() 可直接重放
+            fee *= avg
+        status = OKX_STATE_STATUS.get(data.get('state'), order['status'])
+        realized = None
+
+        delta = acc - order['filled']
+        if delta > EPS:
+            # 由累计均价反推本次新增成交的价格
+            fill_px = (avg * acc - order['avg_price'] * order['filled']) / delta
+            fee_delta = fee - order['fee']
+            realized = self.book(order['symbol']).apply(order['side'], delta, fill_px, fee_delta)
+            if realized is not None:
+                order['pnl'] = (order['pnl'] or 0.0) + realized
+            order.update(filled=acc, avg_price=avg, fee=fee)
+        elif status == order['status']:
+            return None
+
+        order['status'] = status
+        update_trade_fill(order['order_id'], status, order['filled'], order['avg_price'] or None, order['fee'],
+                          order['pnl'])
+        return realized
+
+    def _fetch_pending(self):
+        """全部挂单 {ordId: data}；请求失败返回 (None, 错误信息)"""
+        pending = {}
+        after = None
+        while True:
+            res = self.client.get_orders_pending(after=after, limit=PAGE_LIMIT)
+            if res.get('code') != '0':
+                return None, res.get('msg', 'orders-pending failed')
+            data = res.get('data') or []
+            for item in data:
+                pending[item['ordId']] = item
+            if len(data) < PAGE_LIMIT:
+                return pending, None
+            after = data[-1]['ordId']
+
+    def _fetch_history(self, orders):
+        """按 instType 批量查询已完结订单 {ordId: data}，找齐或翻完 MAX_HISTORY_PAGES 页为止"""
+        found = {}
+        wanted = {order['order_id'] for order in orders}
+        by_type = {}
+        for order in orders:
+            by_type.setdefault(inst_type(order['symbol']), []).append(order)
+        for instType, group in by_type.items():
+            begin = min(order['submitted_at'] for order in group) - 60000
+            after = None
+            for _ in range(MAX_HISTORY_PAGES):
+                res = self.client.get_orders_history(instType, begin=begin, after=after, limit=PAGE_LIMIT)
+                if res.get('code') != '0':
+                    print(f"[ORDERS] orders-history failed: {res.get('msg')}")
+                    break
+                data = res.get('data') or []
+                for item in data:
+                    if item['ordId'] in wanted:
+                        found[item['ordId']] = item
+                if len(data) < PAGE_LIMIT or all(order['order_id'] in found for order in group):
+                    break
+                after = data[-1]['ordId']
+        return found
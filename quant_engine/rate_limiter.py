@@ -0,0 +1,84 @@
+"""
+Rate Limiter - 按 OKX 接口限速
+"""
+
+import threading
+import time
+from collections import deque
+
+# OKX 各接口限速: path -> (请求数, 时间窗口秒)
+OKX_RATE_LIMITS = {
+    '/api/v5/market/history-candles': (20, 2),
+    '/api/v5/market/candles': (40, 2),
+    '/api/v5/market/ticker': (20, 2),
+    '/api/v5/account/balance': (10, 2),
+    '/api/v5/account/positions': (10, 2),
+    '/api/v5/trade/order': (60, 2),
+    '/api/v5/trade/batch-orders': (300, 2),
+    '/api/v5/trade/cancel-batch-orders': (300, 2),
+    '/api/v5/trade/orders-pending': (60, 2),
+    '/api/v5/trade/orders-history': (40, 2),
+    '/api/v5/trade/fills': (60, 2),
+}
+
+# 未登记接口的保守默认值
+DEFAULT_RATE_LIMIT = (10, 2)
+
+
+class SlidingWindow:
+    """
+    线程安全的滑动窗口限速：任意 period 秒内最多 capacity 次请求。
+
+    OKX 按时间窗口计数，令牌桶在桶满时会让一个窗口内放行接近两倍的请求，因此按窗口精确计数。
+    """
+
+    def __init__(self, capacity, period):
+        self.capacity = int(capacity)
+        self.period = float(period)
+        self.history = deque()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        尝试登记一次请求
+
+        Returns:
+            float: 0 表示成功，否则为需要等待的秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            while self.history and now - self.history[0] >= self.period:
+                self.history.popleft()
+            if len(self.history) < self.capacity:
+                self.history.append(now)
+                return 0.0
+            return self.period - (now - self.history[0])
+
+    def acquire(self):
+        """阻塞直到可以发出请求"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """按接口路径分配限速窗口，同一进程内共享"""
+
+    def __init__(self, limits=None):
+        self.limits = dict(OKX_RATE_LIMITS if limits is None else limits)
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def window(self, path):
+        path = path.split('?', 1)[0]
+        with self.lock:
+            window = self.windows.get(path)
+            if window is None:
+                window = SlidingWindow(*self.limits.get(path, DEFAULT_RATE_LIMIT))
+                self.windows[path] = window
+            return window
+
+    def acquire(self, path):
+        self.window(path).acquire()
@@ -0,0 +1,171 @@
+"""
+Resampler - 由已存储的细粒度K线合成更高周期
+market_klines 中没有某个周期时，MarketDataManager.get_klines_from_db 从该交易对已存储的最细周期（如 1m）聚合得到，
+不必对 1m/5m/15m/1H/4H/1D 分别同步和存储。
+
+聚合:
+    按 OKX 的K线边界分桶（1m~4H 按 UTC 整点，6H/12H/1D/1W 按香港时间，与 bar_clock.bar_anchor 一致，
+    合成结果与交易所同名周期的K线对齐），open 取桶内第一根，close 取最后一根，high/low 取极值，成交量求和；
+    全部由 np.*.reduceat 向量化完成。源数据开头不完整的桶和末尾尚未覆盖到收盘的桶丢弃
+
+缓存:
+    合成结果写入 kline_store/_resampled/<源周期>/<交易对>/<周期>/（与 KlineStore 相同的按月分区格式），之后内存映射读取；
+    每次同步写入源周期数据后 extend() 只重新聚合受影响的桶，删除源数据时 invalidate() 清除对应缓存
+"""
+
+import os
+import shutil
+
+import numpy as np
+
+from quant_engine.bar_clock import bar_anchor
+from quant_engine.kline_store import KlineStore, STORE_COLUMNS
+from quant_engine.sync_engine import BAR_MS
+
+RESAMPLED_DIR = '_resampled'
+
+SUM_COLUMNS = ('vol', 'vol_ccy', 'vol_ccy_quote')
+
+
+def can_derive(source_bar, target_bar):
+    """target_bar 的每根K线是否恰好由整数根 source_bar 组成（周期整除且边界对齐）"""
+    if source_bar not in BAR_MS or target_bar not in BAR_MS:
+        return False
+    source, target = BAR_MS[source_bar], BAR_MS[target_bar]
+    if source >= target or target % source:
+        return False
+    return (bar_anchor(target_bar) - bar_anchor(source_bar)) * 1000 % source == 0
+
+
+def bucket_start(ts, bar):
+    """K线所属 bar 周期的开盘时间（毫秒），ts 可为标量或数组"""
+    period = BAR_MS[bar]
+    anchor = bar_anchor(bar) * 1000
+    return ts - (ts - anchor) % period
+
+
+def drop_partial_head(columns, bar):
+    """源数据从 bar 周期的桶中间开始时，去掉第一个不完整桶内的K线"""
+    ts = np.asarray(columns['ts'], dtype=np.int64)
+    if len(ts) == 0 or bucket_start(ts[0], bar) == ts[0]:
+        return columns
+    keep = ts >= bucket_start(ts[0], bar) + BAR_MS[bar]
+    return {name: np.asarray(values)[keep] for name, values in columns.items()}
+
+
+def _empty_columns():
+    return {name: np.array([], dtype=dtype) for name, dtype in STORE_COLUMNS}
+
+
+def resample_columns(columns, source_bar, target_bar):
+    """
+    Args:
+        columns: 源周期K线 {列名: ndarray}，按 ts 升序且无重复
+
+    Returns:
+        dict: 目标周期K线 {列名: ndarray}
+    """
+    ts = np.asarray(columns['ts'], dtype=np.int64)
+    if len(ts) == 0:
+        return _empty_columns()
+    buckets = bucket_start(ts, target_bar)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(ts)) - 1
+
+    def column(name):
+        if name in columns:
+            return np.asarray(columns[name], dtype=np.float64)
+        return np.full(len(ts), np.nan)
+
+    out = {
+        'ts': buckets[starts],
+        'open': column('open')[starts],
+        'high': np.maximum.reduceat(column('high'), starts),
+        'low': np.minimum.reduceat(column('low'), starts),
+        'close': column('close')[ends],
+    }
+    for name in SUM_COLUMNS:
+        out[name] = np.add.reduceat(column(name), starts)
+
+    # 最后一个桶的源数据还没到收盘（当前未完成的K线）
+    if ts[-1] + BAR_MS[source_bar] < out['ts'][-1] + BAR_MS[target_bar]:
+        out = {name: values[:-1] for name, values in out.items()}
+    return out
+
+
+class Resampler:
+    def __init__(self, manager):
+        """
+        Args:
+            manager: MarketDataManager，源周期数据通过它读取（列式存储或 SQLite）
+        """
+        self.manager = manager
+        self.root = os.path.join(manager.store.root, RESAMPLED_DIR)
+
+    def cache(self, source_bar):
+        return KlineStore(os.path.join(self.root, source_bar))
+
+    def source_bar(self, symbol, bar):
+        """可以合成 bar 的最细已存储周期，没有时返回 None"""
+        for source in sorted((b for b in BAR_MS if can_derive(b, bar)), key=BAR_MS.get):
+            if self.manager.is_stored(symbol, source):
+                return source
+        return None
+
+    def read(self, symbol, bar, start_ts=None, end_ts=None):
+        """
+        合成周期的K线，首次读取时从源周期全量聚合并缓存
+
+        Returns:
+            DataFrame: 与 KlineStore.read 相同的列；无法合成时返回 None
+        """
+        source = self.source_bar(symbol, bar)
+        if source is None:
+            return None
+        cache = self.cache(source)
+        if not cache.has(symbol, bar):
+            self.build(symbol, bar, source)
+        return cache.read(symbol, bar, start_ts, end_ts)
+
+    def build(self, symbol, bar, source):
+        df = self.manager.read_klines(symbol, source)
+        columns = drop_partial_head({name: df[name].to_numpy() for name in df.columns}, bar)
+        columns = resample_columns(columns, source, bar)
+        cache = self.cache(source)
+        cache.delete(symbol, bar)
+        count = cache.write(symbol, bar, columns)
+        print(f"[RESAMPLE] {symbol} {bar} built from {len(df)} {source} klines ({count} bars)")
+        return count
+
+    def cached_bars(self, symbol, source):
+        path = os.path.join(self.root, source, symbol)
+        if not os.path.isdir(path):
+            return []
+        return [bar for bar in os.listdir(path) if bar in BAR_MS]
+
+    def extend(self, symbol, source, ts):
+        """
+        源周期写入了时间戳为 ts 的K线后，重新聚合已缓存周期中受影响的桶
+
+        Returns:
+            int: 更新的合成K线数
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        bars = self.cached_bars(symbol, source)
+        if len(ts) == 0 or not bars:
+            return 0
+        cache = self.cache(source)
+        updated = 0
+        for bar in bars:
+            start = int(bucket_start(ts.min(), bar))
+            end = int(bucket_start(ts.max(), bar)) + BAR_MS[bar] - 1
+            df = self.manager.read_klines(symbol, source, start, end)
+            columns = resample_columns({name: df[name].to_numpy() for name in df.columns}, source, bar)
+            updated += cache.write(symbol, bar, columns)
+        return updated
+
+    def invalidate(self, symbol, source=None):
+        """删除由 source 周期（默认全部）合成的缓存"""
+        sources = [source] if source else (os.listdir(self.root) if os.path.isdir(self.root) else [])
+        for src in sources:
+            shutil.rmtree(os.path.join(self.root, src, symbol), ignore_errors=True)
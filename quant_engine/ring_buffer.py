@@ -0,0 +1,131 @@
+"""
+Ring Buffer - 定长价格历史
+取代策略中的 self.price_history 列表：列表用 pop(0)（O(n)）或 self.price_history[-100:]（整段复制）截断，
+RingBuffer 容量固定，append O(1)，超出容量时自动丢弃最旧的值。
+
+底层为 2 * capacity 的 NumPy 数组，每个值同时写入 i 和 i + capacity 两个位置，
+因此最近 n 个值在内存中总是连续的，切片和 view() 返回零复制的视图，可直接交给 NumPy 或 indicators 批量函数。
+
+与 list 兼容的用法: len()、下标（含负数）、切片、迭代、in、max()/min()/sum()、append、extend、clear。
+区别: 切片返回 NumPy 视图，视图在下一次 append 后可能被覆盖，需要保留时用 .copy() 或 tolist()。
+
+多通道（OHLCV）:
+    bars = RingBuffer(200, fields=OHLCV_FIELDS)
+    bars.append((o, h, l, c, v))       # 或 bars.append_bar(open=o, high=h, ...)
+    bars.close[-20:]                     # 收盘价通道视图
+    bars[-1]                             # 最近一根K线 [o, h, l, c, v]
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+OHLCV_FIELDS = ('open', 'high', 'low', 'close', 'vol')
+
+
+class RingBuffer(Sequence):
+    def __init__(self, capacity, fields=None, values=None):
+        """
+        Args:
+            capacity: 最多保留的值个数
+            fields: 可选的通道名，如 OHLCV_FIELDS；给定时每个元素是一行，各通道可按属性名访问
+            values: 可选的初始数据（超过容量时只保留最后 capacity 个）
+        """
+        capacity = int(capacity)
+        if capacity < 1:
+            raise ValueError(f'capacity must be >= 1, got {capacity}')
+        self.capacity = capacity
+        self.fields = tuple(fields) if fields else None
+        shape = (2 * capacity, len(self.fields)) if self.fields else (2 * capacity,)
+        self._data = np.zeros(shape, dtype=np.float64)
+        self._index = {name: i for i, name in enumerate(self.fields)} if self.fields else {}
+        self._write = 0  # 下一个写入位置，[0, capacity)
+        self._size = 0
+        if values is not None:
+            self.extend(values)
+
+    @property
+    def full(self):
+        return self._size == self.capacity
+
+    def _start(self):
+        return self._write + self.capacity - self._size
+
+    def append(self, value):
+        self._data[self._write] = value
+        self._data[self._write + self.capacity] = value
+        self._write = (self._write + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def append_bar(self, **values):
+        """多通道时按通道名追加一行，未给出的通道记为 NaN"""
+        row = np.full(len(self.fields), np.nan)
+        for name, value in values.items():
+            row[self._index[name]] = value
+        self.append(row)
+
+    def extend(self, values):
+        """批量追加（预热、回填历史时使用），只写入最后 capacity 个值"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        values = values[-self.capacity:]
+        n = len(values)
+        # 先按写入位置分成至多两段写入前半区，再整体镜像到后半区
+        first = min(n, self.capacity - self._write)
+        self._data[self._write:self._write + first] = values[:first]
+        self._data[:n - first] = values[first:]
+        self._data[self.capacity:] = self._data[:self.capacity]
+        self._write = (self._write + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def clear(self):
+        self._write = 0
+        self._size = 0
+
+    def view(self, n=None):
+        """最近 n 个值（默认全部）的零复制视图，按时间先后排列"""
+        n = self._size if n is None else min(int(n), self._size)
+        end = self._write + self.capacity
+        return self._data[end - n:end]
+
+    def tolist(self):
+        return self.view().tolist()
+
+    def copy(self):
+        return self.view().copy()
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.view()[key]
+        if key < 0:
+            key += self._size
+        if not 0 <= key < self._size:
+            raise IndexError('RingBuffer index out of range')
+        value = self._data[self._start() + key]
+        return value if self.fields else float(value)
+
+    def __iter__(self):
+        if self.fields:
+            return iter(self.view())
+        return iter(self.view().tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.view()
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data.copy() if copy else data
+
+    def __getattr__(self, name):
+        index = self.__dict__.get('_index')
+        if index and name in index:
+            return self.view()[:, index[name]]
+        raise AttributeError(f"'RingBuffer' object has no attribute '{name}'")
+
+    def __repr__(self):
+        fields = f', fields={self.fields}' if self.fields else ''
+        return f'RingBuffer(capacity={self.capacity}{fields}, size={self._size})'
@@ -0,0 +1,163 @@
+"""
+Shared Klines - 多进程共享K线数组
+将一段 (symbol, bar, 时间范围) 的K线一次性写入 multiprocessing.shared_memory，
+回测/参数优化的工作进程按描述符直接映射，不再各自查询和反序列化 market_klines。
+"""
+
+import atexit
+import threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+KLINE_COLUMNS = (
+    ('ts', 'int64'),
+    ('open', 'float64'),
+    ('high', 'float64'),
+    ('low', 'float64'),
+    ('close', 'float64'),
+    ('vol', 'float64'),
+)
+
+
+class SharedKlines:
+    """一块共享内存中的K线列数组，列按 KLINE_COLUMNS 顺序连续存放"""
+
+    def __init__(self, shm, descriptor, owner=False):
+        self.shm = shm
+        self.descriptor = descriptor
+        self.owner = owner
+        self._arrays = None
+
+    @classmethod
+    def publish(cls, df, key=None):
+        """把K线DataFrame复制进一块新的共享内存，返回拥有者对象"""
+        length = len(df)
+        if length == 0:
+            raise ValueError('Cannot publish an empty kline slice')
+
+        columns = []
+        offset = 0
+        for name, dtype in KLINE_COLUMNS:
+            columns.append((name, dtype, offset))
+            offset += length * np.dtype(dtype).itemsize
+
+        shm = shared_memory.SharedMemory(create=True, size=offset)
+        descriptor = {'name': shm.name, 'length': length, 'columns': columns, 'key': key}
+        shared = cls(shm, descriptor, owner=True)
+        for name, dtype, col_offset in columns:
+            target = np.ndarray((length,), dtype=dtype, buffer=shm.buf, offset=col_offset)
+            if name in df.columns:
+                source = df[name].to_numpy(dtype=dtype, na_value=0)
+            elif name in ('open', 'high', 'low'):
+                source = df['close'].to_numpy(dtype=dtype)
+            else:
+                source = 0
+            target[:] = source
+        return shared
+
+    @classmethod
+    def attach(cls, descriptor):
+        """在工作进程中按描述符映射已发布的共享内存（不复制数据）"""
+        try:
+            shm = shared_memory.SharedMemory(name=descriptor['name'], track=False)
+        except TypeError:
+            # Python < 3.13 没有 track 参数；multiprocessing 子进程共用父进程的 resource_tracker，重复登记无副作用
+            shm = shared_memory.SharedMemory(name=descriptor['name'])
+        return cls(shm, descriptor, owner=False)
+
+    def arrays(self):
+        """返回只读的列数组视图 {column: ndarray}"""
+        if self._arrays is None:
+            length = self.descriptor['length']
+            arrays = {}
+            for name, dtype, offset in self.descriptor['columns']:
+                arr = np.ndarray((length,), dtype=dtype, buffer=self.shm.buf, offset=offset)
+                arr.flags.writeable = False
+                arrays[name] = arr
+            self._arrays = arrays
+        return self._arrays
+
+    def to_dataframe(self):
+        """以共享数组为底层数据构造DataFrame，不复制"""
+        return pd.DataFrame(self.arrays(), copy=False)
+
+    def close(self):
+        self._arrays = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 仍有数组视图存活（如最后一次回测的 BacktestClient），映射在视图回收后释放
+            pass
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedKlineRegistry:
+    """
+    父进程中的共享K线登记表，按 (symbol, bar, start, end) 做引用计数。
+
+    每个回测任务开始时 acquire、结束时 release；同一数据段的并发任务共用一块共享内存，
+    引用计数归零时释放并 unlink。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, loader):
+        """
+        获取 key 对应的共享内存描述符，不存在时调用 loader() 加载DataFrame并发布
+
+        Returns:
+            dict: 可传给工作进程的描述符（可pickle）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                df = loader()
+                if df is None or df.empty:
+                    raise ValueError(f'No kline data for {key}')
+                entry = {'shared': SharedKlines.publish(df, key), 'refs': 0}
+                self._entries[key] = entry
+            entry['refs'] += 1
+            return entry['shared'].descriptor
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['refs'] -= 1
+            if entry['refs'] <= 0:
+                del self._entries[key]
+                entry['shared'].close()
+                entry['shared'].unlink()
+
+    @contextmanager
+    def lease(self, key, loader):
+        """在一个回测任务的生命周期内持有共享K线"""
+        descriptor = self.acquire(key, loader)
+        try:
+            yield descriptor
+        finally:
+            self.release(key)
+
+    def active(self):
+        with self._lock:
+            return {key: entry['refs'] for key, entry in self._entries.items()}
+
+    def release_all(self):
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for entry in entries.values():
+            entry['shared'].close()
+            entry['shared'].unlink()
+
+
+registry = SharedKlineRegistry()
+atexit.register(registry.release_all)
@@ -1,6 +1,9 @@
 from enum import Enum
+import threading
 import time
 
+from quant_engine.ring_buffer import RingBuffer, OHLCV_FIELDS
+
 class AlgoStrategyType(Enum):
     SECURITY = 1
 
@@ -34,11 +37,15 @@ class StrategyBase:
         self.strategy_name = strategy_name or self.__class__.__name__
         self.last_heartbeat = time.time()
         self.loop_interval = 30  # Default interval, can be overridden
+        self.bar = None  # K-line period; when set, handle_data runs at each bar close instead of every loop_interval
+        self.clock = None
+        self.warmup_bars = 0  # Closed candles replayed through handle_data before live trading (see warm_up)
+        self.warmup_bars_override = None  # Set by the runner (--warmup-bars); wins over what initialize() assigns
         
     def log_event(self, level, event_type, message, data=None):
-        """Log a strategy event to database"""
+        """Queue a strategy event for the background database writer"""
         try:
-            from quant_engine.db import log_strategy_event
+            from quant_engine.log_writer import log_strategy_event
             log_strategy_event(self.strategy_name, level, event_type, message, data)
         except Exception as e:
             print(f"Failed to log event: {e}")
@@ -61,12 +68,24 @@ class StrategyBase:
     def handle_data(self):
         pass
 
+    def compute_signals(self, df):
+        """
+        Optional array-level hook for backtests.
+
+        Return an array with one target position size (base currency) per row of
+        the kline DataFrame `df` to let BacktestEngine run the vectorized signal
+        path. Returning None (the default) keeps the per-bar handle_data loop.
+        """
+        return None
+
     def run(self):
         self.log_event('INFO', 'START', f'Strategy {self.strategy_name} started on {self.symbol}')
         
         try:
             self.initialize()
+            self.warm_up()
             self.is_running = True
+            self.clock = self._make_clock()
             
             while self.is_running:
                 try:
@@ -74,16 +93,27 @@ class StrategyBase:
                     current_time = time.time()
                     if current_time - self.last_heartbeat > 30:
                         self.update_heartbeat()
-                        self.log_event('INFO', 'HEARTBEAT', 'Strategy is running')
+                        self.log_event('INFO', 'HEARTBEAT', 'Strategy is running',
+                                       self.clock.stats() if self.clock else None)
                         self.last_heartbeat = current_time
                     
+                    reconcile_orders()
+                    invalidate_snapshot()
                     self.handle_data()
                 except Exception as e:
                     error_msg = f"Error in strategy loop: {e}"
                     print(error_msg)
                     self.log_event('ERROR', 'ERROR', error_msg)
                     
-                time.sleep(self.loop_interval)
+                if self.clock is None:
+                    time.sleep(self.loop_interval)
+                    continue
+                missed = self.clock.missed
+                if self.clock.wait_next(lambda: not self.is_running) is None:
+                    break
+                if self.clock.missed > missed:
+                    self.log_event('WARNING', 'TIMING',
+                                   f'Missed {self.clock.missed - missed} {self.bar} bar close(s)', self.clock.stats())
                 
         except Exception as e:
             error_msg = f"Fatal error in strategy: {e}"
@@ -94,6 +124,45 @@ class StrategyBase:
         finally:
             self.log_event('INFO', 'STOP', f'Strategy {self.strategy_name} stopped')
 
+    def warm_up(self):
+        """
+        Replay the last warmup_bars (or warmup_bars_override) closed candles of self.bar through handle_data.
+
+        Indicator state is ready before the first live decision instead of after
+        warmup_bars live cycles. Orders placed during the replay are suppressed.
+        Returns the warm-up stats, or None when disabled.
+        """
+        client = StrategyContext.current_client
+        count = self.warmup_bars if self.warmup_bars_override is None else self.warmup_bars_override
+        if not count or not self.bar or client is None or getattr(client, 'simulated', False):
+            return None
+        from quant_engine.sync_engine import BAR_MS
+        if self.bar not in BAR_MS:
+            return None
+        from quant_engine.warmup import run_warmup
+        try:
+            stats = run_warmup(self, int(count))
+        except Exception as e:
+            error_msg = f"Warm-up failed: {e}"
+            print(error_msg)
+            self.log_event('ERROR', 'WARMUP', error_msg)
+            return None
+        self.log_event('INFO', 'WARMUP', f"Warmed up on {stats['bars']}/{stats['requested']} {self.bar} bars "
+                       f"({stats['source'] or 'no data'}) in {stats['elapsed']}s, "
+                       f"{stats['suppressed']} order(s) suppressed", stats)
+        return stats
+
+    def _make_clock(self):
+        """BarClock for self.bar, triggered by confirmed candles when the client has a market stream"""
+        if not self.bar:
+            return None
+        from quant_engine.bar_clock import BarClock
+        from quant_engine.sync_engine import BAR_MS
+        if self.bar not in BAR_MS:
+            print(f"Unknown bar {self.bar}, falling back to {self.loop_interval}s polling")
+            return None
+        return BarClock(self.bar, stream=getattr(self.client, 'stream', None), symbol=self.symbol)
+
     def stop(self):
         self.is_running = False
 
@@ -134,36 +203,174 @@ def ceil(x):
     import math
     return math.ceil(x)
 
-# Context manager to handle global context for strategies
-class StrategyContext:
+# Context for the global helper functions; thread-local so strategies running in
+# threads of one process (app.py) and a thread's warm-up replay don't see each other's client
+class _StrategyContext(threading.local):
     current_client = None
     current_symbol = None
     current_strategy_name = 'unknown'
+    snapshot = None
+    order_tracker = None
+
+StrategyContext = _StrategyContext()
 
 def set_context(client, symbol, strategy_name=None):
     StrategyContext.current_client = client
     StrategyContext.current_symbol = symbol
+    StrategyContext.snapshot = None
+    StrategyContext.order_tracker = None
     if strategy_name:
         StrategyContext.current_strategy_name = strategy_name
 
+# Safety net for strategies that call the helpers outside the run loop
+SNAPSHOT_MAX_AGE = 5.0
+
+_snapshot_executor = None
+
+def _get_snapshot_executor():
+    global _snapshot_executor
+    if _snapshot_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _snapshot_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='account-snapshot')
+    return _snapshot_executor
+
+class AccountSnapshot:
+    """
+    Balance, positions and ticker for one strategy cycle.
+
+    The three REST calls are issued concurrently on first use, so a handle_data
+    that calls current_price, max_qty_to_sell and max_qty_to_buy_on_cash pays
+    for one round trip instead of three. Positions are indexed by instId.
+    """
+
+    def __init__(self, client, symbol):
+        self.client = client
+        self.symbol = symbol
+        self.created = time.time()
+        self.balance_details = {}
+        self.positions = {}
+        self.tickers = {}
+
+    def load(self):
+        executor = _get_snapshot_executor()
+        balance = executor.submit(self.client.get_account_balance)
+        positions = executor.submit(self.client.get_positions)
+        # The WebSocket cache already has the price when streaming
+        stream = getattr(self.client, 'stream', None)
+        ticker = None
+        if stream is None or stream.last_price(self.symbol) is None:
+            ticker = executor.submit(self.client.get_ticker, self.symbol)
+
+        try:
+            res = balance.result()
+            if res.get('code') == '0' and res.get('data'):
+                self.balance_details = {d.get('ccy'): d for d in res['data'][0].get('details', [])}
+        except Exception as e:
+            print(f"Error getting balance: {e}")
+        try:
+            res = positions.result()
+            if res.get('code') == '0' and res.get('data'):
+                for pos in res['data']:
+                    self.positions.setdefault(pos.get('instId'), pos)
+        except Exception as e:
+            print(f"Error getting positions: {e}")
+        if ticker is not None:
+            try:
+                res = ticker.result()
+                if 'data' in res and res['data']:
+                    self.tickers[self.symbol] = float(res['data'][0]['last'])
+            except Exception as e:
+                print(f"Error getting ticker: {e}")
+        return self
+
+    def is_fresh(self, client, symbol):
+        return (self.client is client and self.symbol == symbol
+                and time.time() - self.created < SNAPSHOT_MAX_AGE)
+
+def get_snapshot():
+    """The current cycle's AccountSnapshot, or None for simulated (backtest) clients"""
+    client = StrategyContext.current_client
+    if client is None or getattr(client, 'simulated', False):
+        return None
+    snapshot = StrategyContext.snapshot
+    if snapshot is None or not snapshot.is_fresh(client, StrategyContext.current_symbol):
+        snapshot = AccountSnapshot(client, StrategyContext.current_symbol).load()
+        StrategyContext.snapshot = snapshot
+    return snapshot
+
+def invalidate_snapshot():
+    """Drop the cached account state; called at the start of each cycle and after order placement"""
+    StrategyContext.snapshot = None
+
+def get_order_tracker():
+    """The OrderTracker of the current live strategy, restored from the database on first use"""
+    client = StrategyContext.current_client
+    if client is None or getattr(client, 'simulated', False):
+        return None
+    tracker = StrategyContext.order_tracker
+    if tracker is None or tracker.client is not client or tracker.strategy_name != StrategyContext.current_strategy_name:
+        from quant_engine.order_tracker import OrderTracker
+        tracker = OrderTracker(client, StrategyContext.current_strategy_name)
+        try:
+            tracker.restore()
+        except Exception as e:
+            print(f"Failed to restore open orders: {e}")
+        StrategyContext.order_tracker = tracker
+    return tracker
+
+def reconcile_orders():
+    """Update status, fills and realized pnl of the strategy's open orders; called once per cycle"""
+    tracker = get_order_tracker()
+    if tracker is None:
+        return None
+    try:
+        summary = tracker.reconcile()
+    except Exception as e:
+        print(f"Error reconciling orders: {e}")
+        return None
+    if summary.get('error'):
+        print(f"Order reconciliation failed: {summary['error']}")
+    elif summary['updated']:
+        from quant_engine.log_writer import log_strategy_event
+        log_strategy_event(StrategyContext.current_strategy_name, 'INFO', 'ORDER',
+                           f"Orders reconciled: {summary['filled']} filled, {summary['cancelled']} cancelled, "
+                           f"{summary['open']} open", summary)
+    return summary
+
 # Redefine functions to use context
 def current_price(symbol, price_type):
     if StrategyContext.current_client:
+        # WebSocket cache first (see OKXClient.start_stream); fall back to REST when stale or not subscribed
+        stream = getattr(StrategyContext.current_client, 'stream', None)
+        if stream is not None:
+            price = stream.last_price(symbol)
+            if price is not None:
+                return price
+        snapshot = get_snapshot()
+        if snapshot is not None and symbol in snapshot.tickers:
+            return snapshot.tickers[symbol]
         ticker = StrategyContext.current_client.get_ticker(symbol)
         if 'data' in ticker and ticker['data']:
             return float(ticker['data'][0]['last'])
     return 0.0
 
-def place_limit(symbol, price, qty, side, time_in_force):
-    strategy_name = getattr(StrategyContext, 'current_strategy_name', 'unknown')
-    from quant_engine.db import log_trade, log_strategy_event
-
-    if not StrategyContext.current_client:
-        error_msg = f"No client context available for order: {side} {qty} {symbol} @ {price}"
-        print(f"[ORDER ERROR] {error_msg}")
-        log_strategy_event(strategy_name, 'ERROR', 'ORDER', error_msg)
-        return None
+def get_bars(symbol, bar, n):
+    """
+    The last n closed candles of symbol on bar as read-only arrays: {'ts', 'open', 'high', 'low', 'close', 'vol'}.
 
+    Backtest and warm-up clients slice their preloaded history up to the current bar's close (no look-ahead);
+    live clients share a process-wide cache that only fetches candles closed since the previous call.
+    """
+    from quant_engine.bar_cache import BAR_CACHE, empty_bars
+    client = StrategyContext.current_client
+    if client is None:
+        return empty_bars()
+    if hasattr(client, 'get_bars'):
+        return client.get_bars(symbol, bar, n)
+    return BAR_CACHE.get(client, symbol, bar, n)
+
+def _order_params(symbol, qty, side):
+    """Normalize side, trade mode and size for an order on symbol; returns (side_str, td_mode, qty)"""
     # Convert enum to string if needed
     side_str = side.value if isinstance(side, Enum) else side
 
@@ -188,6 +395,27 @@ def place_limit(symbol, price, qty, side, time_in_force):
         # For spot, ensure minimum order size
         # BTC-USDT minimum is usually 0.00001 BTC
         qty = max(0.00001, float(qty))
+    return side_str, td_mode, qty
+
+def place_limit(symbol, price, qty, side, time_in_force):
+    strategy_name = getattr(StrategyContext, 'current_strategy_name', 'unknown')
+    from quant_engine.log_writer import log_trade, log_strategy_event
+
+    if not StrategyContext.current_client:
+        error_msg = f"No client context available for order: {side} {qty} {symbol} @ {price}"
+        print(f"[ORDER ERROR] {error_msg}")
+        log_strategy_event(strategy_name, 'ERROR', 'ORDER', error_msg)
+        return None
+
+    side_str, td_mode, qty = _order_params(symbol, qty, side)
+
+    # Backtest clients simulate fills locally; don't record them as live trades
+    if getattr(StrategyContext.current_client, 'simulated', False):
+        return StrategyContext.current_client.place_order(
+            instId=symbol, tdMode=td_mode, side=side_str, ordType='limit', sz=qty, px=price)
+
+    # Balance and positions change once the order is accepted
+    invalidate_snapshot()
 
     try:
         print(f"[ORDER] Placing {side_str} order: {qty} {symbol} @ {price} (tdMode={td_mode})")
@@ -217,6 +445,9 @@ def place_limit(symbol, price, qty, side, time_in_force):
                 if sCode == '0':
                     status = 'SUBMITTED'
                     print(f"[ORDER SUCCESS] Order ID: {order_id}")
+                    tracker = get_order_tracker()
+                    if tracker is not None:
+                        tracker.track(order_id, symbol, side_str, price, qty)
                 else:
                     status = 'FAILED'
                     error_msg = sMsg
@@ -268,12 +499,161 @@ def place_limit(symbol, price, qty, side, time_in_force):
         )
         return None
 
+def _order_item(order):
+    """place_limits_batch accepts place_limit kwargs dicts or (symbol, price, qty, side[, time_in_force]) tuples"""
+    if isinstance(order, dict):
+        return order['symbol'], order['price'], order['qty'], order['side']
+    return tuple(order[:4])
+
+def place_limits_batch(orders):
+    """
+    Place several limit orders through OKX's batch endpoint (20 per request).
+
+    Args:
+        orders: list of dicts with place_limit's arguments, or (symbol, price, qty, side) tuples
+
+    Returns:
+        dict: merged API response, data[i] belongs to orders[i]; None without a client
+
+    All trades and order events of the batch are recorded in one database transaction.
+    """
+    strategy_name = getattr(StrategyContext, 'current_strategy_name', 'unknown')
+    from quant_engine.log_writer import log_records, log_strategy_event, trade_record, event_record
+
+    client = StrategyContext.current_client
+    if not client:
+        error_msg = f"No client context available for {len(orders)} batch orders"
+        print(f"[ORDER ERROR] {error_msg}")
+        log_strategy_event(strategy_name, 'ERROR', 'ORDER', error_msg)
+        return None
+    if not orders:
+        return {'code': '0', 'msg': '', 'data': []}
+
+    items = []
+    for order in orders:
+        symbol, price, qty, side = _order_item(order)
+        side_str, td_mode, qty = _order_params(symbol, qty, side)
+        items.append({'instId': symbol, 'tdMode': td_mode, 'side': side_str, 'ordType': 'limit', 'sz': qty, 'px': price})
+
+    # Backtest clients simulate fills locally; don't record them as live trades
+    if getattr(client, 'simulated', False):
+        return client.place_orders_batch(items)
+
+    invalidate_snapshot()
+    try:
+        result = client.place_orders_batch(items)
+    except Exception as e:
+        error_msg = f"Exception placing batch orders: {e}"
+        print(f"[ORDER EXCEPTION] {error_msg}")
+        log_strategy_event(strategy_name, 'ERROR', 'ORDER', error_msg, {'count': len(items)})
+        return None
+
+    from quant_engine.okx_client import UNKNOWN_SCODE
+
+    records = []
+    tracker = get_order_tracker()
+    for item, res in zip(items, result.get('data', [])):
+        ok = res.get('sCode') == '0'
+        unknown = res.get('sCode') == UNKNOWN_SCODE
+        order_id = res.get('ordId') or None
+        if ok and tracker is not None:
+            tracker.track(order_id, item['instId'], item['side'], item['px'], item['sz'])
+        records.append(trade_record(strategy_name, item['instId'], item['side'], 'limit', item['px'], item['sz'],
+                                    order_id, 'SUBMITTED' if ok else ('UNKNOWN' if unknown else 'FAILED')))
+        if ok:
+            records.append(event_record(strategy_name, 'INFO', 'ORDER',
+                                        f"Order submitted: {item['side']} {item['sz']} @ {item['px']}",
+                                        {'order_id': order_id, 'symbol': item['instId'], 'price': item['px'],
+                                         'qty': item['sz']}))
+        elif unknown:
+            # The request may have reached OKX; the order can still be found by its clOrdId
+            records.append(event_record(strategy_name, 'WARNING', 'ORDER', f"Order outcome unknown: {res.get('sMsg')}",
+                                        {'client_order_id': res.get('clOrdId'), 'symbol': item['instId'],
+                                         'price': item['px'], 'qty': item['sz'], 'side': item['side']}))
+        else:
+            records.append(event_record(strategy_name, 'ERROR', 'ORDER', f"Order failed: {res.get('sMsg')}",
+                                        {'symbol': item['instId'], 'price': item['px'], 'qty': item['sz'],
+                                         'side': item['side'], 'response': str(res)}))
+    log_records(records)
+    print(f"[ORDER] Batch of {len(items)} orders: code={result.get('code')}")
+    return result
+
+def cancel_orders_batch(orders, symbol=None):
+    """
+    Cancel several orders through OKX's batch cancel endpoint (20 per request).
+
+    Args:
+        orders: list of order ids, (symbol, order_id) tuples or {'symbol', 'order_id'} dicts
+        symbol: instrument for bare order ids, defaults to the strategy's symbol
+
+    Returns:
+        dict: merged API response, data[i] belongs to orders[i]; None without a client
+    """
+    strategy_name = getattr(StrategyContext, 'current_strategy_name', 'unknown')
+    from quant_engine.log_writer import log_records, log_strategy_event, trade_status_record, event_record
+
+    client = StrategyContext.current_client
+    if not client:
+        error_msg = f"No client context available to cancel {len(orders)} orders"
+        print(f"[ORDER ERROR] {error_msg}")
+        log_strategy_event(strategy_name, 'ERROR', 'ORDER', error_msg)
+        return None
+    if not orders:
+        return {'code': '0', 'msg': '', 'data': []}
+
+    items = []
+    for order in orders:
+        if isinstance(order, dict):
+            items.append({'instId': order['symbol'], 'ordId': order['order_id']})
+        elif isinstance(order, (tuple, list)):
+            items.append({'instId': order[0], 'ordId': order[1]})
+        else:
+            items.append({'instId': symbol or StrategyContext.current_symbol, 'ordId': order})
+
+    if getattr(client, 'simulated', False):
+        return client.cancel_orders_batch(items)
+
+    invalidate_snapshot()
+    try:
+        result = client.cancel_orders_batch(items)
+    except Exception as e:
+        error_msg = f"Exception cancelling batch orders: {e}"
+        print(f"[ORDER EXCEPTION] {error_msg}")
+        log_strategy_event(strategy_name, 'ERROR', 'ORDER', error_msg, {'count': len(items)})
+        return None
+
+    from quant_engine.okx_client import UNKNOWN_SCODE
+
+    records = []
+    cancelled = []
+    for item, res in zip(items, result.get('data', [])):
+        if res.get('sCode') == '0':
+            cancelled.append(str(item['ordId']))
+            records.append(trade_status_record(str(item['ordId']), 'CANCELLED'))
+        elif res.get('sCode') == UNKNOWN_SCODE:
+            # The order tracker picks up the real state on its next poll
+            records.append(event_record(strategy_name, 'WARNING', 'ORDER', f"Cancel outcome unknown: {res.get('sMsg')}",
+                                        {'order_id': str(item['ordId']), 'symbol': item['instId']}))
+        else:
+            records.append(event_record(strategy_name, 'ERROR', 'ORDER', f"Cancel failed: {res.get('sMsg')}",
+                                        {'order_id': str(item['ordId']), 'symbol': item['instId'],
+                                         'response': str(res)}))
+    if cancelled:
+        records.append(event_record(strategy_name, 'INFO', 'ORDER', f'Cancelled {len(cancelled)} orders',
+                                    {'order_ids': cancelled}))
+    log_records(records)
+    return result
+
 def max_qty_to_buy_on_cash(symbol, order_type, price):
     """
     Returns the available cash (USDT) for buying.
     Note: Despite the name 'qty', this returns the quote currency amount (USDT) 
     based on the usage in strategies.
     """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        usdt = snapshot.balance_details.get('USDT')
+        return float(usdt.get('availEq', 0)) if usdt else 0.0
     if StrategyContext.current_client:
         try:
             balance_res = StrategyContext.current_client.get_account_balance()
@@ -288,6 +668,11 @@ def max_qty_to_buy_on_cash(symbol, order_type, price):
 
 def max_qty_to_sell(symbol):
     """Returns the available quantity of the symbol for selling."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        pos = snapshot.positions.get(symbol)
+        # For net mode, pos can be negative (short); for cash/spot it is what we hold
+        return max(0, float(pos.get('pos', 0))) if pos else 0.0
     if StrategyContext.current_client:
         try:
             pos_res = StrategyContext.current_client.get_positions()
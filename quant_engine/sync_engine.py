@@ -0,0 +1,270 @@
+"""
+Kline Sync Engine - 多交易对并发同步历史K线
+多个 (symbol, bar, 时间范围) 任务在线程池中并发分页拉取，共用一个连接池化的 Session，
+请求按 OKX 各接口的限速窗口调度，分页一直进行到覆盖完整时间范围。
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from quant_engine.rate_limiter import RateLimiter
+
+HISTORY_CANDLES_PATH = '/api/v5/market/history-candles'
+
+# K线周期对应的毫秒数
+BAR_MS = {
+    '1m': 60_000,
+    '3m': 180_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '30m': 1_800_000,
+    '1H': 3_600_000,
+    '2H': 7_200_000,
+    '4H': 14_400_000,
+    '6H': 21_600_000,
+    '12H': 43_200_000,
+    '1D': 86_400_000,
+    '1W': 604_800_000,
+}
+
+# OKX 限速错误码
+RATE_LIMIT_CODE = '50011'
+
+
+def to_timestamp_ms(date):
+    """'YYYY-MM-DD' / datetime / 毫秒时间戳 -> 毫秒时间戳"""
+    if isinstance(date, (int, float)):
+        return int(date)
+    if isinstance(date, str):
+        return int(pd.Timestamp(date).timestamp() * 1000)
+    return int(date.timestamp() * 1000)
+
+
+def find_gaps(ts, start_ts, end_ts, bar_ms):
+    """
+    根据已有K线时间戳和K线间距计算 [start_ts, end_ts) 内缺失的区间
+
+    Args:
+        ts: 已有K线的开盘时间戳（毫秒，升序，已限定在范围内）
+
+    Returns:
+        list: [(gap_start, gap_end), ...]，缺失K线满足 gap_start <= ts < gap_end
+    """
+    if end_ts <= start_ts:
+        return []
+    ts = np.asarray(ts, dtype=np.int64)
+    if len(ts) == 0:
+        return [(start_ts, end_ts)]
+
+    gaps = []
+    if ts[0] - bar_ms >= start_ts:
+        gaps.append((start_ts, int(ts[0])))
+    holes = np.flatnonzero(np.diff(ts) > bar_ms)
+    gaps.extend((int(ts[i]) + bar_ms, int(ts[i + 1])) for i in holes)
+    if ts[-1] + bar_ms < end_ts:
+        gaps.append((int(ts[-1]) + bar_ms, end_ts))
+    return gaps
+
+
+def describe_gap(gap, bar_ms):
+    start, end = gap
+    return {
+        'start': datetime.fromtimestamp(start / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M'),
+        'end': datetime.fromtimestamp(end / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M'),
+        'missing_bars': max(1, (end - start) // bar_ms)
+    }
+
+
+class KlineSyncEngine:
+    def __init__(self, manager=None, max_workers=4, rate_limiter=None, page_limit=100, save_batch=5000, max_retries=5,
+                 incremental=True):
+        """
+        Args:
+            manager: MarketDataManager，负责落库；其 client 提供 base_url 和代理
+            max_workers: 并发任务数
+            rate_limiter: 共享的 RateLimiter，默认按 OKX_RATE_LIMITS 新建
+            page_limit: 每页K线数（history-candles 最大 100）
+            save_batch: 累积多少条K线写一次数据库
+            incremental: 只拉取库中缺失的区间；False 时重新下载整个时间范围
+        """
+        if manager is None:
+            from quant_engine.market_data import MarketDataManager
+            manager = MarketDataManager()
+        self.manager = manager
+        client = manager.client
+        self.base_url = client.base_url if client else 'https://www.okx.com'
+        self.proxies = client.proxies if client else None
+        self.max_workers = max(1, int(max_workers))
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.page_limit = page_limit
+        self.save_batch = save_batch
+        self.max_retries = max_retries
+        self.incremental = incremental
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._save_lock = threading.Lock()
+        self._progress_lock = threading.Lock()
+
+    def _get_page(self, symbol, bar, after):
+        """拉取一页 after 之前的K线（新 -> 旧），限速或网络错误时退避重试"""
+        params = {'instId': symbol, 'bar': bar, 'limit': self.page_limit, 'after': after}
+        last_error = None
+        for attempt in range(self.max_retries):
+            self.rate_limiter.acquire(HISTORY_CANDLES_PATH)
+            try:
+                response = self.session.get(self.base_url + HISTORY_CANDLES_PATH, params=params,
+                                            proxies=self.proxies, timeout=30)
+                data = response.json()
+            except Exception as e:
+                last_error = str(e)
+            else:
+                if data.get('code') == '0':
+                    return data.get('data') or []
+                if response.status_code != 429 and data.get('code') != RATE_LIMIT_CODE:
+                    raise RuntimeError(f"OKX error {data.get('code')}: {data.get('msg')}")
+                last_error = data.get('msg') or 'rate limited'
+            time.sleep(min(2 ** attempt * 0.5, 8))
+        raise RuntimeError(f"Request failed after {self.max_retries} attempts: {last_error}")
+
+    def _save(self, symbol, bar, klines):
+        # SQLite 单写者，串行化各线程的写入
+        with self._save_lock:
+            return self.manager._save_klines_to_db(symbol, bar, klines)
+
+    def estimate_pages(self, job):
+        """按完整时间范围估算页数（增量模式下实际页数更少）"""
+        bar_ms = BAR_MS.get(job['bar'])
+        if not bar_ms:
+            return 1
+        span = to_timestamp_ms(job['end_date']) - to_timestamp_ms(job['start_date'])
+        return max(1, math.ceil(span / bar_ms / self.page_limit))
+
+    def plan_gaps(self, job):
+        """返回任务需要拉取的区间；非增量模式或周期未知时为整个范围"""
+        start_ts = to_timestamp_ms(job['start_date'])
+        end_ts = to_timestamp_ms(job['end_date'])
+        bar_ms = BAR_MS.get(job['bar'])
+        if not self.incremental or not bar_ms:
+            return [(start_ts, end_ts)]
+        # 尚未收盘的K线不算缺失
+        end_ts = min(end_ts, int(time.time() * 1000) - bar_ms + 1)
+        return self.manager.find_missing_ranges(job['symbol'], job['bar'], start_ts, end_ts)
+
+    def _fetch_range(self, symbol, bar, start_ts, end_ts, result, job, progress_callback=None):
+        """从 end_ts 向前分页拉取到 start_ts，写入数据库"""
+        after = end_ts
+        buffer = []
+        try:
+            while after > start_ts:
+                klines = self._get_page(symbol, bar, after)
+                if not klines:
+                    break
+                result['pages'] += 1
+
+                # 丢弃未收盘的K线（confirm=0），等收盘后再补
+                buffer.extend(k for k in klines
+                              if start_ts <= int(k[0]) < end_ts and not (len(k) > 8 and k[8] == '0'))
+                if len(buffer) >= self.save_batch:
+                    result['count'] += self._save(symbol, bar, buffer)
+                    buffer = []
+
+                if progress_callback:
+                    progress_callback(job, result['pages'], len(klines))
+
+                oldest_ts = int(klines[-1][0])
+                if oldest_ts >= after:
+                    break  # 游标没有前进，避免死循环
+                after = oldest_ts
+        finally:
+            if buffer:
+                result['count'] += self._save(symbol, bar, buffer)
+
+    def sync_job(self, job, progress_callback=None):
+        """
+        同步单个任务 {'symbol', 'bar', 'start_date', 'end_date'}，增量模式下只拉取缺失区间
+
+        Returns:
+            dict: {'symbol', 'bar', 'status', 'count', 'pages', 'gaps', 'unfilled_gaps', 'msg'}
+        """
+        symbol, bar = job['symbol'], job['bar']
+        result = {'symbol': symbol, 'bar': bar, 'status': 'success', 'count': 0, 'pages': 0,
+                  'gaps': 0, 'unfilled_gaps': [], 'msg': ''}
+
+        try:
+            gaps = self.plan_gaps(job)
+            result['gaps'] = len(gaps)
+            # 从最新的区间开始拉取
+            for start_ts, end_ts in reversed(gaps):
+                self._fetch_range(symbol, bar, start_ts, end_ts, result, job, progress_callback)
+
+            bar_ms = BAR_MS.get(bar)
+            if self.incremental and bar_ms and gaps:
+                # 交易所也没有数据的区间（上线前、停机等），只报告不重试
+                unfilled = []
+                for start_ts, end_ts in gaps:
+                    unfilled.extend(self.manager.find_missing_ranges(symbol, bar, start_ts, end_ts))
+                result['unfilled_gaps'] = [describe_gap(g, bar_ms) for g in unfilled]
+        except Exception as e:
+            result['status'] = 'error'
+            result['msg'] = str(e)
+
+        if result['status'] == 'success':
+            if result['gaps'] == 0:
+                result['msg'] = '数据已是最新，无需同步'
+            else:
+                result['msg'] = f"成功获取并保存 {result['count']} 条K线数据"
+                if result['unfilled_gaps']:
+                    result['msg'] += f"，{len(result['unfilled_gaps'])} 个区间交易所无数据"
+        return result
+
+    def run(self, jobs, progress_callback=None):
+        """
+        并发执行多个同步任务
+
+        Args:
+            jobs: [{'symbol', 'bar', 'start_date', 'end_date'}, ...]
+            progress_callback: callback(current, total, message)，current/total 为已完成/预估页数
+
+        Returns:
+            dict: {'status', 'jobs': [每个任务的结果], 'count', 'elapsed'}
+        """
+        jobs = [dict(job, end_date=job.get('end_date') or datetime.now().strftime('%Y-%m-%d'),
+                     start_date=job.get('start_date') or '2024-01-01') for job in jobs]
+        total_pages = sum(self.estimate_pages(job) for job in jobs)
+        progress = {'pages': 0, 'klines': 0}
+
+        def on_page(job, pages, fetched):
+            if not progress_callback:
+                return
+            with self._progress_lock:
+                progress['pages'] += 1
+                progress['klines'] += fetched
+                current, klines = progress['pages'], progress['klines']
+            progress_callback(min(current, total_pages), total_pages,
+                              f"{job['symbol']} {job['bar']}: 已获取 {klines} 条数据...")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(jobs)))) as pool:
+            results = list(pool.map(lambda job: self.sync_job(job, on_page), jobs))
+        elapsed = time.perf_counter() - start
+
+        failed = [r for r in results if r['status'] != 'success']
+        return {
+            'status': 'error' if failed and len(failed) == len(results) else 'success',
+            'jobs': results,
+            'count': sum(r['count'] for r in results),
+            'failed': len(failed),
+            'elapsed': round(elapsed, 3)
+        }
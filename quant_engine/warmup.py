@@ -0,0 +1,191 @@
+"""
+Warm-up - 实盘启动前用历史K线预热策略状态
+策略设置 self.warmup_bars 后，StrategyBase.run 和 app.run_strategy_thread 在进入实盘循环前，
+把最近 warmup_bars 根已收盘的K线逐根喂给 handle_data，EMA、价格通道等指标在几秒内就绪，
+不必等待 warmup_bars 个实盘周期（1H 周期下就是 warmup_bars 小时），重启后也不会丢失状态。
+
+K线来源:
+    优先读取本地 market_klines（列式存储或 SQLite），库中缺少的最新部分用一次 get_candles 补齐；
+    本地没有数据或数据太旧时只用一次 get_candles（最多 WARMUP_CANDLE_LIMIT 根）
+
+预热期间当前线程的 StrategyContext 客户端换成 WarmupClient（StrategyContext 是线程局部的，同进程的其他策略线程不受影响）：
+    current_price 返回当根K线的收盘价；get_bars 只返回当根K线收盘时已收盘的K线；余额和持仓来自实盘账户（只查询一次）；
+    place_limit / place_limits_batch / cancel_orders_batch 不会发往交易所，也不写入交易记录，
+    返回失败（sCode=WARMUP_SCODE），预热结束后统计被拦截的订单数
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from quant_engine.bar_clock import BarClock
+from quant_engine.sync_engine import BAR_MS
+
+# /market/candles 单次请求最多返回的K线数
+WARMUP_CANDLE_LIMIT = 300
+
+WARMUP_COLUMNS = ('ts', 'open', 'high', 'low', 'close', 'vol')
+
+WARMUP_SCODE = 'warmup'
+WARMUP_MSG = 'Order suppressed during warm-up'
+
+
+def _empty_candles():
+    return pd.DataFrame({name: np.array([], dtype=np.int64 if name == 'ts' else np.float64) for name in WARMUP_COLUMNS})
+
+
+def _db_candles(symbol, bar, first_open, last_open):
+    from quant_engine.market_data import MarketDataManager
+
+    df = MarketDataManager().get_klines_from_db(symbol, bar, start_date=pd.Timestamp(first_open, unit='ms'),
+                                                end_date=pd.Timestamp(last_open, unit='ms'))
+    return df[list(WARMUP_COLUMNS)]
+
+
+def fetch_closed_candles(client, symbol, bar, limit):
+    """一次 get_candles，只保留已确认（收盘）的K线"""
+    from quant_engine.market_data import parse_klines
+
+    res = client.get_candles(symbol, bar, limit=limit)
+    if res.get('code') != '0':
+        print(f"[WARMUP] get_candles failed: {res.get('msg')}")
+        return _empty_candles()
+    rows = [row for row in res.get('data') or [] if len(row) < 9 or row[8] == '1']
+    if not rows:
+        return _empty_candles()
+    columns = parse_klines(rows)
+    return pd.DataFrame({name: columns[name] for name in WARMUP_COLUMNS})
+
+
+def load_warmup_candles(client, symbol, bar, count, now=None):
+    """
+    最近 count 根已收盘的K线
+
+    Returns:
+        tuple: (DataFrame[ts, open, high, low, close, vol] 按 ts 升序, 来源 'database' / 'api' / 'database+api')
+    """
+    period = BAR_MS[bar]
+    last_open = int(BarClock(bar).last_close_time(now or time.time()) * 1000) - period
+    first_open = last_open - (count - 1) * period
+
+    frames, sources = [], []
+    try:
+        df = _db_candles(symbol, bar, first_open, last_open)
+        if len(df):
+            frames.append(df)
+            sources.append('database')
+    except Exception as e:
+        print(f"[WARMUP] Failed to read market_klines: {e}")
+
+    db_last = int(frames[0]['ts'].iloc[-1]) if frames else None
+    if db_last is None or db_last < last_open:
+        missing = count if db_last is None else (last_open - db_last) // period
+        if missing + 1 > WARMUP_CANDLE_LIMIT:
+            # 库中数据太旧，与 API 返回的部分之间会有缺口，只用 API
+            frames, sources = [], []
+        # +1：返回结果中包含尚未收盘的当前K线
+        df = fetch_closed_candles(client, symbol, bar, min(missing + 1, WARMUP_CANDLE_LIMIT))
+        if len(df):
+            frames.append(df)
+            sources.append('api')
+
+    if not frames:
+        return _empty_candles(), ''
+    df = pd.concat(frames, ignore_index=True)
+    df = df[(df['ts'] >= first_open) & (df['ts'] <= last_open)]
+    # API 返回的K线覆盖库中同一时间的旧数据
+    df = df.drop_duplicates('ts', keep='last').sort_values('ts').reset_index(drop=True)
+    return df, '+'.join(sources)
+
+
+class WarmupClient:
+    """预热期间替代实盘客户端：按K线回放价格，账户查询走实盘，订单全部拦截"""
+
+    # strategy_framework 的下单函数对 simulated 客户端不做实盘记录
+    simulated = True
+
+    def __init__(self, client, candles, symbol=None, bar=None):
+        self.client = client
+        self.symbol = symbol
+        self.bar = bar
+        self.ts = candles['ts'].to_numpy(dtype=np.int64)
+        self.close = candles['close'].to_numpy(dtype=np.float64)
+        self.length = len(self.close)
+        self.current_index = 0
+        self.suppressed = []
+        self._balance = None
+        self._positions = None
+        self.history = None
+        self._candles = candles
+
+    def get_ticker(self, instId):
+        return {'code': '0', 'data': [{'instId': instId, 'last': str(float(self.close[self.current_index]))}]}
+
+    def get_account_balance(self):
+        if self._balance is None:
+            self._balance = self.client.get_account_balance()
+        return self._balance
+
+    def get_positions(self):
+        if self._positions is None:
+            self._positions = self.client.get_positions()
+        return self._positions
+
+    def get_bars(self, symbol, bar, n):
+        """截至当前预热K线收盘时已收盘的K线（见 quant_engine.bar_cache.HistoricalBars）"""
+        if self.history is None:
+            from quant_engine.bar_cache import HistoricalBars
+            bars = {name: self._candles[name].to_numpy() for name in WARMUP_COLUMNS}
+            self.history = HistoricalBars(bars, self.symbol, self.bar, loader=self._load_bars)
+        return self.history.get(symbol, bar, n, self.current_index)
+
+    def _load_bars(self, symbol, bar, end_ts):
+        df, _ = load_warmup_candles(self.client, symbol, bar, WARMUP_CANDLE_LIMIT)
+        return {name: df[name].to_numpy() for name in WARMUP_COLUMNS}
+
+    def _suppress(self, orders):
+        ts = int(self.ts[self.current_index])
+        self.suppressed.extend(dict(order, ts=ts) for order in orders)
+        data = [{'ordId': '', 'sCode': WARMUP_SCODE, 'sMsg': WARMUP_MSG} for _ in orders]
+        return {'code': '1', 'msg': WARMUP_MSG, 'data': data}
+
+    def place_order(self, instId, tdMode, side, ordType, sz, px=None):
+        return self._suppress([{'instId': instId, 'side': side, 'sz': sz, 'px': px}])
+
+    def place_orders_batch(self, orders):
+        return self._suppress(orders)
+
+    def cancel_orders_batch(self, orders):
+        return self._suppress(orders)
+
+
+def run_warmup(strategy, count):
+    """
+    用最近 count 根已收盘K线回放 strategy.handle_data
+
+    Returns:
+        dict: {'bars', 'requested', 'source', 'suppressed', 'elapsed'}
+    """
+    from quant_engine.strategy_framework import StrategyContext, invalidate_snapshot
+
+    started = time.time()
+    live_client = StrategyContext.current_client
+    candles, source = load_warmup_candles(live_client, strategy.symbol, strategy.bar, count)
+    client = WarmupClient(live_client, candles, strategy.symbol, strategy.bar)
+
+    StrategyContext.current_client = client
+    invalidate_snapshot()
+    try:
+        for i in range(client.length):
+            client.current_index = i
+            try:
+                strategy.handle_data()
+            except Exception as e:
+                print(f"[WARMUP] Error in handle_data at {int(client.ts[i])}: {e}")
+    finally:
+        StrategyContext.current_client = live_client
+        invalidate_snapshot()
+
+    return {'bars': client.length, 'requested': count, 'source': source,
+            'suppressed': len(client.suppressed), 'elapsed': round(time.time() - started, 3)}
@@ -2,7 +2,12 @@ import time
 import subprocess
 import sys
 import os
-from quant_engine.db import init_db, get_db_connection, update_strategy_status
+import multiprocessing
+import atexit
+import shutil
+from quant_engine.db import init_db, get_connection, update_strategy_status
+from quant_engine.config_loader import ConfigLoader
+from quant_engine.market_hub import HUB_ADDRESS_ENV, HUB_AUTHKEY_ENV, default_address, new_authkey, run_hub
 
 # Ensure we can import from current directory
 sys.path.append(os.getcwd())
@@ -11,6 +16,44 @@ PYTHON_EXECUTABLE = sys.executable
 STRATEGY_RUNNER_SCRIPT = os.path.join(os.getcwd(), 'strategy_runner.py')
 
 running_processes = {}
+hub_process = None
+# Generated on the first launch and kept across hub restarts so running runners can reconnect
+hub_address = None
+hub_authkey = None
+
+def start_market_hub():
+    """
+    Start the shared market-data hub and point strategy runners at it through HUB_ADDRESS_ENV.
+    One upstream WebSocket connection then serves every runner instead of one per process.
+    The hub's socket lives in a private (0700) directory and clients authenticate with a
+    random key that reaches the runners only through HUB_AUTHKEY_ENV.
+    """
+    global hub_process, hub_address, hub_authkey
+    config_loader = ConfigLoader(os.path.join(os.getcwd(), '配置.txt'))
+    if config_loader.get('OKX_WS_ENABLED', 'true').lower() == 'false':
+        return
+    if config_loader.get('OKX_MARKET_HUB', 'true').lower() == 'false':
+        os.environ.pop(HUB_ADDRESS_ENV, None)
+        os.environ.pop(HUB_AUTHKEY_ENV, None)
+        return
+
+    if hub_address is None:
+        hub_address = default_address()
+        hub_authkey = new_authkey()
+        if sys.platform != 'win32':
+            atexit.register(shutil.rmtree, os.path.dirname(hub_address), ignore_errors=True)
+    address = hub_address
+    hub_process = multiprocessing.Process(
+        target=run_hub,
+        args=(address, hub_authkey, config_loader.get('PROXY_URL'),
+              config_loader.get('OKX_WS_PUBLIC_URL'), config_loader.get('OKX_WS_BUSINESS_URL')),
+        name='market-hub',
+        daemon=True
+    )
+    hub_process.start()
+    os.environ[HUB_ADDRESS_ENV] = address
+    os.environ[HUB_AUTHKEY_ENV] = hub_authkey.hex()
+    print(f"Started market hub process {hub_process.pid} on {address}")
 
 def start_strategy_process(strategy_name, symbol, leverage, interval='1H'):
     print(f"Starting strategy process: {strategy_name} {symbol} leverage={leverage} interval={interval}")
@@ -62,14 +105,11 @@ def monitor_processes():
 def main():
     print("Starting Scheduler...")
     init_db()
+    start_market_hub()
     
     while True:
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM strategy_status")
-            strategies = cursor.fetchall()
-            conn.close()
+            strategies = get_connection().execute("SELECT * FROM strategy_status").fetchall()
             
             db_strategies = {row['name']: row for row in strategies}
             
@@ -87,6 +127,11 @@ def main():
             
             # 3. Monitor running processes
             monitor_processes()
+
+            # 4. Restart the market hub if it died; runners reconnect to it on their own
+            if hub_process is not None and not hub_process.is_alive():
+                print(f"Market hub exited with code {hub_process.exitcode}, restarting")
+                start_market_hub()
             
             time.sleep(2)
             
@@ -1,4 +1,5 @@
 let equityChart = null;
+let backtestChart = null;
 
 document.addEventListener('DOMContentLoaded', () => {
     loadConfig();
@@ -427,6 +428,47 @@ function initChart() {
     });
 }
 
+function renderBacktestChart(curve) {
+    // curve: [[ts, equity], ...]，后端已降采样
+    if (backtestChart) {
+        backtestChart.destroy();
+    }
+    const ctx = document.getElementById('backtest-equity-chart').getContext('2d');
+    backtestChart = new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: curve.map(p => new Date(p[0]).toLocaleString()),
+            datasets: [{
+                label: '权益',
+                data: curve.map(p => p[1]),
+                borderColor: '#3b82f6',
+                borderWidth: 1.5,
+                pointRadius: 0,
+                tension: 0,
+                fill: true,
+                backgroundColor: 'rgba(59, 130, 246, 0.1)'
+            }]
+        },
+        options: {
+            responsive: true,
+            animation: false,
+            plugins: {
+                legend: { display: false }
+            },
+            scales: {
+                y: {
+                    grid: { color: '#334155' },
+                    ticks: { color: '#94a3b8' }
+                },
+                x: {
+                    grid: { display: false },
+                    ticks: { color: '#94a3b8', maxTicksLimit: 8 }
+                }
+            }
+        }
+    });
+}
+
 function updateChart(equity) {
     if (!equityChart) return;
 
@@ -605,8 +647,27 @@ async function runBacktest() {
                             <div style="color: #94a3b8;">交易次数</div>
                             <div style="font-size: 20px; font-weight: bold;">${result.total_orders}</div>
                         </div>
+                        <div class="stat-item">
+                            <div style="color: #94a3b8;">最大回撤</div>
+                            <div style="font-size: 20px; font-weight: bold; color: #ef4444;">-${result.max_drawdown.toFixed(2)}%</div>
+                        </div>
+                        <div class="stat-item">
+                            <div style="color: #94a3b8;">胜率</div>
+                            <div style="font-size: 20px; font-weight: bold;">${result.win_rate.toFixed(1)}% (${result.round_trips} 笔)</div>
+                        </div>
+                        <div class="stat-item">
+                            <div style="color: #94a3b8;">Sharpe / Sortino</div>
+                            <div style="font-size: 20px; font-weight: bold;">${result.sharpe.toFixed(2)} / ${result.sortino.toFixed(2)}</div>
+                        </div>
+                        <div class="stat-item">
+                            <div style="color: #94a3b8;">持仓占比 / 换手</div>
+                            <div style="font-size: 20px; font-weight: bold;">${result.exposure.toFixed(1)}% / ${result.turnover.toFixed(2)}x</div>
+                        </div>
                     </div>
 
+                    <h4>权益曲线</h4>
+                    <div style="margin-bottom: 20px;"><canvas id="backtest-equity-chart" height="80"></canvas></div>
+
                     <h4>交易记录 (${result.orders.length} 笔)</h4>
                     <div style="max-height: 300px; overflow-y: auto;">
                         <table style="width: 100%;">
@@ -642,6 +703,7 @@ async function runBacktest() {
                 </div>
             `;
             resultsDiv.innerHTML = html;
+            renderBacktestChart(result.equity_curve);
         } else {
             resultsDiv.innerHTML = `<div class="card" style="margin-top: 20px; border-color: #ef4444;"><h3 style="color: #ef4444;">❌ 回测失败</h3><p>${result.msg}</p></div>`;
         }
@@ -23,8 +23,10 @@ class Strategy(StrategyBase):
         self.stop_loss_ratio = show_variable(0.05, GlobalType.FLOAT)  # 止损比例 5%
         self.take_profit_ratio = show_variable(0.10, GlobalType.FLOAT)  # 止盈比例 10%
         
-        # 价格历史
-        self.price_history = []
+        # 价格通道，在第一次 handle_data 时按（可能被回测参数覆盖的）回看周期创建
+        self.channel = None
+        # 实盘启动时预热回看周期内的K线
+        self.warmup_bars = self.lookback_period
         
         # 交易参数
         self.order_amount = show_variable(100.0, GlobalType.FLOAT)  # 每次交易金额 USDT
@@ -35,6 +37,32 @@ class Strategy(StrategyBase):
         self.highest_high = show_variable(0.0, GlobalType.FLOAT)
         self.lowest_low = show_variable(0.0, GlobalType.FLOAT)
     
+    def compute_signals(self, df):
+        """回测向量化信号：返回每根K线收盘后的目标持仓数量，逻辑与 handle_data 一致"""
+        import numpy as np
+
+        close = df['close'].to_numpy(dtype=float)
+        # 前 lookback_period-1 根K线（不含当前）的最高价和最低价
+        upper, lower = indicators.donchian(close, period=self.lookback_period - 1)
+        highest = np.concatenate(([np.nan], upper[:-1]))
+        lowest = np.concatenate(([np.nan], lower[:-1]))
+
+        positions = np.zeros(len(close))
+        qty = 0.0
+        entry_price = 0.0
+        for i in range(self.lookback_period - 1, len(close)):
+            price = close[i]
+            if qty > 0 and entry_price > 0:
+                profit_ratio = (price - entry_price) / entry_price
+                if (profit_ratio <= -self.stop_loss_ratio or profit_ratio >= self.take_profit_ratio
+                        or price < lowest[i]):
+                    qty = 0.0
+            elif qty <= 0 and price > highest[i]:
+                qty = self.order_amount / price
+                entry_price = price
+            positions[i] = qty
+        return positions
+
     def handle_data(self):
         try:
             # 获取当前价格
@@ -44,20 +72,21 @@ class Strategy(StrategyBase):
                 print("无效价格，跳过本次执行")
                 return
             
-            # 更新价格历史
-            self.price_history.append(current_price_value)
-            if len(self.price_history) > self.lookback_period:
-                self.price_history.pop(0)
+            if self.channel is None:
+                self.channel = Donchian(self.lookback_period - 1)
+            
+            # 最高价和最低价不包括当前价格，更新通道前读取
+            ready = self.channel.ready
+            if ready:
+                self.highest_high = self.channel.upper
+                self.lowest_low = self.channel.lower
+            self.channel.update(current_price_value)
             
             # 需要足够的历史数据
-            if len(self.price_history) < self.lookback_period:
-                print(f"收集历史数据中... {len(self.price_history)}/{self.lookback_period}")
+            if not ready:
+                print(f"收集历史数据中... {self.channel.count}/{self.lookback_period}")
                 return
             
-            # 计算最高价和最低价
-            self.highest_high = max(self.price_history[:-1])  # 不包括当前价格
-            self.lowest_low = min(self.price_history[:-1])
-            
             print(f"当前价格: {current_price_value:.2f}, 最高: {self.highest_high:.2f}, 最低: {self.lowest_low:.2f}")
             
             # 获取当前持仓
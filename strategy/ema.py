@@ -21,9 +21,12 @@ class Strategy(StrategyBase):
         self.indicators_initialized = show_variable(False, GlobalType.INT)
 
     def init_indicators(self):
-        self.fast_ema_values = []
-        self.slow_ema_values = []
-        self.price_history = []
+        # 最近 101 个价格（calculate_ema 的窗口，与 windowed_ema 一致），交叉判断只需最近两个 EMA
+        self.fast_ema_values = RingBuffer(51)
+        self.slow_ema_values = RingBuffer(51)
+        self.price_history = RingBuffer(101)
+        # 实盘启动时用最近 101 根已收盘K线预热
+        self.warmup_bars = 101
         self.golden_cross_flag = False
         self.death_cross_flag = False
         self.entry_price = 0.0
@@ -40,6 +43,68 @@ class Strategy(StrategyBase):
         
         return ema
 
+    def windowed_ema(self, prices, period, window=101):
+        """calculate_ema over the trailing `window` prices of every bar, as a NumPy array"""
+        import numpy as np
+        from numpy.lib.stride_tricks import sliding_window_view
+
+        def weights(m):
+            alpha = 2.0 / (period + 1)
+            w = np.empty(m)
+            w[:period] = (1 - alpha) ** (m - period) / period
+            w[period:] = alpha * (1 - alpha) ** (m - 1 - np.arange(period, m))
+            return w
+
+        out = np.full(len(prices), np.nan)
+        for m in range(period, min(window, len(prices) + 1)):
+            out[m - 1] = prices[:m] @ weights(m)
+        if len(prices) >= window:
+            out[window - 1:] = sliding_window_view(prices, window) @ weights(window)
+        return out
+
+    def compute_signals(self, df):
+        """Backtest signal path: target position after each bar, same rules as execute_strategy"""
+        import numpy as np
+
+        close = df['close'].to_numpy(dtype=float)
+        # execute_strategy keeps the last 100 prices and appends the current one before computing
+        fast = self.windowed_ema(close, self.fast_ema_period)
+        slow = self.windowed_ema(close, self.slow_ema_period)
+
+        positions = np.zeros(len(close))
+        qty = 0.0
+        entry_price = 0.0
+        peak_price = 0.0
+        golden_flag = False
+        death_flag = False
+        first = max(self.fast_ema_period, self.slow_ema_period)
+        for i in range(first, len(close)):
+            price = close[i]
+            held = qty
+            if i > first:
+                golden_cross = fast[i - 1] <= slow[i - 1] and fast[i] > slow[i]
+                death_cross = fast[i - 1] >= slow[i - 1] and fast[i] < slow[i]
+                if golden_cross and not golden_flag:
+                    golden_flag, death_flag = True, False
+                    if held <= 0:
+                        qty = self.base_order_usdt / price
+                        entry_price = peak_price = price
+                elif death_cross and not death_flag:
+                    death_flag, golden_flag = True, False
+                    if held > 0:
+                        qty = 0.0
+                        entry_price = peak_price = 0.0
+
+            if held > 0 and entry_price > 0:
+                peak_price = max(peak_price, price)
+                if (price >= entry_price * (1 + self.take_profit_pct)
+                        or price <= entry_price * (1 - self.stop_loss_pct)
+                        or price <= peak_price * (1 - self.trailing_stop_pct)):
+                    qty = 0.0
+                    entry_price = peak_price = 0.0
+            positions[i] = qty
+        return positions
+
     def handle_data(self):
         try:
             self.execute_strategy()
@@ -139,8 +204,3 @@ class Strategy(StrategyBase):
                             print(f"Trailing stop triggered at {crt_price:.2f}")
                             self.entry_price = 0.0
                             self.position_peak_price = 0.0
-        
-        if len(self.price_history) > 100:
-            self.price_history = self.price_history[-100:]
-            self.fast_ema_values = self.fast_ema_values[-50:]
-            self.slow_ema_values = self.slow_ema_values[-50:]
\ No newline at end of file
@@ -26,12 +26,15 @@ class Strategy(StrategyBase):
         self.stop_loss_ratio = show_variable(0.05, GlobalType.FLOAT)  # 止损比例 5%
         self.take_profit_ratio = show_variable(0.10, GlobalType.FLOAT)  # 止盈比例 10%
         
-        # 价格历史
-        self.price_history = []
+        # 价格历史，在第一次 handle_data 时按（可能被回测参数覆盖的）EMA 周期创建
+        self.price_history = None
         
-        # EMA计算历史
-        self.fast_ema_history = []
-        self.slow_ema_history = []
+        # EMA计算历史（最近 100 个）
+        self.fast_ema_history = RingBuffer(100)
+        self.slow_ema_history = RingBuffer(100)
+        
+        # 实盘启动时用最近 100 根已收盘K线预热（EMA 增量计算，预热越长越接近稳定值）
+        self.warmup_bars = 100
         
         # 交易参数
         self.order_amount = show_variable(100.0, GlobalType.FLOAT)  # 每次交易金额 USDT
@@ -78,11 +81,14 @@ class Strategy(StrategyBase):
                 print("无效价格，跳过本次执行")
                 return
             
+            # 需要足够的历史数据来计算慢线EMA
+            min_data_required = max(self.fast_ema_period, self.slow_ema_period)
+            if self.price_history is None:
+                self.price_history = RingBuffer(min_data_required)
+            
             # 更新价格历史
             self.price_history.append(current_price_value)
             
-            # 需要足够的历史数据来计算慢线EMA
-            min_data_required = max(self.fast_ema_period, self.slow_ema_period)
             if len(self.price_history) < min_data_required:
                 print(f"收集历史数据中... {len(self.price_history)}/{min_data_required}")
                 return
@@ -104,12 +110,6 @@ class Strategy(StrategyBase):
             self.fast_ema_history.append(fast_ema)
             self.slow_ema_history.append(slow_ema)
             
-            # 限制历史数据长度
-            max_history = 100
-            if len(self.fast_ema_history) > max_history:
-                self.fast_ema_history.pop(0)
-                self.slow_ema_history.pop(0)
-            
             # 更新前值
             self.prev_fast_ema = fast_ema
             self.prev_slow_ema = slow_ema
@@ -21,9 +21,11 @@ class Strategy(StrategyBase):
         self.short_period = show_variable(5, GlobalType.INT)  # 短期均线周期
         self.long_period = show_variable(20, GlobalType.INT)  # 长期均线周期
         
-        # 价格历史
-        self.price_history = []
-        self.max_history = show_variable(25, GlobalType.INT)
+        # 流式均线，在第一次 handle_data 时按（可能被回测参数覆盖的）周期创建
+        self.short_sma = None
+        self.long_sma = None
+        # 实盘启动时预热：长期均线加上前一周期（判断交叉）
+        self.warmup_bars = self.long_period + 1
         
         # 交易参数
         self.order_amount = show_variable(100.0, GlobalType.FLOAT)  # 每次交易金额 USDT
@@ -32,12 +34,6 @@ class Strategy(StrategyBase):
         self.last_signal = show_variable(0, GlobalType.INT)  # 0: 无, 1: 买入, -1: 卖出
         self.position_price = show_variable(0.0, GlobalType.FLOAT)
     
-    def calculate_ma(self, prices, period):
-        """计算移动平均线"""
-        if len(prices) < period:
-            return 0
-        return sum(prices[-period:]) / period
-    
     def handle_data(self):
         try:
             # 获取当前价格
@@ -47,24 +43,21 @@ class Strategy(StrategyBase):
                 print("无效价格，跳过本次执行")
                 return
             
-            # 更新价格历史
-            self.price_history.append(current_price_value)
-            if len(self.price_history) > self.max_history:
-                self.price_history.pop(0)
+            if self.long_sma is None:
+                self.short_sma = SMA(self.short_period)
+                self.long_sma = SMA(self.long_period)
+            
+            # 前一个周期的均线（用于判断交叉），更新前读取
+            prev_short_ma = self.short_sma.value
+            prev_long_ma = self.long_sma.value
+            short_ma = self.short_sma.update(current_price_value)
+            long_ma = self.long_sma.update(current_price_value)
             
             # 需要足够的历史数据
-            if len(self.price_history) < self.long_period:
-                print(f"收集历史数据中... {len(self.price_history)}/{self.long_period}")
+            if prev_long_ma is None or prev_short_ma is None:
+                print(f"收集历史数据中... {len(self.long_sma.window)}/{self.long_period + 1}")
                 return
             
-            # 计算均线
-            short_ma = self.calculate_ma(self.price_history, self.short_period)
-            long_ma = self.calculate_ma(self.price_history, self.long_period)
-            
-            # 计算前一个周期的均线（用于判断交叉）
-            prev_short_ma = self.calculate_ma(self.price_history[:-1], self.short_period)
-            prev_long_ma = self.calculate_ma(self.price_history[:-1], self.long_period)
-            
             print(f"当前价格: {current_price_value:.2f}, 短期MA: {short_ma:.2f}, 长期MA: {long_ma:.2f}")
             
             # 获取当前持仓和可用资金
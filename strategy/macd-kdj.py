@@ -18,6 +18,11 @@ class Strategy(StrategyBase):
         self.last_week_macd = show_variable(0.0, GlobalType.FLOAT)
         self.last_day_kdj = show_variable(0.0, GlobalType.FLOAT)
         self.current_position_side = show_variable(0, GlobalType.INT)  # 1 for long, -1 for short, 0 for no position
+        # Open time of the last weekly/daily candle the indicator values were computed from
+        self.week_macd_ts = None
+        self.week_macd_value = 0.0
+        self.day_kdj_ts = None
+        self.day_kdj_value = 0.0
 
     def handle_data(self):
         try:
@@ -48,9 +53,7 @@ class Strategy(StrategyBase):
 
         print(f"Price: {crt_price:.2f}, Position: {position_qty:.6f}, Available: {available_usdt:.2f} USDT, P&L: {pl_ratio:.2%}")
 
-        # Simulate weekly MACD and daily KDJ signals (in real case, these would come from indicator calculations)
-        # For demo purposes, we assume these values are updated externally or calculated from historical data
-        # Here we just use placeholder logic - in practice, you'd implement or receive indicator values
+        # Weekly MACD and daily KDJ from closed candles (get_bars caches them; no look-ahead in backtests)
         week_macd_value = self.get_weekly_macd()
         day_kdj_value = self.get_daily_kdj()
 
@@ -143,16 +146,24 @@ class Strategy(StrategyBase):
             self.recent_low = float('inf')
 
     def get_weekly_macd(self):
-        # Placeholder function - in real implementation, calculate or fetch weekly MACD histogram
-        # For demo, return random-like behavior or use external data
-        # In practice: use historical weekly data to compute MACD(12,26,9)
-        # Here we simulate a value that can cross zero
-        import random
-        return random.uniform(-0.5, 0.5)  # Simulated MACD histogram value
+        # Weekly MACD(12,26,9) histogram of closed weekly candles; 0.0 until enough history
+        bars = get_bars(self.symbol, '1W', 100)
+        if len(bars['close']) < 35:
+            return 0.0
+        # Recompute only when a new weekly candle has closed
+        if bars['ts'][-1] != self.week_macd_ts:
+            _, _, hist = indicators.macd(bars['close'])
+            self.week_macd_ts = bars['ts'][-1]
+            self.week_macd_value = float(hist[-1])
+        return self.week_macd_value
 
     def get_daily_kdj(self):
-        # Placeholder function - in real implementation, calculate or fetch daily KDJ J-D value
-        # For demo, return random-like behavior or use external data
-        # In practice: use historical daily data to compute KDJ(9,3,3) and return J-D
-        import random
-        return random.uniform(-10, 10)  # Simulated KDJ crossover signal
\ No newline at end of file
+        # Daily KDJ(9,3,3) J - D of closed daily candles; 0.0 until enough history
+        bars = get_bars(self.symbol, '1D', 60)
+        if len(bars['close']) < 9:
+            return 0.0
+        if bars['ts'][-1] != self.day_kdj_ts:
+            _, d, j = indicators.kdj(bars['high'], bars['low'], bars['close'])
+            self.day_kdj_ts = bars['ts'][-1]
+            self.day_kdj_value = float(j[-1] - d[-1])
+        return self.day_kdj_value
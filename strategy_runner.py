@@ -4,6 +4,9 @@ import argparse
 from quant_engine.config_loader import ConfigLoader
 from quant_engine.okx_client import OKXClient
 from quant_engine.strategy_framework import *
+from quant_engine.indicators import INDICATOR_SCOPE
+from quant_engine.log_writer import install_signal_handlers
+from quant_engine.market_hub import HUB_ADDRESS_ENV
 
 # Add current directory to sys.path
 sys.path.append(os.getcwd())
@@ -25,9 +28,14 @@ def main():
     parser.add_argument('symbol', type=str, help='Trading symbol')
     parser.add_argument('leverage', type=int, help='Leverage')
     parser.add_argument('interval', type=str, nargs='?', default='1H', help='K-line interval (1m, 5m, 15m, 1H, 4H, 1D)')
+    parser.add_argument('--warmup-bars', type=int, default=None,
+                        help="Closed candles replayed before live trading (default: the strategy's warmup_bars)")
 
     args = parser.parse_args()
 
+    # The scheduler stops runners with SIGTERM; exit through SystemExit so queued logs/trades are flushed
+    install_signal_handlers()
+
     strategy_name = args.strategy_name
     symbol = args.symbol
     leverage = args.leverage
@@ -50,6 +58,14 @@ def main():
     if not client:
         print("Error: OKX Client configuration missing")
         sys.exit(1)
+
+    # Stream tickers over WebSocket instead of polling REST on every handle_data.
+    # Under the scheduler, market data comes from its shared hub process rather than a per-runner connection.
+    if config_loader.get('OKX_WS_ENABLED', 'true').lower() != 'false':
+        client.start_stream(tickers=[symbol],
+                            public_url=config_loader.get('OKX_WS_PUBLIC_URL'),
+                            business_url=config_loader.get('OKX_WS_BUSINESS_URL'),
+                            hub_address=os.environ.get(HUB_ADDRESS_ENV))
         
     path = os.path.join(os.getcwd(), 'strategy', strategy_name)
     if not os.path.exists(path):
@@ -76,6 +92,10 @@ def main():
         'max_qty_to_buy_on_margin': max_qty_to_buy_on_margin,
         'position_pl_ratio': position_pl_ratio,
         'place_limit': place_limit,
+        'place_limits_batch': place_limits_batch,
+        'cancel_orders_batch': cancel_orders_batch,
+        'get_bars': get_bars,
+        **INDICATOR_SCOPE,
         'ceil': ceil
     })
     
@@ -96,7 +116,11 @@ def main():
             strategy_instance = scope['Strategy'](client, symbol, strategy_name)
             # Set loop interval based on K-line period
             strategy_instance.loop_interval = loop_interval
-            print(f"Strategy instance created. Running with interval {loop_interval}s...")
+            # Run handle_data at each bar close rather than sleeping loop_interval after it
+            strategy_instance.bar = interval
+            # initialize() (called from run()) sets the strategy's own warmup_bars; the override is applied after it
+            strategy_instance.warmup_bars_override = args.warmup_bars
+            print(f"Strategy instance created. Running on {interval} bar closes...")
             strategy_instance.run()
         else:
             print(f"Error: No Strategy class found in {strategy_name}")
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quant_engine.db as db
+from quant_engine import log_writer
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh quant.db in tmp_path for the duration of the test"""
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'quant.db'))
+    db.init_db()
+    yield db
+    log_writer.flush(timeout=5)
+    db.close_connection()
@@ -0,0 +1,19 @@
+"""Backtest analytics on hand-computed equity curves."""
+
+import numpy as np
+import pytest
+
+from quant_engine.backtest_analytics import drawdown
+
+
+def test_drawdown_counts_from_last_visit_of_peak():
+    # The peak 110 is reached at index 1 and again at index 3; the drop to 90 starts at index 3
+    result = drawdown(np.array([100.0, 110.0, 105.0, 110.0, 90.0, 95.0]))
+    assert result['max_drawdown'] == pytest.approx(20 / 110 * 100)
+    assert result['max_drawdown_amount'] == pytest.approx(20.0)
+    assert result['max_drawdown_bars'] == 1
+
+
+def test_drawdown_monotonic_curve():
+    result = drawdown(np.array([100.0, 101.0, 102.0]))
+    assert result == {'max_drawdown': 0.0, 'max_drawdown_amount': 0.0, 'max_drawdown_bars': 0}
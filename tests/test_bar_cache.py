@@ -0,0 +1,54 @@
+"""BarCache locking: a slow fetch for one series must not block reads of another."""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from quant_engine import bar_cache
+from quant_engine.bar_cache import BarCache
+
+NOW = 1704067200.0 + 30
+
+
+def _candles(n):
+    ts = 1704067200000 - np.arange(n, 0, -1, dtype=np.int64) * 60000
+    return pd.DataFrame({'ts': ts, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'vol': 1.0})
+
+
+def test_slow_load_blocks_only_its_own_series(monkeypatch):
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def fake_load(client, symbol, bar, n, now):
+        calls.append(symbol)
+        if symbol == 'SLOW-USDT':
+            started.set()
+            assert release.wait(5)
+        return _candles(n), 'test'
+
+    monkeypatch.setattr(bar_cache, 'load_warmup_candles', fake_load)
+    cache = BarCache()
+    results = {}
+
+    def read(symbol):
+        results.setdefault(symbol, []).append(cache.get(None, symbol, '1m', 10, now=NOW))
+
+    slow = [threading.Thread(target=read, args=('SLOW-USDT',)) for _ in range(2)]
+    slow[0].start()
+    assert started.wait(5)
+    slow[1].start()
+    # Another series loads while SLOW-USDT is still being fetched
+    fast = threading.Thread(target=read, args=('FAST-USDT',))
+    fast.start()
+    fast.join(5)
+    assert not fast.is_alive()
+    assert len(results['FAST-USDT'][0]['ts']) == 10
+
+    release.set()
+    for t in slow:
+        t.join(5)
+    # The second SLOW-USDT reader waited for the first fetch instead of loading again
+    assert calls.count('SLOW-USDT') == 1
+    assert [len(r['ts']) for r in results['SLOW-USDT']] == [10, 10]
@@ -0,0 +1,77 @@
+"""MarketHub: private socket directory, per-launch authkey and JSON frames."""
+
+import json
+import os
+import stat
+import sys
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+import pytest
+
+from quant_engine.market_hub import HubClient, MarketHub
+from quant_engine.market_stream import MarketStream
+
+TICKER = {'channel': 'tickers', 'instId': 'BTC-USDT'}
+
+
+class OfflineStream(MarketStream):
+    """Upstream stream that records subscriptions instead of connecting to OKX"""
+
+    def subscribe_ticker(self, instId):
+        self.public.args.append({'channel': 'tickers', 'instId': instId})
+
+    def subscribe_candles(self, instId, bar='1H'):
+        self.business.args.append({'channel': f'candle{bar}', 'instId': instId})
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def hub():
+    hub = MarketHub(stream=OfflineStream())
+    hub.start()
+    assert wait_for(lambda: hub.listener is not None)
+    yield hub
+    hub.close()
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='Unix socket permissions')
+def test_socket_directory_is_private(hub):
+    assert stat.S_IMODE(os.stat(os.path.dirname(hub.address)).st_mode) == 0o700
+
+
+def test_wrong_authkey_is_rejected(hub):
+    with pytest.raises(AuthenticationError):
+        Client(hub.address, authkey=b'quant-okx-market-hub')
+
+
+def test_client_receives_json_frames(hub):
+    conn = Client(hub.address, authkey=hub.authkey)
+    conn.send_bytes(json.dumps({'op': 'subscribe', 'args': [TICKER]}).encode())
+    assert wait_for(lambda: TICKER in hub.stream.public.args)
+    hub.stream._handle({'arg': TICKER, 'data': [{'instId': 'BTC-USDT', 'last': '42000'}]})
+    assert json.loads(conn.recv_bytes()) == {'arg': TICKER, 'data': [{'instId': 'BTC-USDT', 'last': '42000'}]}
+    conn.close()
+
+
+def test_hub_client_reads_address_and_key_from_environment(hub, monkeypatch):
+    monkeypatch.setenv('QUANT_MARKET_HUB', hub.address)
+    monkeypatch.setenv('QUANT_MARKET_HUB_KEY', hub.authkey.hex())
+    client = HubClient().start()
+    try:
+        client.subscribe_ticker('BTC-USDT')
+        assert client.wait_connected(5)
+        assert wait_for(lambda: TICKER in hub.stream.public.args)
+        hub.stream._handle({'arg': TICKER, 'data': [{'instId': 'BTC-USDT', 'last': '42000'}]})
+        assert wait_for(lambda: client.last_price('BTC-USDT', subscribe=False) == 42000.0)
+    finally:
+        client.stop()
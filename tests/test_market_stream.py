@@ -0,0 +1,148 @@
+"""MarketStream against a local WebSocket stand-in for OKX that drops the connection."""
+
+import base64
+import hashlib
+import json
+import socket
+import threading
+import time
+
+from quant_engine.market_stream import MarketStream
+
+WS_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+SYMBOL = 'BTC-USDT'
+
+
+def candle(ts, close, confirm):
+    return [str(ts), '100', '110', '90', str(close), '1', '1', '100', confirm]
+
+
+def push(bar, rows):
+    return {'arg': {'channel': f'candle{bar}', 'instId': SYMBOL}, 'data': rows}
+
+
+def recv_exact(sock, n):
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError('client closed')
+        data += chunk
+    return data
+
+
+class FakeOKX:
+    """
+    Minimal WebSocket server: script[i] lists the messages pushed on the i-th connection after
+    its first subscribe. Every connection but the last is dropped right after its script.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.subscriptions = []
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.url = f'ws://127.0.0.1:{self.server.getsockname()[1]}'
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self.server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            self.subscriptions.append([])
+            threading.Thread(target=self._serve, args=(sock, len(self.subscriptions) - 1), daemon=True).start()
+
+    def _serve(self, sock, index):
+        try:
+            self._handshake(sock)
+            pushed = False
+            while True:
+                opcode, payload = self._read_frame(sock)
+                if opcode == 8:
+                    return
+                request = json.loads(payload)
+                self.subscriptions[index].extend(request.get('args', []))
+                if not pushed:
+                    pushed = True
+                    for message in self.script[index]:
+                        self._send(sock, message)
+                    if index < len(self.script) - 1:
+                        sock.shutdown(socket.SHUT_RDWR)
+                        return
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            sock.close()
+
+    @staticmethod
+    def _handshake(sock):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += sock.recv(1024)
+        key = next(line.split(b':', 1)[1].strip() for line in request.split(b'\r\n')
+                   if line.lower().startswith(b'sec-websocket-key'))
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest())
+        sock.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+
+    @staticmethod
+    def _read_frame(sock):
+        first, second = recv_exact(sock, 2)
+        length = second & 0x7f
+        if length == 126:
+            length = int.from_bytes(recv_exact(sock, 2), 'big')
+        elif length == 127:
+            length = int.from_bytes(recv_exact(sock, 8), 'big')
+        mask = recv_exact(sock, 4) if second & 0x80 else b'\0\0\0\0'
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(recv_exact(sock, length)))
+        return first & 0x0f, payload
+
+    @staticmethod
+    def _send(sock, message):
+        payload = json.dumps(message).encode()
+        if len(payload) < 126:
+            header = bytes([0x81, len(payload)])
+        else:
+            header = bytes([0x81, 126]) + len(payload).to_bytes(2, 'big')
+        sock.sendall(header + payload)
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_reconnect_resubscribes_and_delivers_each_bar_once():
+    first, second, third = 1704067200000, 1704067260000, 1704067320000
+    server = FakeOKX([
+        [push('1m', [candle(first, 101, '1')]), push('1m', [candle(second, 102, '0')])],
+        # After reconnecting OKX pushes the latest candles again, including ones already delivered
+        [push('1m', [candle(second, 103, '1')]), push('1m', [candle(first, 101, '1')]),
+         push('1m', [candle(second, 103, '1')]), push('1m', [candle(third, 104, '0')])],
+    ])
+    stream = MarketStream(server.url, server.url).start()
+    confirmed = []
+    stream.add_listener(lambda message: confirmed.extend(
+        (message['arg']['channel'], int(row[0])) for row in message['data'] if row[8] == '1'))
+    try:
+        stream.subscribe_candles(SYMBOL, '1m')
+        stream.subscribe_candles(SYMBOL, '5m')
+        # The last push of the second connection has been handled once its candle is cached
+        assert wait_for(lambda: any(int(row[0]) == third for row in stream.candles(SYMBOL, '1m')))
+
+        assert stream.business.reconnects == 1
+        assert {'channel': 'candle1m', 'instId': SYMBOL} in server.subscriptions[1]
+        assert {'channel': 'candle5m', 'instId': SYMBOL} in server.subscriptions[1]
+        assert confirmed == [('candle1m', first), ('candle1m', second)]
+        assert [float(row[4]) for row in stream.candles(SYMBOL, '1m')] == [104, 103, 101]
+    finally:
+        stream.stop()
+        server.close()
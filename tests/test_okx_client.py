@@ -0,0 +1,104 @@
+"""OKXClient batch posting: retries must never send an order twice, unconfirmed items are 'unknown'."""
+
+import json
+
+import pytest
+import requests
+
+from quant_engine import okx_client
+from quant_engine.okx_client import UNKNOWN_SCODE, OKXClient
+
+ORDERS = [{'instId': 'BTC-USDT', 'tdMode': 'cash', 'side': 'buy', 'ordType': 'limit', 'sz': 1, 'px': 100 + i}
+          for i in range(3)]
+
+
+class Response:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        if isinstance(self.payload, Exception):
+            raise self.payload
+        return self.payload
+
+
+class FakeSession:
+    """Plays back a scripted list of POST outcomes; orders of 'placed' outcomes are kept by clOrdId"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.posted = []
+        self.placed = {}
+        self.lookup_error = False
+
+    def post(self, url, headers=None, data=None, proxies=None, timeout=None):
+        items = json.loads(data)
+        self.posted.append(items)
+        outcome = self.outcomes.pop(0)
+        if outcome in ('placed', 'timeout after placing'):
+            for item in items:
+                if 'clOrdId' in item:
+                    self.placed[item['clOrdId']] = f'ord-{len(self.placed)}'
+        if outcome == 'timeout after placing':
+            raise requests.exceptions.ReadTimeout('read timed out')
+        if outcome == 'refused':
+            raise requests.exceptions.ConnectionError('connection refused')
+        if outcome == 'bad json':
+            return Response(ValueError('Expecting value'))
+        return Response({'code': '0', 'msg': '', 'data': [
+            {'ordId': self.placed.get(item.get('clOrdId'), item.get('ordId', '')), 'sCode': '0', 'sMsg': ''}
+            for item in items]})
+
+    def get(self, url, headers=None, proxies=None, timeout=None):
+        if self.lookup_error:
+            raise requests.exceptions.ConnectionError('connection refused')
+        cl_ord_id = url.split('clOrdId=')[1]
+        if cl_ord_id in self.placed:
+            return Response({'code': '0', 'data': [{'ordId': self.placed[cl_ord_id], 'clOrdId': cl_ord_id}]})
+        return Response({'code': '51603', 'msg': 'Order does not exist', 'data': []})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(okx_client.time, 'sleep', lambda s: None)
+    return OKXClient('key', 'secret', 'pass')
+
+
+def test_timeout_after_placing_is_resolved_by_client_order_id(client):
+    client.session = FakeSession(['timeout after placing'])
+    result = client.place_orders_batch(ORDERS)
+    # The orders were placed by the first request; the lookup finds them and nothing is resent
+    assert len(client.session.posted) == 1
+    assert result['code'] == '0'
+    assert [item['ordId'] for item in result['data']] == ['ord-0', 'ord-1', 'ord-2']
+
+
+def test_only_orders_unknown_to_okx_are_resent(client):
+    client.session = FakeSession(['bad json', 'placed'])
+    result = client.place_orders_batch(ORDERS)
+    # Nothing was placed by the first request, so all three are sent again with the same clOrdIds
+    first, second = client.session.posted
+    assert [item['clOrdId'] for item in second] == [item['clOrdId'] for item in first]
+    assert result['code'] == '0'
+
+
+def test_unconfirmed_orders_are_reported_unknown(client):
+    client.session = FakeSession(['timeout after placing'])
+    client.session.lookup_error = True
+    result = client.place_orders_batch(ORDERS)
+    assert len(client.session.posted) == 1
+    assert result['code'] == '1'
+    assert {item['sCode'] for item in result['data']} == {UNKNOWN_SCODE}
+
+
+def test_cancel_is_retried_only_when_never_sent(client):
+    orders = [{'instId': 'BTC-USDT', 'ordId': '1'}, {'instId': 'BTC-USDT', 'ordId': '2'}]
+    client.session = FakeSession(['refused', 'placed'])
+    assert client.cancel_orders_batch(orders)['code'] == '0'
+    assert len(client.session.posted) == 2
+
+    # A read timeout may mean OKX already processed the cancels; without clOrdIds they are not resent
+    client.session = FakeSession(['timeout after placing'])
+    result = client.cancel_orders_batch(orders)
+    assert len(client.session.posted) == 1
+    assert [item['sCode'] for item in result['data']] == [UNKNOWN_SCODE, UNKNOWN_SCODE]
@@ -0,0 +1,70 @@
+"""BacktestOptimizer ranking: sort direction per metric, missing values, unknown keys."""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from quant_engine.optimizer import BacktestOptimizer
+
+STRATEGY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'strategy')
+
+GRID = {'lookback_period': [5, 10, 20, 40]}
+
+
+def optimizer_and_data():
+    with open(os.path.join(STRATEGY_DIR, 'breakout_strategy.py'), encoding='utf-8') as f:
+        code = f.read()
+    rng = np.random.default_rng(5)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, 2000)))
+    df = pd.DataFrame({'ts': 1704067200000 + np.arange(2000, dtype=np.int64) * 3600000, 'close': close})
+    return BacktestOptimizer(code, 'BTC-USDT', None, None, max_workers=1), df
+
+
+def test_max_drawdown_sorts_ascending(temp_db):
+    optimizer, df = optimizer_and_data()
+    result = optimizer.run(GRID, sort_by='max_drawdown', data=df)
+    assert result['status'] == 'success'
+    drawdowns = [r['max_drawdown'] for r in result['results']]
+    assert len(set(drawdowns)) > 1
+    assert drawdowns == sorted(drawdowns)
+
+    result = optimizer.run(GRID, sort_by='pnl_ratio', data=df)
+    ratios = [r['pnl_ratio'] for r in result['results']]
+    assert ratios == sorted(ratios, reverse=True)
+
+
+def test_unknown_sort_key_is_rejected(temp_db):
+    optimizer, df = optimizer_and_data()
+    result = optimizer.run(GRID, sort_by='params', data=df)
+    assert result['status'] == 'error'
+
+
+# Buys on the first bar and sells on bar exit_bar; exit_bar < 0 never trades
+HOLD_STRATEGY = '''
+class Strategy(StrategyBase):
+    def initialize(self):
+        self.symbol = declare_trig_symbol()
+        self.exit_bar = show_variable(10, GlobalType.INT)
+        self.bars = 0
+
+    def handle_data(self):
+        price = current_price(symbol=self.symbol, price_type=THType.FTH)
+        if self.exit_bar >= 0 and self.bars == 0:
+            place_limit(symbol=self.symbol, price=price, qty=1.0, side=OrderSide.BUY, time_in_force=TimeInForce.GTC)
+        elif self.bars == self.exit_bar:
+            place_limit(symbol=self.symbol, price=price, qty=1.0, side=OrderSide.SELL, time_in_force=TimeInForce.GTC)
+        self.bars += 1
+'''
+
+
+def test_profit_factor_ranks_all_winning_run_first(temp_db):
+    # Price rises for 50 bars, then falls below the start
+    close = np.concatenate((np.linspace(100, 150, 50), np.linspace(150, 80, 50)))
+    df = pd.DataFrame({'ts': 1704067200000 + np.arange(100, dtype=np.int64) * 3600000, 'close': close})
+    optimizer = BacktestOptimizer(HOLD_STRATEGY, 'BTC-USDT', None, None, max_workers=1)
+    result = optimizer.run({'exit_bar': [-1, 90, 10]}, sort_by='profit_factor', data=df)
+    assert result['status'] == 'success'
+    ranked = [(r['params']['exit_bar'], r['profit_factor']) for r in result['results']]
+    # All-winning run (profit_factor None) first, the losing run's real 0.0 next, the run without trades last
+    assert ranked == [(10, None), (90, 0.0), (-1, None)]
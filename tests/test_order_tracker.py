@@ -0,0 +1,119 @@
+"""OrderTracker against a fake exchange: partial fill, full fill, cancel and restart."""
+
+import pytest
+
+from quant_engine import log_writer
+from quant_engine.order_tracker import OrderTracker
+
+STRATEGY = 'tracker-test'
+SYMBOL = 'BTC-USDT'
+
+
+class FakeExchange:
+    """Serves orders-pending / orders-history / order from a dict of OKX-style order states"""
+
+    def __init__(self):
+        self.orders = {}
+
+    def set(self, ord_id, state, acc, avg, fee, fee_ccy):
+        self.orders[ord_id] = {'ordId': ord_id, 'instId': SYMBOL, 'state': state, 'accFillSz': str(acc),
+                               'avgPx': str(avg), 'fee': str(fee), 'feeCcy': fee_ccy}
+
+    def get_orders_pending(self, instType=None, instId=None, after=None, limit=100):
+        data = [o for o in self.orders.values() if o['state'] in ('live', 'partially_filled')]
+        return {'code': '0', 'data': data}
+
+    def get_orders_history(self, instType, begin=None, after=None, limit=100):
+        data = [o for o in self.orders.values() if o['state'] in ('filled', 'canceled')]
+        return {'code': '0', 'data': data}
+
+    def get_order(self, instId, ordId):
+        return {'code': '0', 'data': [self.orders[ordId]] if ordId in self.orders else []}
+
+
+def submit(tracker, order_id, side, price, qty):
+    log_writer.log_trade(STRATEGY, SYMBOL, side, 'limit', price, qty, order_id=order_id, status='SUBMITTED')
+    tracker.track(order_id, SYMBOL, side, price, qty)
+
+
+def trade(db, order_id):
+    log_writer.flush(timeout=5)
+    row = db.get_connection().execute('SELECT * FROM strategy_trades WHERE order_id = ?', (order_id,)).fetchone()
+    return dict(row)
+
+
+def test_fill_lifecycle_and_metrics(temp_db):
+    exchange = FakeExchange()
+    tracker = OrderTracker(exchange, STRATEGY)
+
+    # Buy 1 @ 100; spot buy fees are charged in the base currency
+    submit(tracker, 'b1', 'buy', 100.0, 1.0)
+    exchange.set('b1', 'partially_filled', 0.4, 100.0, -0.0004, 'BTC')
+    summary = tracker.reconcile()
+    assert summary['updated'] == 1 and summary['open'] == 1
+    row = trade(temp_db, 'b1')
+    assert row['status'] == 'PARTIALLY_FILLED'
+    assert row['filled_quantity'] == pytest.approx(0.4)
+    assert row['fee'] == pytest.approx(-0.04)  # stored in quote currency
+
+    exchange.set('b1', 'filled', 1.0, 100.0, -0.001, 'BTC')
+    summary = tracker.reconcile()
+    assert summary['filled'] == 1 and summary['open'] == 0
+    row = trade(temp_db, 'b1')
+    assert row['status'] == 'FILLED'
+    assert row['filled_quantity'] == pytest.approx(1.0)
+    assert row['fee'] == pytest.approx(-0.1)
+    assert row['pnl'] is None  # opening trade
+    book = tracker.book(SYMBOL)
+    assert book.qty == pytest.approx(1.0)
+    assert book.avg_price == pytest.approx(100.1)  # fee added to cost
+
+    # Sell 1 @ 110, half fills, then the rest is cancelled
+    submit(tracker, 's1', 'sell', 110.0, 1.0)
+    exchange.set('s1', 'partially_filled', 0.5, 110.0, -0.055, 'USDT')
+    summary = tracker.reconcile()
+    expected_pnl = (110.0 - 100.1) * 0.5 - 0.055
+    assert summary['realized_pnl'] == pytest.approx(expected_pnl)
+    assert trade(temp_db, 's1')['status'] == 'PARTIALLY_FILLED'
+
+    exchange.set('s1', 'canceled', 0.5, 110.0, -0.055, 'USDT')
+    summary = tracker.reconcile()
+    assert summary['cancelled'] == 1 and summary['open'] == 0
+    assert summary['realized_pnl'] == pytest.approx(0.0)
+    row = trade(temp_db, 's1')
+    assert row['status'] == 'CANCELLED'
+    assert row['filled_quantity'] == pytest.approx(0.5)
+    assert row['pnl'] == pytest.approx(expected_pnl)
+
+    metrics = dict(temp_db.get_connection().execute(
+        'SELECT * FROM strategy_metrics WHERE strategy_name = ?', (STRATEGY,)).fetchone())
+    assert metrics['total_trades'] == 1
+    assert metrics['winning_trades'] == 1
+    assert metrics['losing_trades'] == 0
+    assert metrics['total_pnl'] == pytest.approx(expected_pnl)
+    assert metrics['win_rate'] == pytest.approx(100.0)
+
+
+def test_restore_rebuilds_open_orders_and_cost(temp_db):
+    exchange = FakeExchange()
+    tracker = OrderTracker(exchange, STRATEGY)
+    submit(tracker, 'b1', 'buy', 100.0, 1.0)
+    exchange.set('b1', 'filled', 1.0, 100.0, -0.001, 'BTC')
+    submit(tracker, 'b2', 'buy', 90.0, 2.0)
+    exchange.set('b2', 'partially_filled', 1.0, 90.0, -0.001, 'BTC')
+    tracker.reconcile()
+
+    restored = OrderTracker(exchange, STRATEGY)
+    assert restored.restore() == 1
+    assert set(restored.orders) == {'b2'}
+    book = restored.book(SYMBOL)
+    original = tracker.book(SYMBOL)
+    assert book.qty == pytest.approx(original.qty)
+    assert book.avg_price == pytest.approx(original.avg_price)
+
+    # The restored order keeps accounting from its recorded fill and fee
+    exchange.set('b2', 'filled', 2.0, 90.0, -0.002, 'BTC')
+    restored.reconcile()
+    tracker.reconcile()
+    assert restored.book(SYMBOL).avg_price == pytest.approx(tracker.book(SYMBOL).avg_price)
+    assert trade(temp_db, 'b2')['fee'] == pytest.approx(-0.18)
@@ -0,0 +1,63 @@
+"""compute_signals / run_signals must reproduce the per-bar handle_data loop exactly."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quant_engine.backtest_engine import BacktestEngine
+
+STRATEGY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'strategy')
+
+# Appended to a strategy's code to force the event loop: the subclass keeps every rule
+# but returns None from compute_signals
+EVENT_LOOP_OVERRIDE = '''
+
+_SignalStrategy = Strategy
+
+class Strategy(_SignalStrategy):
+    def compute_signals(self, df):
+        return None
+'''
+
+
+def synthetic_bars(n, seed):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = close * rng.uniform(0, 0.005, n)
+    return pd.DataFrame({
+        'ts': 1704067200000 + np.arange(n, dtype=np.int64) * 3600000,
+        'open': close, 'high': close + spread, 'low': close - spread, 'close': close,
+        'vol': np.ones(n),
+    })
+
+
+def run(code, df):
+    engine = BacktestEngine(code, 'BTC-USDT', '2024-01-01', '2025-01-01', data=df, bar='1H')
+    result = engine.run()
+    assert result['status'] == 'success', result.get('traceback')
+    return result
+
+
+@pytest.mark.parametrize('filename', ['ema.py', 'breakout_strategy.py'])
+@pytest.mark.parametrize('seed', [1, 2, 3, 4])
+def test_signal_path_matches_event_loop(temp_db, capsys, filename, seed):
+    with open(os.path.join(STRATEGY_DIR, filename), encoding='utf-8') as f:
+        code = f.read()
+    df = synthetic_bars(3000, seed)
+
+    signal = run(code, df)
+    event = run(code + EVENT_LOOP_OVERRIDE, df)
+    capsys.readouterr()  # strategies print every bar
+
+    assert signal['engine'] == 'signal'
+    assert event['engine'] == 'event'
+    assert signal['total_orders'] > 0
+    assert len(signal['orders']) == len(event['orders'])
+    for a, b in zip(signal['orders'], event['orders']):
+        assert (a['time'], a['side']) == (b['time'], b['side'])
+        assert a['price'] == pytest.approx(b['price'])
+        assert a['qty'] == pytest.approx(b['qty'])
+        assert a['balance'] == pytest.approx(b['balance'])
+    assert signal['final_equity'] == pytest.approx(event['final_equity'])
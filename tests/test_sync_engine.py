@@ -0,0 +1,93 @@
+"""KlineSyncEngine against a fake history-candles endpoint: gap filling, paging and the column store."""
+
+import os
+
+import numpy as np
+import pytest
+
+from quant_engine.kline_store import COMPLETE_MARKER, KlineStore
+from quant_engine.market_data import MarketDataManager
+from quant_engine.sync_engine import BAR_MS, HISTORY_CANDLES_PATH, KlineSyncEngine, find_gaps
+
+SYMBOL = 'BTC-USDT'
+HOUR = BAR_MS['1H']
+# 2024-01-31 00:00 UTC; the 48 bars span the January / February partitions
+START = 1706659200000
+TS = START + np.arange(48, dtype=np.int64) * HOUR
+
+
+def candle(ts):
+    price = 100.0 + (ts - START) / HOUR
+    return [str(ts), str(price), str(price + 1), str(price - 1), str(price), '10', '1', '1000', '1']
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeHistoryCandles:
+    """Serves /market/history-candles pages (newest first, strictly before `after`) from TS"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, params=None, proxies=None, timeout=None):
+        assert url.endswith(HISTORY_CANDLES_PATH)
+        self.requests.append(dict(params))
+        older = [int(ts) for ts in TS[::-1] if ts < int(params['after'])]
+        return Response({'code': '0', 'msg': '', 'data': [candle(ts) for ts in older[:params['limit']]]})
+
+
+@pytest.fixture
+def manager(temp_db, tmp_path):
+    return MarketDataManager(store=KlineStore(str(tmp_path / 'kline_store')))
+
+
+def test_find_gaps():
+    ts = np.concatenate((TS[:5], TS[15:24]))
+    assert find_gaps(ts, int(TS[0]), int(TS[-1]) + HOUR, HOUR) == [(int(TS[5]), int(TS[15])),
+                                                                  (int(TS[24]), int(TS[-1]) + HOUR)]
+    assert find_gaps(TS, int(TS[0]), int(TS[-1]) + HOUR, HOUR) == []
+    assert find_gaps([], 0, HOUR, HOUR) == [(0, HOUR)]
+
+
+def test_sync_fills_gaps_and_store(manager):
+    # Bars 0-4 and 15-23 are already stored; 5-14 and 24-47 are missing
+    manager._save_klines_to_db(SYMBOL, '1H', [candle(int(ts)) for ts in np.concatenate((TS[:5], TS[15:24]))])
+    engine = KlineSyncEngine(manager, max_workers=1, page_limit=4)
+    engine.session = FakeHistoryCandles()
+
+    job = {'symbol': SYMBOL, 'bar': '1H', 'start_date': int(TS[0]), 'end_date': int(TS[-1]) + HOUR}
+    result = engine.sync_job(job)
+
+    assert result['status'] == 'success', result['msg']
+    assert result['gaps'] == 2
+    assert result['count'] == 34
+    assert result['unfilled_gaps'] == []
+    # Newest gap first; each page continues from the oldest bar of the previous one
+    afters = [int(r['after']) for r in engine.session.requests]
+    assert afters[:6] == [int(TS[-1]) + HOUR] + [int(ts) for ts in TS[44:24:-4]]
+    assert afters[6:] == [int(TS[15]), int(TS[11]), int(TS[7])]
+    assert all(r['limit'] == 4 for r in engine.session.requests)
+
+    assert manager.find_missing_ranges(SYMBOL, '1H', int(TS[0]), int(TS[-1]) + HOUR) == []
+
+    store = manager.store
+    assert store.is_complete(SYMBOL, '1H')
+    assert os.path.exists(os.path.join(store.root, SYMBOL, '1H', COMPLETE_MARKER))
+    assert store.partitions(SYMBOL, '1H') == ['2024-01', '2024-02']
+    assert os.path.exists(os.path.join(store.root, SYMBOL, '1H', '2024-02', 'close.npy'))
+    df = store.read(SYMBOL, '1H')
+    np.testing.assert_array_equal(df['ts'].to_numpy(), TS)
+    np.testing.assert_array_equal(df['close'].to_numpy(), 100.0 + np.arange(48))
+
+    # A second run finds nothing to fetch
+    engine.session = FakeHistoryCandles()
+    again = engine.sync_job(job)
+    assert again['gaps'] == 0 and engine.session.requests == []